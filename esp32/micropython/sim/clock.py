@@ -0,0 +1,50 @@
+# clock.py
+import time as _time
+
+class VirtualClock:
+    # Inlocuieste modulul `time` in modulele firmware-ului (control, sensors, sampler):
+    # aceleasi functii ca pe MicroPython, dar timpul avanseaza doar prin advance().
+    # t = secunde epoch Unix (UTC, ca dupa ntptime.settime()).
+    def __init__(self, t0=0.0):
+        self.t = float(t0)
+        self._ms0 = self.t * 1000.0
+        self._tm_s = None
+        self._tm = None
+
+    def advance(self, dt):
+        self.t += dt
+
+    def time(self):
+        return int(self.t)
+
+    def gmtime(self, secs=None):
+        # controller-ul cere ora de cateva ori pe tick; rezolutia e oricum 1 s
+        secs = int(self.t if secs is None else secs)
+        if secs != self._tm_s:
+            self._tm_s = secs
+            self._tm = tuple(_time.gmtime(secs))
+        return self._tm
+
+    localtime = gmtime
+
+    def ticks_ms(self):
+        return int(self.t * 1000.0 - self._ms0)
+
+    def ticks_us(self):
+        return int((self.t * 1000.0 - self._ms0) * 1000.0)
+
+    def ticks_add(self, t, delta):
+        return t + delta
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    # citirile de senzori nu consuma timp simulat; tick-ul il avanseaza sim/run.py
+    def sleep(self, s):
+        pass
+
+    def sleep_ms(self, ms):
+        pass
+
+    def sleep_us(self, us):
+        pass
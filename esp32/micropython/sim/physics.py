@@ -0,0 +1,150 @@
+# physics.py
+import math
+import random
+
+import config
+import machine
+
+# Model simplu de sera, pas cu pas (dt in secunde), suficient pentru bucla inchisa:
+#  - temperatura: masa termica cu pierderi spre exterior, incalzire, ventilator, soare, lampa
+#  - lumina interioara: lampa (PWM pe cele doua canale) + soare, nori diferiti pe zi
+#  - sol: se usuca mai repede ziua, creste la udare (pompa + valva udare)
+#  - rezervor umidificator: se consuma constant, se umple prin pompa + valva umplere
+#  - bazin principal: pompa trage apa din el (distanta senzor -> apa creste);
+#    "utilizatorul" il umple la REFILL_HOUR o data la refill_days
+# Iesirile se citesc din registrele stub-ului machine (duty PWM, relee active-LOW),
+# deci trec prin actuators.py exact ca pe placa.
+
+TAU_LOSS_S = 3600.0          # constanta de timp a pierderilor spre exterior
+TAU_FAN_S = 600.0            # ventilatorul la 100%
+HEAT_C_PER_S = 0.012         # incalzitorul la 100%
+SUN_C_PER_S = 0.004
+LAMP_C_PER_S = 0.0008
+
+LAMP_LUX_MAX = 22000.0       # violet, ambele canale la 100%
+SUN_LUX_IN = 25000.0         # soare la pranz, cer senin, prin folie
+
+SOIL_DRY_PER_H = 0.6         # % pe ora, noaptea
+SOIL_DRY_SUN_PER_H = 1.2     # % pe ora in plus, la soare maxim
+SOIL_WET_PER_S = 0.8         # % pe secunda, pompa 100% pe udare
+
+HUM_RES_USE_PER_H = 3.0      # % pe ora
+HUM_RES_FILL_PER_S = 0.6     # % pe secunda, pompa 100% pe umplere
+
+BASIN_CM_PER_S = 0.01        # cat coboara apa din bazin, pompa 100%
+BASIN_FULL_CM = 10.0
+REFILL_HOUR = 9
+
+class Greenhouse:
+    def __init__(self, seed=0, out_mean_c=12.0, out_amp_c=6.0, refill_days=4.0,
+                 temp_c=18.0, soil_pct=50.0, hum_res_pct=60.0, basin_cm=11.0):
+        self.rng = random.Random(seed)
+        self.out_mean_c = out_mean_c
+        self.out_amp_c = out_amp_c
+        self.refill_days = refill_days
+        self.temp_c = temp_c
+        self.rh = 60.0
+        self.soil_pct = soil_pct
+        self.hum_res_pct = hum_res_pct
+        self.basin_cm = basin_cm
+        self.lux_in = 0.0
+        self.sun = 0.0
+        self.hour = 0.0
+        self._day = None
+        self._cloud = 1.0
+        self._last_refill_day = 0
+        self.refills = 0
+
+    # --- intrari, citite de stub-urile machine / bme280 ---
+
+    def adc(self, pin):
+        if pin == config.PIN_SOIL:
+            adc = _inv_pct(self.soil_pct, config.SOIL_ADC_DRY, config.SOIL_ADC_WET)
+        elif pin == config.PIN_HUM_RES_LEVEL:
+            adc = _inv_pct(self.hum_res_pct, config.HUM_RES_ADC_EMPTY, config.HUM_RES_ADC_FULL)
+        elif pin == config.PIN_OUT_LUX:
+            adc = 4095.0 * self.sun
+        else:
+            return 0
+        return int(min(4095, max(0, adc + self.rng.gauss(0.0, 8.0))))
+
+    def i2c_read(self, addr, n):
+        # BH1750: raw = lux * 1.2, big-endian
+        raw = int(min(65535, max(0.0, (self.lux_in + self.rng.gauss(0.0, 20.0)) * 1.2)))
+        return bytes(((raw >> 8) & 0xFF, raw & 0xFF))[:n]
+
+    def pulse_us(self, pin, timeout_us):
+        us = int(self.basin_cm * 58.0)
+        return us if us <= timeout_us else -2
+
+    def bme(self):
+        return (self.temp_c + self.rng.gauss(0.0, 0.05), 1013.25,
+                min(100.0, max(0.0, self.rh + self.rng.gauss(0.0, 0.3))))
+
+    # --- iesiri, din registrele stub-ului machine ---
+
+    @staticmethod
+    def outputs():
+        d = machine.pwm
+        lamp = (d.get(config.PIN_LAMP_BLUE, 0) + d.get(config.PIN_LAMP_RED, 0)) / (2 * 65535.0)
+        return {
+            "lamp": lamp,
+            "heater": d.get(config.PIN_HEATER, 0) / 65535.0,
+            "fan": d.get(config.PIN_FAN, 0) / 65535.0,
+            "pump": d.get(config.PIN_PUMP, 0) / 65535.0,
+            # relee active-LOW: 0 = deschis
+            "valve_water": machine.pins.get(config.PIN_VALVE_WATER, 1) == 0,
+            "valve_fill_hum": machine.pins.get(config.PIN_VALVE_FILL_HUM, 1) == 0,
+        }
+
+    def t_out(self):
+        # minim in zori, maxim pe la 15
+        return self.out_mean_c + self.out_amp_c * math.sin(2 * math.pi * (self.hour - 9.0) / 24.0)
+
+    def step(self, dt, t_unix):
+        day = int(t_unix // 86400)
+        self.hour = (t_unix % 86400) / 3600.0 + config.TZ_OFFSET_HOURS
+        self.hour %= 24.0
+        if day != self._day:
+            self._day = day
+            self._cloud = self.rng.uniform(0.25, 1.0)
+            if self._last_refill_day == 0:
+                self._last_refill_day = day
+        self.sun = max(0.0, math.sin(math.pi * (self.hour - 6.0) / 12.0)) * self._cloud
+
+        o = self.outputs()
+        t_out = self.t_out()
+
+        # temperatura
+        loss = (self.temp_c - t_out) * (1.0 / TAU_LOSS_S + o["fan"] / TAU_FAN_S)
+        self.temp_c += dt * (HEAT_C_PER_S * o["heater"] + SUN_C_PER_S * self.sun
+                             + LAMP_C_PER_S * o["lamp"] - loss)
+
+        # umiditate aer: tinde spre un echilibru dat de sol si temperatura; ventilatorul o scade
+        rh_eq = 62.0 + 0.4 * (self.soil_pct - 40.0) - 1.2 * (self.temp_c - t_out)
+        rh_eq = min(98.0, max(25.0, rh_eq))
+        self.rh += dt * ((rh_eq - self.rh) / 1800.0 - o["fan"] * (self.rh - 50.0) / TAU_FAN_S)
+
+        # lumina
+        self.lux_in = LAMP_LUX_MAX * o["lamp"] + SUN_LUX_IN * self.sun
+
+        # apa: pompa trage din bazin doar pe valva deschisa; bazin gol = pompa in gol
+        flow = o["pump"] if self.basin_cm < 20.0 else 0.0
+        water = flow if o["valve_water"] else 0.0
+        fill = flow if o["valve_fill_hum"] else 0.0
+        self.soil_pct -= dt * (SOIL_DRY_PER_H + SOIL_DRY_SUN_PER_H * self.sun) / 3600.0
+        self.soil_pct += dt * SOIL_WET_PER_S * water
+        self.hum_res_pct += dt * (HUM_RES_FILL_PER_S * fill - HUM_RES_USE_PER_H / 3600.0)
+        self.basin_cm += dt * BASIN_CM_PER_S * (water + fill)
+        self.soil_pct = min(100.0, max(0.0, self.soil_pct))
+        self.hum_res_pct = min(100.0, max(0.0, self.hum_res_pct))
+
+        if (self.refill_days > 0 and day - self._last_refill_day >= self.refill_days
+                and self.hour >= REFILL_HOUR):
+            self._last_refill_day = day
+            self.basin_cm = BASIN_FULL_CM
+            self.refills += 1
+
+def _inv_pct(pct, a0, a100):
+    # inversul lui sensors.pct_from_adc: procent -> citire ADC
+    return a0 + (a100 - a0) * pct / 100.0
@@ -0,0 +1,216 @@
+# run.py - simulare accelerata pe PC (CPython) a firmware-ului de control
+#
+#   python esp32/micropython/sim/run.py --days 3
+#   python esp32/micropython/sim/run.py --days 14 --tick-ms 1000 --out sim.json
+#
+# Ruleaza control.Controller, sensors.Sensors si actuators.Actuators neschimbate, cu
+# stub-uri pentru machine/uasyncio/bme280 (sim/stubs) si un ceas virtual injectat ca
+# modulul `time` al firmware-ului. Senzorii se citesc dupa planul din sampler.py, la
+# perioadele din config.py; iesirile PWM/relee intra in modelul de sera (physics.py).
+# Bucla din main.py si partea de retea (mqtt_bridge, report) nu se simuleaza.
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "stubs"), os.path.join(HERE, "..", "src"), HERE]
+
+import config                      # noqa: E402
+import control                     # noqa: E402
+import machine                     # noqa: E402
+import sampler                     # noqa: E402
+import sensors                     # noqa: E402
+from actuators import Actuators    # noqa: E402
+from clock import VirtualClock     # noqa: E402
+from physics import Greenhouse     # noqa: E402
+
+class LoopStats:
+    # metrici de bucla inchisa, acumulate pe tick (ponderate cu dt)
+    def __init__(self):
+        self.t = 0.0
+        self.temp_abs = 0.0
+        self.temp_sq = 0.0
+        self.temp_in_band = 0.0
+        self.temp_min = None
+        self.temp_max = None
+        self.lux_t = 0.0
+        self.lux_abs = 0.0
+        self.heater = 0.0
+        self.fan = 0.0
+        self.lamp = 0.0
+        self.pump_on = 0.0
+        self.fault_s = 0.0
+        self.fault_events = 0
+        self.watering_cycles = 0
+        self.fill_cycles = 0
+        self.soil_min = None
+        self.hum_res_min = None
+        self._fault = False
+        self._water = False
+        self._fill = False
+
+    def observe(self, dt, ctrl, gh, cmd, out_pct):
+        self.t += dt
+        err = gh.temp_c - ctrl.temp_setpoint()
+        self.temp_abs += abs(err) * dt
+        self.temp_sq += err * err * dt
+        if abs(err) <= config.T_HYST:
+            self.temp_in_band += dt
+        self.temp_min = gh.temp_c if self.temp_min is None else min(self.temp_min, gh.temp_c)
+        self.temp_max = gh.temp_c if self.temp_max is None else max(self.temp_max, gh.temp_c)
+
+        lux_t, _ = ctrl.compute_lamp_target(gh.lux_in, out_pct)
+        if lux_t > 0.1:
+            self.lux_t += dt
+            self.lux_abs += abs(gh.lux_in - lux_t) * dt
+
+        self.heater += cmd["heater"] * dt
+        self.fan += cmd["fan"] * dt
+        self.lamp += cmd["lamp_int"] * dt if cmd["lamp_color"] != "off" else 0.0
+        if cmd["pump"] > 0.0:
+            self.pump_on += dt
+
+        if cmd["basin_fault"]:
+            self.fault_s += dt
+            if not self._fault:
+                self.fault_events += 1
+        self._fault = cmd["basin_fault"]
+        w = bool(cmd["valve_water"])
+        if w and ctrl.water_pulses == 1 and not self._water:
+            self.watering_cycles += 1
+        self._water = w
+        f = bool(cmd["valve_fill_hum"])
+        if f and not self._fill:
+            self.fill_cycles += 1
+        self._fill = f
+
+        self.soil_min = gh.soil_pct if self.soil_min is None else min(self.soil_min, gh.soil_pct)
+        self.hum_res_min = gh.hum_res_pct if self.hum_res_min is None else min(self.hum_res_min, gh.hum_res_pct)
+
+    def result(self):
+        t = max(self.t, 1e-9)
+        r = lambda x, n=3: round(x, n)
+        return {
+            "temp_abs_err_c": r(self.temp_abs / t),
+            "temp_rms_err_c": r((self.temp_sq / t) ** 0.5),
+            "temp_in_band_frac": r(self.temp_in_band / t),
+            "temp_min_c": r(self.temp_min or 0.0, 2),
+            "temp_max_c": r(self.temp_max or 0.0, 2),
+            "lux_abs_err": r(self.lux_abs / self.lux_t if self.lux_t else 0.0, 1),
+            "heater_duty": r(self.heater / t),
+            "fan_duty": r(self.fan / t),
+            "lamp_duty": r(self.lamp / t),
+            "pump_duty": r(self.pump_on / t, 5),
+            "watering_cycles": self.watering_cycles,
+            "fill_cycles": self.fill_cycles,
+            "basin_fault_events": self.fault_events,
+            "basin_fault_h": r(self.fault_s / 3600.0, 2),
+            "soil_min_pct": r(self.soil_min or 0.0, 1),
+            "hum_res_min_pct": r(self.hum_res_min or 0.0, 1),
+        }
+
+def run(days=3.0, tick_ms=config.CONTROL_TICK_MS, start="2026-03-01", seed=0,
+        out_mean_c=12.0, out_amp_c=6.0, refill_days=4.0):
+    t0 = calendar.timegm(time.strptime(start, "%Y-%m-%d"))
+    clock = VirtualClock(t0)
+    for m in (control, sensors, sampler):
+        m.time = clock
+
+    gh = Greenhouse(seed=seed, out_mean_c=out_mean_c, out_amp_c=out_amp_c, refill_days=refill_days)
+    machine.world = gh
+    gh.step(0.0, clock.t)
+
+    act = Actuators()
+    sens = sensors.Sensors()
+    ctrl = control.Controller()
+    store = sampler.SensorStore()
+    act.fail_safe_off()
+
+    # aceeasi planificare ca task-urile din sampler.py, dar sincrona, pe ceasul virtual
+    plan = []
+    for name, keys, read, period_ms in sampler.plan(sens):
+        for k in keys:
+            store.max_age_ms[k] = period_ms * config.SAMPLE_STALE_PERIODS
+        plan.append([0, keys, read, period_ms])
+
+    dt = tick_ms / 1000.0
+    n_ticks = int(days * 86400.0 / dt)
+    stats = LoopStats()
+    tick_s = 0.0
+    tick_max = 0.0
+
+    w0 = time.perf_counter()
+    for _ in range(n_ticks):
+        now = clock.ticks_ms()
+        for p in plan:
+            if now >= p[0]:
+                p[0] = now + p[3]
+                try:
+                    v = p[2]()
+                except Exception:
+                    v = None
+                keys = p[1]
+                if len(keys) == 1:
+                    store.put(keys[0], v, now)
+                else:
+                    for i in range(len(keys)):
+                        store.put(keys[i], None if v is None else v[i], now)
+        s = store.snapshot()
+
+        c0 = time.perf_counter()
+        cmd = ctrl.tick(s, dt)
+        c1 = time.perf_counter() - c0
+        tick_s += c1
+        if c1 > tick_max:
+            tick_max = c1
+
+        act.lamp.set(cmd["lamp_color"], cmd["lamp_int"])
+        act.fan.set(cmd["fan"])
+        act.heater.set(cmd["heater"])
+        act.valve_water.set(bool(cmd["valve_water"]))
+        act.valve_fill_hum.set(bool(cmd["valve_fill_hum"]))
+        act.pump.set(cmd["pump"])
+
+        stats.observe(dt, ctrl, gh, cmd, s.get("out_pct"))
+        clock.advance(dt)
+        gh.step(dt, clock.t)
+    wall = time.perf_counter() - w0
+
+    out = {
+        "days": days,
+        "tick_ms": tick_ms,
+        "ticks": n_ticks,
+        "wall_s": round(wall, 3),
+        "ticks_per_s": round(n_ticks / wall, 1),
+        "sim_speedup": round(days * 86400.0 / wall, 1),
+        "controller_tick_us_avg": round(tick_s / max(n_ticks, 1) * 1e6, 2),
+        "controller_tick_us_max": round(tick_max * 1e6, 2),
+        "basin_refills": gh.refills,
+    }
+    out.update(stats.result())
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Host-side accelerated simulation of the ESP32 control loop")
+    ap.add_argument("--days", type=float, default=3.0)
+    ap.add_argument("--tick-ms", type=int, default=config.CONTROL_TICK_MS)
+    ap.add_argument("--start", default="2026-03-01", help="first simulated day (UTC, YYYY-MM-DD)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out-mean", type=float, default=12.0, help="mean outside temperature, C")
+    ap.add_argument("--out-amp", type=float, default=6.0, help="day/night outside swing, C")
+    ap.add_argument("--refill-days", type=float, default=4.0, help="basin refill interval (0 = never)")
+    ap.add_argument("--out", help="write JSON results here")
+    args = ap.parse_args(argv)
+
+    out = run(args.days, args.tick_ms, args.start, args.seed,
+              args.out_mean, args.out_amp, args.refill_days)
+    print(json.dumps(out, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(out, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+# bme280.py - stub pentru sim/; acelasi format text ca biblioteca de pe ESP32
+import machine
+
+class BME280:
+    def __init__(self, i2c=None, address=0x76):
+        self.address = address
+
+    @property
+    def values(self):
+        t, p, h = machine.world.bme()
+        return ("%.2fC" % t, "%.2fhPa" % p, "%.2f%%" % h)
@@ -0,0 +1,90 @@
+# machine.py - stub CPython pentru sim/ (nu se incarca pe ESP32)
+# Iesirile se tin in registre pe pin (pins, pwm); intrarile (ADC, I2C, ecou HC-SR04)
+# vin din `world`, modelul de sera setat de sim/run.py.
+
+world = None
+pins = {}       # pin -> 0/1 (ultima valoare scrisa)
+pwm = {}        # pin -> duty_u16
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    PULL_DOWN = 3
+
+    def __init__(self, id, mode=-1, pull=None, value=None):
+        self.id = id
+        if value is not None:
+            pins[id] = value
+
+    def value(self, v=None):
+        if v is None:
+            return pins.get(self.id, 0)
+        pins[self.id] = 1 if v else 0
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+class PWM:
+    def __init__(self, pin, freq=0, duty_u16=0):
+        self.pin = pin.id
+        self._freq = freq
+        pwm[self.pin] = duty_u16
+
+    def freq(self, f=None):
+        if f is None:
+            return self._freq
+        self._freq = f
+
+    def duty_u16(self, v=None):
+        if v is None:
+            return pwm[self.pin]
+        pwm[self.pin] = int(v)
+
+    def deinit(self):
+        pwm[self.pin] = 0
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_11DB = 3
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin):
+        self.pin = pin.id
+
+    def atten(self, a):
+        pass
+
+    def width(self, w):
+        pass
+
+    def read(self):
+        return world.adc(self.pin)
+
+    def read_u16(self):
+        return world.adc(self.pin) << 4
+
+class I2C:
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        pass
+
+    def writeto(self, addr, buf):
+        return len(buf)
+
+    def readfrom(self, addr, n):
+        return world.i2c_read(addr, n)
+
+    def scan(self):
+        return []
+
+def time_pulse_us(pin, level, timeout_us=1000000):
+    return world.pulse_us(pin.id, timeout_us)
+
+def unique_id():
+    return b"\x00sim\x00\x01"
+
+def reset():
+    raise SystemExit("machine.reset()")
@@ -0,0 +1,6 @@
+# uasyncio.py - stub pentru sim/
+from asyncio import *     # noqa: F401,F403
+import asyncio as _a
+
+async def sleep_ms(ms):
+    await _a.sleep(ms / 1000.0)
@@ -6,21 +6,39 @@ WIFI_PASS = ""
 
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
-MQTT_CLIENT_ID = "sera-esp32"
+# Sera: primul nivel din toate topicurile (<SITE>/stare/..., <SITE>/comenzi/...).
+# Fiecare sera are SITE propriu; Pi-ul le asculta pe toate prin +/stare/senzori.
+SITE = "sera"
+
+MQTT_CLIENT_ID = SITE + "-esp32"
 MQTT_USER = None
 MQTT_PASS = None
 MQTT_KEEPALIVE = 60
 
-TOPIC_STATE_SENSORS = b"sera/stare/senzori"
-
-TOPIC_CMD_MODE          = b"sera/comenzi/mod"               # "manual" / "auto"
-TOPIC_CMD_FAN           = b"sera/comenzi/ventilator"        # "0".."100"
-TOPIC_CMD_LAMP_POWER    = b"sera/comenzi/lampa/power"       # "on"/"off"
-TOPIC_CMD_LAMP_INTENS   = b"sera/comenzi/lampa/intensity"   # "800" (increase), "400"(decrease)
-TOPIC_CMD_LAMP_COLOR    = b"sera/comenzi/lampa/color"       # "cycle"
-TOPIC_CMD_PUMP_POWER    = b"sera/comenzi/pompa/power"       # "on"/"off"
-TOPIC_CMD_PUMP_SPEED    = b"sera/comenzi/pompa/speed"       # "0".."100"
-TOPIC_CMD_HEATER_LEVEL  = b"sera/comenzi/incalzire/level"   # "0".."100"
+TOPIC_STATE_SENSORS = (SITE + "/stare/senzori").encode()
+TOPIC_STATE_BIN     = (SITE + "/stare/bin").encode()     # format binar v2, 25 B
+TOPIC_STATE_BACKFILL = (SITE + "/stare/backfill").encode()  # loturi v2 din perioadele offline
+
+# Formatul starii publicate: "json" (web-ui + Pi), "bin" (doar v2, doar Pi),
+# "both" (JSON pentru web-ui, v2 pentru Pi; Pi-ul ignora JSON-ul cat timp vine v2)
+STATE_FORMAT = "json"
+
+TOPIC_CMD_MODE          = (SITE + "/comenzi/mod").encode()               # "manual" / "auto"
+TOPIC_CMD_FAN           = (SITE + "/comenzi/ventilator").encode()        # "0".."100"
+TOPIC_CMD_LAMP_POWER    = (SITE + "/comenzi/lampa/power").encode()       # "on"/"off"
+TOPIC_CMD_LAMP_INTENS   = (SITE + "/comenzi/lampa/intensity").encode()   # "800" (increase), "400"(decrease)
+TOPIC_CMD_LAMP_COLOR    = (SITE + "/comenzi/lampa/color").encode()       # "cycle"
+TOPIC_CMD_PUMP_POWER    = (SITE + "/comenzi/pompa/power").encode()       # "on"/"off"
+TOPIC_CMD_PUMP_SPEED    = (SITE + "/comenzi/pompa/speed").encode()       # "0".."100"
+TOPIC_CMD_HEATER_LEVEL  = (SITE + "/comenzi/incalzire/level").encode()   # "0".."100"
+
+# --- Offline: inel de esantioane v2 (25 B fiecare), trimis dupa reconectare ---
+# 720 x 25 B = 18 KB, alocati o data la pornire; plin = se suprascrie cel mai vechi.
+# Cu report by exception un esantion e o schimbare, deci inelul acopera ore, nu minute.
+BACKFILL_SLOTS = 720
+BACKFILL_BATCH = 20          # inregistrari per mesaj (500 B)
+BACKFILL_MS = 500            # cel mult un lot la atatea ms; comenzile au restul timpului
+MQTT_RETRY_MS = 5000         # reconectare la broker, cel mult o incercare la atatea ms
 
 # --- Time ---
 # MicroPython e UTC dupa ntptime.settime(). Pentru Romania (iarna) pune +2.
@@ -49,6 +67,39 @@ PIN_VALVE_WATER    = 14  # Relay active-LOW (udare flori)
 # --- Ultrasonic (bazin principal) ---
 PIN_TRIG = 32
 PIN_ECHO = 33
+# ecoul vine in ~58 us/cm; 6 ms = ~1 m, peste adancimea bazinului
+# (time_pulse_us blocheaza tot ESP32 pana la timeout)
+BASIN_ECHO_TIMEOUT_US = 6000
+
+# --- Esantionare: un task uasyncio per senzor, fiecare cu perioada lui (ms) ---
+SAMPLE_MS_BME = 2000
+SAMPLE_MS_LUX_IN = 250       # bucla lampii
+SAMPLE_MS_OUT_LUX = 1000
+SAMPLE_MS_SOIL = 30000       # se schimba in ore
+SAMPLE_MS_HUM_RES = 5000
+SAMPLE_MS_BASIN = 1000       # protectia pompei
+SAMPLE_STALE_PERIODS = 3     # valoare mai veche de N perioade = lipsa (None)
+
+# bucla de control citeste ultimele valori, fara sa astepte senzorii
+CONTROL_TICK_MS = 250
+
+# --- Publicarea starii (report by exception) ---
+# Schimbarea modului sau a unui actuator (fan_pct, lamp_power) se publica imediat.
+# Senzorii se publica doar cand ies din banda fata de ultima valoare trimisa, dar
+# nu mai des de STATE_PUBLISH_MS; doar campurile schimbate + mode/fan_pct/lamp_power.
+# La STATE_HEARTBEAT_MS se trimite starea completa (cu ip), ca semn de viata.
+STATE_PUBLISH_MS = 1000
+STATE_HEARTBEAT_MS = 60000
+STATE_DEADBAND = {
+    "temp": 0.1,     # C
+    "light": 20.0,   # lux
+    "soil": 1.0,     # %
+    "water": 1.0,    # %
+}
+
+# comenzi MQTT: la fiecare tick se citesc toate mesajele sosite (cel mult atatea),
+# se pastreaza ultima valoare per topic si se aplica o singura data inainte de control
+CMD_DRAIN_MAX = 32
 
 # --- ADC (ADC1 recommended) ---
 PIN_SOIL = 39        # VN
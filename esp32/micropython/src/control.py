@@ -73,7 +73,8 @@ class Controller:
 
         return lux_t, color
 
-    def lamp_control(self, lux_in, out_pct):
+    def lamp_control(self, lux_in, out_pct, dt=1.0):
+        # dt = secunde de la tick-ul anterior; castigul si rampa sunt "pe secunda"
         lux_t, color = self.compute_lamp_target(lux_in, out_pct)
         if lux_t <= 0.1 or lux_in is None:
             if lux_t > 0.1:
@@ -84,10 +85,10 @@ class Controller:
                 color = "off"
         else:
             err = lux_t - lux_in
-            target_int = self.lamp_int + config.LAMP_KP * err
+            target_int = self.lamp_int + config.LAMP_KP * err * dt
             target_int = clamp(target_int, config.LAMP_MIN_INT, config.LAMP_MAX_INT)
 
-        step = config.LAMP_RAMP_PER_S
+        step = config.LAMP_RAMP_PER_S * dt
         if target_int > self.lamp_int:
             self.lamp_int = min(self.lamp_int + step, target_int)
         else:
@@ -191,10 +192,10 @@ class Controller:
 
         return False, 0.0, False
 
-    def tick_auto(self, s):
+    def tick_auto(self, s, dt=1.0):
         self.update_basin_fault(s.get("basin_cm"))
 
-        lamp_color, lamp_int = self.lamp_control(s.get("lux_in"), s.get("out_pct"))
+        lamp_color, lamp_int = self.lamp_control(s.get("lux_in"), s.get("out_pct"), dt)
         heater, fan = self.heater_and_fan_control(s.get("temp_c"), s.get("rh"))
 
         water_valve, water_pump, watering_active = self.watering_step(s.get("soil_pct"))
@@ -226,7 +227,7 @@ class Controller:
             "basin_fault": self.basin_fault,
         }
 
-    def tick(self, s):
+    def tick(self, s, dt=1.0):
         # basin protection se aplica in ambele moduri
         self.update_basin_fault(s.get("basin_cm"))
 
@@ -242,4 +243,4 @@ class Controller:
                 cmd["pump"] = 0.0
             return cmd
 
-        return self.tick_auto(s)
+        return self.tick_auto(s, dt)
@@ -8,6 +8,8 @@ from actuators import Actuators
 from sensors import Sensors
 from control import Controller
 from mqtt_bridge import wifi_connect, get_ip, MqttBridge
+from sampler import SensorStore, start_sampling
+from report import StateReporter
 
 def _safe_float(x):
     try:
@@ -39,32 +41,27 @@ async def loop():
 
     act.fail_safe_off()
 
-    last_pub = 0
+    # senzorii se citesc in task-uri proprii; aici doar ultimele valori
+    store = SensorStore()
+    start_sampling(sens, store)
+
+    reporter = StateReporter()
+    last_tick = time.ticks_ms()
 
     while True:
-        # --- MQTT poll (comenzi UI) ---
+        t0 = time.ticks_ms()
+        dt = time.ticks_diff(t0, last_tick) / 1000.0
+        last_tick = t0
+
+        # --- MQTT: toate comenzile sosite, ultima valoare per topic ---
         mqtt.reconnect_if_needed()
+        mqtt.apply_commands()
 
-        # --- read sensors ---
-        temp_c, rh = sens.read_bme()
-        lux_in = sens.read_lux_in()
-        out_pct = sens.read_out_lux_pct()
-        soil_pct = sens.read_soil_pct()
-        hum_res_pct = sens.read_hum_res_pct()
-        basin_cm = sens.read_basin_dist_cm()
-
-        s = {
-            "temp_c": temp_c,
-            "rh": rh,
-            "lux_in": lux_in,
-            "out_pct": out_pct,
-            "soil_pct": soil_pct,
-            "hum_res_pct": hum_res_pct,
-            "basin_cm": basin_cm,
-        }
+        # --- ultimele valori (None = lipsa sau prea vechi) ---
+        s = store.snapshot()
 
         # --- control ---
-        cmd = ctrl.tick(s)
+        cmd = ctrl.tick(s, dt)
 
         # --- apply ---
         act.lamp.set(cmd["lamp_color"], cmd["lamp_int"])
@@ -74,31 +71,38 @@ async def loop():
         act.valve_water.set(bool(cmd["valve_water"]))
         act.valve_fill_hum.set(bool(cmd["valve_fill_hum"]))
         act.pump.set(cmd["pump"])
-
-        # --- publish state to match site expectations ---
-        now = time.time()
-        if (now - last_pub) >= 1:
-            last_pub = now
-
-            # UI expects: temp, light, soil, water, mode, (optional) ip, fan_pct, lamp_power
-            mode_str = "manual" if ctrl.mode == "MANUAL" else "auto"
-
-            lamp_power = 1 if (cmd["lamp_color"] != "off" and cmd["lamp_int"] > 0.01) else 0
-            fan_pct = int(max(0.0, min(1.0, cmd["fan"])) * 100.0)
-
-            payload = {
-                "temp": _safe_float(temp_c),
-                "light": _safe_float(lux_in),
-                "soil": _safe_float(soil_pct),
-                "water": _safe_float(hum_res_pct),   # water level din UI = rezervor umidificator (%)
-                "mode": mode_str,
-                "fan_pct": fan_pct,
-                "lamp_power": lamp_power,
-                "ip": get_ip(),
-            }
-            mqtt.publish_state(payload)
-
-        await asyncio.sleep(1)
+        mqtt.actuated()
+
+        # --- publish state to match site expectations (doar la schimbari + heartbeat) ---
+        # UI expects: temp, light, soil, water, mode, (optional) ip, fan_pct, lamp_power
+        mode_str = "manual" if ctrl.mode == "MANUAL" else "auto"
+
+        lamp_power = 1 if (cmd["lamp_color"] != "off" and cmd["lamp_int"] > 0.01) else 0
+        fan_pct = int(max(0.0, min(1.0, cmd["fan"])) * 100.0)
+
+        payload = {
+            "temp": _safe_float(s.get("temp_c")),
+            "light": _safe_float(s.get("lux_in")),
+            "soil": _safe_float(s.get("soil_pct")),
+            "water": _safe_float(s.get("hum_res_pct")),   # water level din UI = rezervor umidificator (%)
+            "mode": mode_str,
+            "fan_pct": fan_pct,
+            "lamp_power": lamp_power,
+        }
+        if mqtt.resync:
+            mqtt.resync = False
+            reporter.reset()
+        keys = reporter.due(payload, time.ticks_ms())
+        if keys is not None:
+            if not keys:
+                payload["ip"] = get_ip()
+            mqtt.publish_state(payload, keys)
+
+        # --- esantioanele din perioada offline, cate un lot ---
+        mqtt.backfill()
+
+        left = config.CONTROL_TICK_MS - time.ticks_diff(time.ticks_ms(), t0)
+        await asyncio.sleep_ms(left if left > 0 else 0)
 
 try:
     asyncio.run(loop())
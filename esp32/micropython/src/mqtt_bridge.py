@@ -3,12 +3,66 @@ import time
 import network
 import ubinascii
 import ujson as json
-from umqtt.robust import MQTTClient
+import uselect
+import ustruct
+from umqtt.simple import MQTTClient
 import config
 
 def _b(x):
     return x if isinstance(x, bytes) else x.encode()
 
+# Stare binara v2, aceeasi structura ca raspberry-pi/scripts/payload_codec.py:
+# versiune, flags (bit0 AUTO, bit1 lampa), seq u16, ts u32 (epoch Unix, 0 = ceas nesetat),
+# temp/light/soil/water f32 (NaN = lipsa), fan_pct u8 (255 = lipsa). 25 B, little-endian.
+_V2_FMT = "<BBHIffffB"
+_NAN = float("nan")
+# MicroPython pe ESP32 numara de la 2000-01-01; pe Pi ts-ul e epoch Unix
+_EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
+_V2_SIZE = ustruct.calcsize(_V2_FMT)
+
+def _f(x):
+    return _NAN if x is None else x
+
+def _pack_v2_into(buf, off, d, seq):
+    flags = (1 if d["mode"] == "auto" else 0) | (2 if d["lamp_power"] else 0)
+    fan = d["fan_pct"]
+    ts = time.time() + _EPOCH_OFFSET
+    if ts < 1000000000:
+        ts = 0
+    ustruct.pack_into(_V2_FMT, buf, off, 2, flags, seq & 0xFFFF, ts,
+                      _f(d["temp"]), _f(d["light"]), _f(d["soil"]), _f(d["water"]),
+                      255 if fan is None else fan)
+
+class StateRing:
+    # Inel de inregistrari v2 cu lungime fixa, intr-un singur bytearray alocat la pornire.
+    # push() impacheteaza direct in slot (pack_into), deci nu aloca nimic per esantion;
+    # batch() intoarce un memoryview peste inregistrari consecutive, fara copie.
+    def __init__(self, slots):
+        self.slots = slots
+        self.buf = bytearray(slots * _V2_SIZE)
+        self._mv = memoryview(self.buf)
+        self.head = 0           # urmatorul slot de scris
+        self.count = 0
+        self.overwritten = 0
+
+    def push(self, d, seq):
+        _pack_v2_into(self.buf, self.head * _V2_SIZE, d, seq)
+        self.head = (self.head + 1) % self.slots
+        if self.count < self.slots:
+            self.count += 1
+        else:
+            self.overwritten += 1
+
+    def batch(self, n):
+        # cele mai vechi n inregistrari (mai putine daca inelul se rupe la capat)
+        tail = (self.head - self.count) % self.slots
+        n = min(n, self.count, self.slots - tail)
+        return self._mv[tail * _V2_SIZE:(tail + n) * _V2_SIZE], n
+
+    def drop(self, n):
+        self.count -= n
+
 def wifi_connect():
     sta = network.WLAN(network.STA_IF)
     if not sta.active():
@@ -32,14 +86,45 @@ class MqttBridge:
     def __init__(self, controller):
         self.ctrl = controller
         self.client = None
+        self._poller = None
+        self.online = False
+        self._t_retry = time.ticks_ms()
+        # buffer prealocat: v2 nu aloca la fiecare publicare
+        self._v2 = bytearray(_V2_SIZE)
+        self.seq = 0
+        # esantioane nepublicate (offline), trimise apoi pe TOPIC_STATE_BACKFILL
+        self.ring = StateRing(config.BACKFILL_SLOTS)
+        self._t_backfill = time.ticks_ms()
+        self.buffered = 0
+        self.backfilled = 0
+        self.reconnects = 0
+        self.resync = False         # dupa reconectare: main trimite starea completa
+        # comenzi sosite in tick-ul curent: topic -> ultima valoare
+        # (intensitate: suma delta-urilor, culoare: numar de "cycle")
+        self._pending = {}
+        self._t_first = None        # ticks_ms al celei mai vechi comenzi neaplicate
+        self._order = (
+            config.TOPIC_CMD_MODE,
+            config.TOPIC_CMD_FAN,
+            config.TOPIC_CMD_HEATER_LEVEL,
+            config.TOPIC_CMD_PUMP_POWER,
+            config.TOPIC_CMD_PUMP_SPEED,
+            config.TOPIC_CMD_LAMP_POWER,
+            config.TOPIC_CMD_LAMP_INTENS,
+            config.TOPIC_CMD_LAMP_COLOR,
+        )
+        self.cmd_received = 0
+        self.cmd_coalesced = 0
+        self.cmd_applied = 0
+        self.cmd_lat_ms_max = 0
 
     def connect(self):
         cid = config.MQTT_CLIENT_ID
-        if cid == "sera-esp32":
-            # stabil, dar diferit pe device
+        if cid == config.SITE + "-esp32":
+            # id-ul implicit: stabil, dar diferit pe device (si prefixat cu sera)
             try:
                 import machine
-                cid = "sera-" + ubinascii.hexlify(machine.unique_id()).decode()
+                cid = config.SITE + "-" + ubinascii.hexlify(machine.unique_id()).decode()
             except Exception:
                 pass
 
@@ -52,8 +137,30 @@ class MqttBridge:
             keepalive=config.MQTT_KEEPALIVE
         )
         self.client.set_callback(self._on_msg)
-        self.client.connect()
+        self._open()
 
+    def _open(self):
+        # o singura incercare; umqtt.robust ar bloca bucla pana revine broker-ul,
+        # iar intre timp esantioanele merg in inel
+        self._t_retry = time.ticks_ms()
+        if self.client.sock:
+            try:
+                self.client.sock.close()
+            except Exception:
+                pass
+        try:
+            self.client.connect()
+            self._subscribe()
+            # socket nou la fiecare conectare; poll() intreaba prin el daca mai sunt date
+            self._poller = uselect.poll()
+            self._poller.register(self.client.sock, uselect.POLLIN)
+        except Exception:
+            self.online = False
+            return False
+        self.online = True
+        return True
+
+    def _subscribe(self):
         # subscribe exact ca in site
         self.client.subscribe(config.TOPIC_CMD_MODE)
         self.client.subscribe(config.TOPIC_CMD_FAN)
@@ -74,8 +181,48 @@ class MqttBridge:
             return default
 
     def _on_msg(self, topic, msg):
+        # doar se noteaza; aplicarea e in apply_commands(), o data pe tick
         t = topic
         p = msg.decode().strip().lower()
+        now = time.ticks_ms()
+        self.cmd_received += 1
+        pend = self._pending
+
+        if t == config.TOPIC_CMD_LAMP_INTENS:
+            # relativ (+/-): se aduna, nu se suprascrie
+            ms = self._parse_int(p, 0, 5000, None)
+            if ms is None:
+                return
+            # conventie fixa pentru UI-ul tau: 800 = creste, 400 = scade
+            delta = config.LAMP_UI_STEP_PER_SEC * (ms / 1000.0)
+            prev = pend.get(t)
+            pend[t] = (prev or 0.0) + (delta if ms >= 600 else -delta)
+        elif t == config.TOPIC_CMD_LAMP_COLOR:
+            # fiecare "cycle" avanseaza o culoare: se numara
+            if p != "cycle":
+                return
+            prev = pend.get(t)
+            pend[t] = (prev or 0) + 1
+        else:
+            prev = pend.get(t)
+            pend[t] = p
+            # power venit dupa ajustari le anuleaza, ca la aplicarea in ordinea sosirii
+            if t == config.TOPIC_CMD_LAMP_POWER:
+                for k in (config.TOPIC_CMD_LAMP_INTENS, config.TOPIC_CMD_LAMP_COLOR):
+                    if k in pend:
+                        del pend[k]
+                        self.cmd_coalesced += 1
+            elif t == config.TOPIC_CMD_PUMP_POWER and config.TOPIC_CMD_PUMP_SPEED in pend:
+                del pend[config.TOPIC_CMD_PUMP_SPEED]
+                self.cmd_coalesced += 1
+
+        if prev is not None:
+            self.cmd_coalesced += 1
+        if self._t_first is None:
+            self._t_first = now
+
+    def _apply_one(self, t, p):
+        m = self.ctrl.manual
 
         # --- mode ---
         if t == config.TOPIC_CMD_MODE:
@@ -89,103 +236,181 @@ class MqttBridge:
         if t == config.TOPIC_CMD_FAN:
             v = self._parse_int(p, 0, 100, None)
             if v is not None:
-                self.ctrl.manual["fan"] = v / 100.0
+                m["fan"] = v / 100.0
             return
 
         # --- heater ---
         if t == config.TOPIC_CMD_HEATER_LEVEL:
             v = self._parse_int(p, 0, 100, None)
             if v is not None:
-                self.ctrl.manual["heater"] = v / 100.0
+                m["heater"] = v / 100.0
             return
 
         # --- pump power ---
         if t == config.TOPIC_CMD_PUMP_POWER:
             if p == "on":
                 # daca nu ai speed setata, ramai pe ultima
-                if self.ctrl.manual["pump"] <= 0.0:
-                    self.ctrl.manual["pump"] = 0.7
+                if m["pump"] <= 0.0:
+                    m["pump"] = 0.7
                 # UI nu are valve; alegem implicit udare
-                self.ctrl.manual["valve_water"] = True
-                self.ctrl.manual["valve_fill_hum"] = False
+                m["valve_water"] = True
+                m["valve_fill_hum"] = False
             elif p == "off":
-                self.ctrl.manual["pump"] = 0.0
-                self.ctrl.manual["valve_water"] = False
-                self.ctrl.manual["valve_fill_hum"] = False
+                m["pump"] = 0.0
+                m["valve_water"] = False
+                m["valve_fill_hum"] = False
             return
 
         # --- pump speed ---
         if t == config.TOPIC_CMD_PUMP_SPEED:
             v = self._parse_int(p, 0, 100, None)
             if v is not None:
-                self.ctrl.manual["pump"] = v / 100.0
+                m["pump"] = v / 100.0
                 # daca speed > 0, asigura o valva implicita
-                if self.ctrl.manual["pump"] > 0.0:
-                    self.ctrl.manual["valve_water"] = True
-                    self.ctrl.manual["valve_fill_hum"] = False
+                if m["pump"] > 0.0:
+                    m["valve_water"] = True
+                    m["valve_fill_hum"] = False
             return
 
         # --- lamp power ---
         if t == config.TOPIC_CMD_LAMP_POWER:
             if p == "on":
-                if self.ctrl.manual["lamp_int"] <= 0.01:
-                    self.ctrl.manual["lamp_int"] = 0.35
-                if self.ctrl.manual.get("lamp_color") in (None, "off"):
-                    self.ctrl.manual["lamp_color"] = "violet"
+                if m["lamp_int"] <= 0.01:
+                    m["lamp_int"] = 0.35
+                if m.get("lamp_color") in (None, "off"):
+                    m["lamp_color"] = "violet"
             elif p == "off":
-                self.ctrl.manual["lamp_int"] = 0.0
-                self.ctrl.manual["lamp_color"] = "off"
+                m["lamp_int"] = 0.0
+                m["lamp_color"] = "off"
             return
 
-        # --- lamp intensity (UI: 800 = increase, 400 = decrease) ---
+        # --- lamp intensity: p = suma delta-urilor sosite in tick ---
         if t == config.TOPIC_CMD_LAMP_INTENS:
-            ms = self._parse_int(p, 0, 5000, None)
-            if ms is None:
-                return
-            # conventie fixa pentru UI-ul tau:
-            inc = (ms >= 600)
-            delta = config.LAMP_UI_STEP_PER_SEC * (ms / 1000.0)
-            cur = float(self.ctrl.manual.get("lamp_int", 0.0))
-            cur = cur + delta if inc else cur - delta
+            cur = float(m.get("lamp_int", 0.0)) + p
             if cur < 0.0: cur = 0.0
             if cur > 1.0: cur = 1.0
-            self.ctrl.manual["lamp_int"] = cur
+            m["lamp_int"] = cur
             if cur <= 0.01:
-                self.ctrl.manual["lamp_color"] = "off"
-            elif self.ctrl.manual.get("lamp_color") == "off":
-                self.ctrl.manual["lamp_color"] = "violet"
+                m["lamp_color"] = "off"
+            elif m.get("lamp_color") == "off":
+                m["lamp_color"] = "violet"
             return
 
-        # --- lamp color cycle ---
+        # --- lamp color cycle: p = numarul de "cycle" sosite ---
         if t == config.TOPIC_CMD_LAMP_COLOR:
-            if p == "cycle":
-                seq = ["violet", "red", "blue"]
-                cur = self.ctrl.manual.get("lamp_color", "violet")
-                if cur not in seq:
-                    cur = "violet"
-                nxt = seq[(seq.index(cur) + 1) % len(seq)]
-                self.ctrl.manual["lamp_color"] = nxt
-                if self.ctrl.manual.get("lamp_int", 0.0) <= 0.01:
-                    self.ctrl.manual["lamp_int"] = 0.35
+            seq = ["violet", "red", "blue"]
+            cur = m.get("lamp_color", "violet")
+            if cur not in seq:
+                cur = "violet"
+            m["lamp_color"] = seq[(seq.index(cur) + p) % len(seq)]
+            if m.get("lamp_int", 0.0) <= 0.01:
+                m["lamp_int"] = 0.35
             return
 
     def poll(self):
-        if self.client:
-            # non-blocking; proceseaza 0 sau 1 mesaj
+        if not self.client:
+            return
+        # non-blocking; check_msg() citeste cel mult un pachet (comanda, PINGRESP, ...)
+        # si intoarce None si cand nu era nimic, deci golim cat timp socket-ul
+        # mai are octeti de citit, nu pana la primul pachet fara callback
+        for _ in range(config.CMD_DRAIN_MAX):
             self.client.check_msg()
+            if self._poller is None or not self._poller.poll(0):
+                break
+
+    def apply_commands(self):
+        # o singura trecere, in ordinea din self._order (mod, apoi power, apoi reglaje)
+        pend = self._pending
+        if not pend:
+            return 0
+        n = 0
+        for t in self._order:
+            if t in pend:
+                self._apply_one(t, pend[t])
+                n += 1
+        pend.clear()
+        self.cmd_applied += n
+        return n
 
-    def publish_state(self, payload_dict):
+    def actuated(self):
+        # apelat dupa ce iesirile au fost scrise: comanda -> actuare, cel mai rau caz
+        if self._t_first is None:
+            return
+        dt = time.ticks_diff(time.ticks_ms(), self._t_first)
+        self._t_first = None
+        if dt > self.cmd_lat_ms_max:
+            self.cmd_lat_ms_max = dt
+
+    def _pack_v2(self, d):
+        _pack_v2_into(self._v2, 0, d, self.seq)
+        self.seq += 1
+        return self._v2
+
+    def publish_state(self, payload_dict, keys=None):
+        # keys: campurile din JSON (StateReporter.due); None/() = tot payload-ul
         if not self.client:
             return
-        b = json.dumps(payload_dict)
-        self.client.publish(config.TOPIC_STATE_SENSORS, b)
+        if not self.online:
+            self._buffer(payload_dict)
+            return
+        fmt = config.STATE_FORMAT
+        sent = False
+        try:
+            if fmt != "json":
+                self.client.publish(config.TOPIC_STATE_BIN, self._pack_v2(payload_dict))
+                sent = True
+            if fmt != "bin":
+                d = {k: payload_dict[k] for k in keys} if keys else payload_dict
+                self.client.publish(config.TOPIC_STATE_SENSORS, json.dumps(d))
+        except OSError:
+            self.online = False
+            if not sent:
+                self._buffer(payload_dict)
 
-    def reconnect_if_needed(self):
+    def _buffer(self, d):
+        # starea completa (pentru Pi), cu ts-ul de acum
+        self.ring.push(d, self.seq)
+        self.seq += 1
+        self.buffered += 1
+
+    def backfill(self):
+        # un lot din inel pe tick, cel mult o data la BACKFILL_MS, doar cand suntem online
+        if not self.online or not self.ring.count:
+            return
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._t_backfill) < config.BACKFILL_MS:
+            return
+        self._t_backfill = now
+        mv, n = self.ring.batch(config.BACKFILL_BATCH)
         try:
-            self.poll()
-        except Exception:
+            self.client.publish(config.TOPIC_STATE_BACKFILL, mv)
+        except OSError:
+            self.online = False
+            return
+        self.ring.drop(n)
+        self.backfilled += n
+
+    def reconnect_if_needed(self):
+        if self.online:
             try:
-                self.client.reconnect()
-            except Exception:
-                # lasa main sa continue; se va incerca iar la urmatorul tick
-                pass
+                self.poll()
+                return
+            except OSError:
+                self.online = False
+        # offline: o incercare la MQTT_RETRY_MS, ca bucla de control sa nu se blocheze
+        if time.ticks_diff(time.ticks_ms(), self._t_retry) < config.MQTT_RETRY_MS:
+            return
+        if not network.WLAN(network.STA_IF).isconnected():
+            self._t_retry = time.ticks_ms()
+            return
+        if self._open():
+            self.reconnects += 1
+            # sesiune noua: trimitem starea completa la urmatorul tick
+            self.resync = True
+
+    def stats(self):
+        return {"received": self.cmd_received, "coalesced": self.cmd_coalesced,
+                "applied": self.cmd_applied, "lat_ms_max": self.cmd_lat_ms_max,
+                "online": self.online, "reconnects": self.reconnects,
+                "buffered": self.buffered, "backfilled": self.backfilled,
+                "ring": self.ring.count, "overwritten": self.ring.overwritten}
@@ -0,0 +1,61 @@
+# report.py
+import time
+import config
+
+# Publicare "report by exception": decide la fiecare tick daca starea se trimite
+# si ce campuri intra in JSON. v2 ramane mereu complet (lungime fixa).
+
+ACTUATOR_KEYS = ("mode", "fan_pct", "lamp_power")
+SENSOR_KEYS = ("temp", "light", "soil", "water")
+
+class StateReporter:
+    def __init__(self):
+        self.last = {}          # ultima valoare publicata, per camp
+        self.t_pub = None
+        self.t_full = None
+        # diagnoza
+        self.published = 0
+        self.full = 0
+        self.skipped = 0
+
+    def reset(self):
+        # urmatorul due() trimite starea completa (ex. dupa reconectare)
+        self.t_full = None
+
+    def _moved(self, k, v):
+        old = self.last.get(k)
+        if v is None or old is None:
+            return v is not old
+        return abs(v - old) >= config.STATE_DEADBAND.get(k, 0.0)
+
+    def due(self, payload, now_ms):
+        # None = nu se publica; () = stare completa; altfel cheile pentru JSON
+        if self.t_full is None or time.ticks_diff(now_ms, self.t_full) >= config.STATE_HEARTBEAT_MS:
+            self.t_full = now_ms
+            self.t_pub = now_ms
+            for k in ACTUATOR_KEYS + SENSOR_KEYS:
+                self.last[k] = payload.get(k)
+            self.published += 1
+            self.full += 1
+            return ()
+
+        act = False
+        for k in ACTUATOR_KEYS:
+            if payload.get(k) != self.last.get(k):
+                act = True
+        moved = [k for k in SENSOR_KEYS if self._moved(k, payload.get(k))]
+        if moved and not act and time.ticks_diff(now_ms, self.t_pub) < config.STATE_PUBLISH_MS:
+            moved = []
+        if not act and not moved:
+            self.skipped += 1
+            return None
+
+        self.t_pub = now_ms
+        keys = ACTUATOR_KEYS + tuple(moved)
+        for k in keys:
+            self.last[k] = payload.get(k)
+        self.published += 1
+        return keys
+
+    def stats(self):
+        return {"published": self.published, "full": self.full, "skipped": self.skipped}
@@ -0,0 +1,86 @@
+# sampler.py
+import time
+import uasyncio as asyncio
+import config
+
+# Fiecare senzor are propriul task uasyncio si propria perioada (config.SAMPLE_MS_*).
+# Task-urile scriu in SensorStore ultima valoare + momentul citirii; bucla de control
+# citeste snapshot() fara sa astepte vreun senzor. O valoare mai veche de
+# SAMPLE_STALE_PERIODS perioade e raportata None (senzor blocat / deconectat),
+# exact ca o citire esuata.
+
+class SensorStore:
+    def __init__(self):
+        self.values = {}
+        self.t_ms = {}
+        self.max_age_ms = {}
+        # diagnoza per task: numar citiri, erori, cea mai lunga citire (us)
+        self.reads = {}
+        self.errors = {}
+        self.read_us_max = {}
+
+    def put(self, key, value, now_ms):
+        self.values[key] = value
+        self.t_ms[key] = now_ms
+
+    def get(self, key, now_ms=None):
+        v = self.values.get(key)
+        if v is None:
+            return None
+        if now_ms is None:
+            now_ms = time.ticks_ms()
+        if time.ticks_diff(now_ms, self.t_ms[key]) > self.max_age_ms.get(key, 0):
+            return None
+        return v
+
+    def snapshot(self):
+        now = time.ticks_ms()
+        return {k: self.get(k, now) for k in self.values}
+
+    def stats(self):
+        return {"reads": self.reads, "errors": self.errors, "read_us_max": self.read_us_max}
+
+async def _sample(store, name, keys, read, period_ms):
+    store.reads[name] = 0
+    store.errors[name] = 0
+    store.read_us_max[name] = 0
+    while True:
+        t0 = time.ticks_ms()
+        u0 = time.ticks_us()
+        try:
+            v = read()
+        except Exception:
+            v = None
+            store.errors[name] += 1
+        du = time.ticks_diff(time.ticks_us(), u0)
+        if du > store.read_us_max[name]:
+            store.read_us_max[name] = du
+        store.reads[name] += 1
+
+        if len(keys) == 1:
+            store.put(keys[0], v, t0)
+        else:
+            for i in range(len(keys)):
+                store.put(keys[i], None if v is None else v[i], t0)
+
+        left = period_ms - time.ticks_diff(time.ticks_ms(), t0)
+        await asyncio.sleep_ms(left if left > 0 else 0)
+
+def plan(sens):
+    # (nume, chei in snapshot, functia de citire, perioada ms); folosit si de sim/
+    return (
+        ("bme", ("temp_c", "rh"), sens.read_bme, config.SAMPLE_MS_BME),
+        ("lux_in", ("lux_in",), sens.read_lux_in, config.SAMPLE_MS_LUX_IN),
+        ("out_lux", ("out_pct",), sens.read_out_lux_pct, config.SAMPLE_MS_OUT_LUX),
+        ("soil", ("soil_pct",), sens.read_soil_pct, config.SAMPLE_MS_SOIL),
+        ("hum_res", ("hum_res_pct",), sens.read_hum_res_pct, config.SAMPLE_MS_HUM_RES),
+        ("basin", ("basin_cm",), sens.read_basin_dist_cm, config.SAMPLE_MS_BASIN),
+    )
+
+def start_sampling(sens, store):
+    tasks = []
+    for name, keys, read, period_ms in plan(sens):
+        for k in keys:
+            store.max_age_ms[k] = period_ms * config.SAMPLE_STALE_PERIODS
+        tasks.append(asyncio.create_task(_sample(store, name, keys, read, period_ms)))
+    return tasks
@@ -3,6 +3,14 @@ import time
 from machine import ADC, Pin, I2C, time_pulse_us
 import config
 
+# alpha-urile EMA de mai jos sunt reglate pentru o citire pe secunda (ritmul buclei
+# dinainte de sampler.py); scalate la perioada fiecarui senzor (SAMPLE_MS_*),
+# constanta de timp a filtrului ramane aceeasi
+EMA_REF_MS = 1000
+
+def ema_alpha(alpha, period_ms):
+    return 1.0 - (1.0 - alpha) ** (period_ms / EMA_REF_MS)
+
 def clamp(x, lo, hi):
     return lo if x < lo else hi if x > hi else x
 
@@ -58,6 +66,11 @@ class Sensors:
             a.width(ADC.WIDTH_12BIT)
 
         # filtre EMA
+        self._a_lux_in = ema_alpha(0.2, config.SAMPLE_MS_LUX_IN)
+        self._a_out = ema_alpha(0.2, config.SAMPLE_MS_OUT_LUX)
+        self._a_soil = ema_alpha(0.25, config.SAMPLE_MS_SOIL)
+        self._a_hum_res = ema_alpha(0.25, config.SAMPLE_MS_HUM_RES)
+        self._a_dist = ema_alpha(0.3, config.SAMPLE_MS_BASIN)
         self._lux_in_f = None
         self._out_pct_f = None
         self._soil_pct_f = None
@@ -83,13 +96,13 @@ class Sensors:
             x = self.bh.lux()
         except Exception:
             return None
-        self._lux_in_f = self._ema(self._lux_in_f, x, alpha=0.2)
+        self._lux_in_f = self._ema(self._lux_in_f, x, alpha=self._a_lux_in)
         return self._lux_in_f
 
     def read_out_lux_pct(self):
         adc = self.adc_outlux.read()
         pct = 100.0 * adc / 4095.0
-        self._out_pct_f = self._ema(self._out_pct_f, pct, alpha=0.2)
+        self._out_pct_f = self._ema(self._out_pct_f, pct, alpha=self._a_out)
         return self._out_pct_f
 
     def read_soil_pct(self):
@@ -104,13 +117,13 @@ class Sensors:
         else:
             pct = 100.0 * (adc - dr) / (wt - dr)
 
-        self._soil_pct_f = self._ema(self._soil_pct_f, pct, alpha=0.25)
+        self._soil_pct_f = self._ema(self._soil_pct_f, pct, alpha=self._a_soil)
         return self._soil_pct_f
 
     def read_hum_res_pct(self):
         adc = self.adc_hum_res.read()
         pct = pct_from_adc(adc, config.HUM_RES_ADC_EMPTY, config.HUM_RES_ADC_FULL)
-        self._hum_res_pct_f = self._ema(self._hum_res_pct_f, pct, alpha=0.25)
+        self._hum_res_pct_f = self._ema(self._hum_res_pct_f, pct, alpha=self._a_hum_res)
         return self._hum_res_pct_f
 
     def read_basin_dist_cm(self):
@@ -121,11 +134,11 @@ class Sensors:
         self.trig.value(0)
 
         try:
-            t = time_pulse_us(self.echo, 1, 30000)  # 30ms timeout
+            t = time_pulse_us(self.echo, 1, config.BASIN_ECHO_TIMEOUT_US)
             if t < 0:
                 return None
             cm = t / 58.0
-            self._dist_cm_f = self._ema(self._dist_cm_f, cm, alpha=0.3)
+            self._dist_cm_f = self._ema(self._dist_cm_f, cm, alpha=self._a_dist)
             return self._dist_cm_f
         except OSError:
             return None
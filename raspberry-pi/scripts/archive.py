@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+from db import TELEMETRY_COLUMNS, month_of, partition_table, partition_ddl, connect
+
+# Arhiva rece: o lună = un director cu bucăți .npz comprimate, pe coloane, de cel mult
+# chunk_rows rânduri fiecare, înregistrate în telemetry_archive_parts (interval de id și ts).
+# Fiecare bucată are vocabularul ei, deci datele întârziate dintr-o lună deja arhivată
+# adaugă doar o bucată nouă, fără să recitească arhiva veche.
+# Senzorii și fan_pct sunt float32 (NaN = NULL) - exact ce vede oricum featurize;
+# topic/mode/ip sunt codificate prin dicționar (cod -1 = NULL).
+# Payload-ul JSON brut nu se păstrează: coloanele decodate îl acoperă.
+_FLOAT_COLS = ("temp", "light", "soil", "water", "fan_pct")
+_DICT_COLS = ("topic", "mode", "ip")
+_COLS = ("id", "ts", "topic") + TELEMETRY_COLUMNS
+
+EXPORT_CHUNK_ROWS = 50000
+
+def _empty(n: int) -> dict:
+    a = {
+        "id": np.empty(n, dtype=np.int64),
+        "ts": np.empty(n, dtype=np.int64),
+        "lamp_power": np.empty(n, dtype=np.int8),
+    }
+    for c in _FLOAT_COLS:
+        a[c] = np.empty(n, dtype=np.float32)
+    for c in _DICT_COLS:
+        a[c] = np.empty(n, dtype=np.int32)
+    return a
+
+def _encode(rows) -> dict:
+    # rânduri (în ordinea _COLS) -> coloane, cu vocabular propriu per bucată
+    a = _empty(len(rows))
+    vocab = {c: {} for c in _DICT_COLS}
+    for j, c in enumerate(_COLS):
+        col = [r[j] for r in rows]
+        if c in _DICT_COLS:
+            v = vocab[c]
+            a[c][:] = [-1 if x is None else v.setdefault(x, len(v)) for x in col]
+        elif c in _FLOAT_COLS:
+            a[c][:] = np.array(col, dtype=np.float64)
+        elif c == "lamp_power":
+            a[c][:] = [-1 if x is None else x for x in col]
+        else:
+            a[c][:] = col
+    for c in _DICT_COLS:
+        a[f"{c}_vocab"] = np.array(list(vocab[c]), dtype=str)
+    return a
+
+def _read_npz(path: str) -> dict:
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+def _write_npz(path: str, data: dict) -> None:
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    tmp = os.path.join(d, f".{os.path.basename(path)}.tmp-{os.getpid()}")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def month_dir(archive_dir: str, month: int) -> str:
+    return os.path.join(archive_dir, partition_table(month))
+
+def export_partition(con, month: int, out_dir: str, after_id: int = 0,
+                     chunk_rows: int = EXPORT_CHUNK_ROWS) -> list:
+    # rândurile partiției calde cu id > after_id -> bucăți .npz în out_dir, câte
+    # chunk_rows; în RAM stă o singură bucată. Un singur SELECT = un singur snapshot,
+    # fără lock de scriere. Întoarce [(cale, min_id, max_id, min_ts, max_ts)], necatalogate.
+    table = partition_table(month)
+    cur = con.execute(f"SELECT {', '.join(_COLS)} FROM {table} WHERE id > ? ORDER BY id",
+                      (int(after_id),))
+    parts = []
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        a = _encode(rows)
+        a["month"] = np.int32(month)
+        lo, hi = int(a["id"][0]), int(a["id"][-1])
+        path = os.path.join(out_dir, f"p{lo:012d}-{hi:012d}.npz")
+        _write_npz(path, a)
+        parts.append((path, lo, hi, int(a["ts"].min()), int(a["ts"].max())))
+    return parts
+
+def _catalog_parts(con, month: int, parts: list) -> None:
+    con.executemany(
+        "INSERT OR REPLACE INTO telemetry_archive_parts(path, month, min_id, max_id, min_ts, max_ts) "
+        "VALUES(?, ?, ?, ?, ?, ?)",
+        [(p[0], month) + tuple(p[1:]) for p in parts],
+    )
+
+def _remove_orphans(con, month: int, out_dir: str) -> None:
+    # bucăți scrise de o rulare întreruptă înainte de catalogare
+    known = {r[0] for r in con.execute(
+        "SELECT path FROM telemetry_archive_parts WHERE month = ?", (month,))}
+    try:
+        names = os.listdir(out_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(out_dir, name)
+        if name.endswith(".npz") and path not in known:
+            os.remove(path)
+
+def load_partition(con, month: int, t0: int | None = None, t1: int | None = None,
+                   after_id: int | None = None) -> str:
+    # bucățile arhivei care intersectează [t0, t1) și au id > after_id -> tabel temporar
+    # cu aceeași schemă; fiecare bucată se încarcă o singură dată per conexiune
+    table = f"{partition_table(month)}_archive"
+    # apelat și din interiorul unei tranzacții (catch_up_rollups): nu o închidem noi
+    own_tx = not con.in_transaction
+    for stmt in partition_ddl(table, schema="temp", payload_required=False).split(";"):
+        if stmt:
+            con.execute(stmt)
+    con.execute("CREATE TABLE IF NOT EXISTS temp.archive_loaded (path TEXT PRIMARY KEY)")
+
+    cond = "month = ? AND path NOT IN (SELECT path FROM temp.archive_loaded)"
+    args = [month]
+    if t0 is not None:
+        cond += " AND max_ts >= ?"
+        args.append(int(t0))
+    if t1 is not None:
+        cond += " AND min_ts < ?"
+        args.append(int(t1))
+    if after_id is not None:
+        cond += " AND max_id > ?"
+        args.append(int(after_id))
+    paths = [r[0] for r in con.execute(
+        f"SELECT path FROM telemetry_archive_parts WHERE {cond} ORDER BY min_id", args)]
+
+    sql = f"INSERT INTO temp.{table}({', '.join(_COLS)}) VALUES({','.join('?' * len(_COLS))})"
+    for path in paths:
+        a = _read_npz(path)
+        vocab = {c: a[f"{c}_vocab"].tolist() + [None] for c in _DICT_COLS}
+        n = len(a["id"])
+        step = 20000
+        for i in range(0, n, step):
+            out = []
+            for c in _COLS:
+                x = a[c][i:i + step]
+                if c in _DICT_COLS:
+                    v = vocab[c]
+                    out.append([v[k] for k in x.tolist()])
+                elif c in _FLOAT_COLS:
+                    # float32 -> float64 pentru SQLite, NaN -> NULL
+                    o = x.astype(np.float64).astype(object)
+                    o[np.isnan(x)] = None
+                    out.append(o.tolist())
+                elif c == "lamp_power":
+                    out.append([None if k < 0 else k for k in x.tolist()])
+                else:
+                    out.append(x.tolist())
+            con.executemany(sql, zip(*out))
+        con.execute("INSERT INTO temp.archive_loaded(path) VALUES(?)", (path,))
+    if own_tx:
+        con.commit()
+    return f"temp.{table}"
+
+def apply_retention(con, archive_dir: str, hot_months: int, now: float | None = None,
+                    chunk_rows: int = EXPORT_CHUNK_ROWS) -> list:
+    # lunile mai vechi decât ultimele `hot_months` (inclusiv luna curentă) merg în arhivă.
+    # Exportul rulează fără lock de scriere; sub BEGIN IMMEDIATE rămân doar rândurile
+    # sosite între timp, catalogul și DROP TABLE, deci writer-ul nu așteaptă după export.
+    if hot_months <= 0:
+        return []
+    cur = month_of(int(now if now is not None else time.time()))
+    y, m = divmod(cur, 100)
+    k = y * 12 + (m - 1) - (hot_months - 1)
+    cutoff = (k // 12) * 100 + k % 12 + 1
+
+    done = []
+    months = [r[0] for r in con.execute(
+        "SELECT month FROM telemetry_partitions WHERE hot = 1 AND month < ? ORDER BY month", (cutoff,)
+    )]
+    for month in months:
+        out_dir = month_dir(archive_dir, month)
+        _remove_orphans(con, month, out_dir)
+        # rândurile deja arhivate (lună cu date întârziate) au id-uri mai mici
+        last = con.execute("SELECT COALESCE(MAX(max_id), 0) FROM telemetry_archive_parts "
+                           "WHERE month = ?", (month,)).fetchone()[0]
+        parts = export_partition(con, month, out_dir, last, chunk_rows)
+        if parts:
+            last = parts[-1][2]
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            parts += export_partition(con, month, out_dir, last, chunk_rows)
+            _catalog_parts(con, month, parts)
+            con.execute(
+                "UPDATE telemetry_partitions SET hot = 0, archive = ?, "
+                "max_id = (SELECT MAX(max_id) FROM telemetry_archive_parts WHERE month = ?) "
+                "WHERE month = ?",
+                (out_dir, month, month),
+            )
+            con.execute(f"DROP TABLE {partition_table(month)}")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        done.append(month)
+    return done
+
+# Rulat periodic de sera-archive.timer, separat de daemon: exportul unei luni nu mai
+# ține pe loc thread-ul writer-ului.
+if __name__ == "__main__":
+    import config_local as cfg
+
+    hot = int(sys.argv[1]) if len(sys.argv) > 1 else cfg.HOT_MONTHS
+    con = connect(cfg.DB_PATH)
+    for month in apply_retention(con, cfg.ARCHIVE_DIR, hot):
+        print(f"archived {month} -> {month_dir(cfg.ARCHIVE_DIR, month)}")
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import config_local as cfg
+from db import TELEMETRY_COLUMNS, connect_readonly, query_range
+from sites import site_topic
+
+# Reluare de telemetrie înregistrată, pentru test de încărcare și regresie.
+#  --target inproc: mesajele intră direct în Hub-ul din daemon.py (ingest + controller),
+#                   exact pe calea callback-ului paho, fără broker; scrierea merge într-o
+#                   bază separată (--out-db), comenzile controller-ului doar se numără.
+#  --target mqtt:   publică pe un broker (local!) și măsoară latența printr-un abonat propriu.
+# Ritmul: --speed 1 = timp real, N = de N ori mai repede, 0 = cât de repede se poate.
+# Payload-ul se reconstruiește din coloanele decodate, deci merge și pe lunile arhivate.
+
+def iter_recorded(db_path: str, topic: str, t0=None, t1=None, limit=None, chunk_rows: int = 5000):
+    con = connect_readonly(db_path)
+    cur = query_range(con, topic, t0, t1, columns=("ts",) + TELEMETRY_COLUMNS)
+    n = 0
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                return
+            for r in rows:
+                yield r[0], json.dumps(dict(zip(TELEMETRY_COLUMNS, r[1:])))
+                n += 1
+                if limit is not None and n >= limit:
+                    return
+    finally:
+        con.close()
+
+class Pacer:
+    # ține ritmul față de ts-urile înregistrate; măsoară cât a rămas în urmă emițătorul
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.t_start = None
+        self.ts_start = None
+        self.max_behind_s = 0.0
+
+    def wait(self, ts: float):
+        if self.speed <= 0:
+            return
+        now = time.perf_counter()
+        if self.t_start is None:
+            self.t_start, self.ts_start = now, ts
+            return
+        due = self.t_start + (ts - self.ts_start) / self.speed
+        if due > now:
+            time.sleep(due - now)
+        else:
+            self.max_behind_s = max(self.max_behind_s, now - due)
+
+def _pct(a, q) -> float:
+    return round(float(np.percentile(a, q)), 3) if len(a) else 0.0
+
+def as_v2(messages):
+    # aceleași eșantioane în formatul binar v2 (cum le-ar trimite ESP32 pe <site>/stare/bin)
+    from payload_codec import encode_v2
+
+    for i, (ts, payload) in enumerate(messages):
+        yield ts, encode_v2(json.loads(payload), seq=i, dev_ts=ts)
+
+def replay_inproc(messages, speed: float, stages, original_ts: bool = False,
+                  topic: str = cfg.TOPIC_STATE_SENSORS) -> dict:
+    from daemon import Hub, build_stages
+
+    hub = Hub(build_stages(stages), client_id="pi-replay", offline=True)
+    ctl = hub.stage("controller")
+    if ctl is not None:
+        # modelul se încarcă înainte de cronometrare, nu în mijlocul reluării
+        ctl.models.get()
+    pacer = Pacer(speed)
+    sent = [0]
+    t_send = [0.0, 0.0]
+
+    def feeder():
+        # rolul thread-ului paho: on_message -> call_soon_threadsafe
+        while hub.loop is None:
+            time.sleep(0.01)
+        t_send[0] = time.perf_counter()
+        for ts, payload in messages:
+            pacer.wait(ts)
+            hub.loop.call_soon_threadsafe(
+                hub._dispatch, topic, payload if isinstance(payload, bytes) else payload.encode(),
+                float(ts) if original_ts else time.time(), time.perf_counter())
+            sent[0] += 1
+        t_send[1] = time.perf_counter()
+        hub.loop.call_soon_threadsafe(hub.request_stop)
+
+    th = threading.Thread(target=feeder, name="replay-feeder", daemon=True)
+    th.start()
+    t0 = time.perf_counter()
+    asyncio.run(hub.run())      # la stop, ingest golește coada în DB
+    total = time.perf_counter() - t0
+    th.join()
+
+    send_s = max(t_send[1] - t_send[0], 1e-9)
+    out = {
+        "sent": sent[0],
+        "send_s": round(send_s, 3),
+        "sent_per_s": round(sent[0] / send_s, 1),
+        "total_s": round(total, 3),
+        "max_behind_ms": round(pacer.max_behind_s * 1000.0, 3),
+        "published": hub.published,
+    }
+    ingest = hub.stage("ingest")
+    if ingest is not None:
+        s = ingest.stats()
+        out.update({
+            "written": s["written"],
+            "written_per_s": round(s["written"] / total, 1),
+            "dropped": s["dropped"],
+            "rejected": s["rejected"],
+            "avg_flush_ms": s["avg_flush_ms"],
+            "max_flush_ms": s["max_flush_ms"],
+            "avg_commit_lag_ms": s["avg_lag_ms"],
+            "max_commit_lag_ms": s["max_lag_ms"],
+        })
+    if ctl is not None:
+        s = ctl.stats()
+        out.update({
+            "decisions": s["decisions"],
+            "coalesced": s["coalesced"],
+            "avg_decision_ms": s["avg_ms"],
+            "max_decision_ms": s["max_ms"],
+        })
+    return out
+
+def replay_mqtt(messages, speed: float, host: str, port: int, topic: str,
+                drain_s: float = 5.0) -> dict:
+    import paho.mqtt.client as mqtt
+
+    # abonatul propriu vede mesajele în ordinea trimiterii (un singur emițător, QoS 0),
+    # deci al k-lea primit corespunde celui de-al k-lea trimis
+    sent_at = []
+    lat = []
+    lock = threading.Lock()
+    ready = threading.Event()
+
+    def on_connect(client, userdata, flags, rc):
+        client.subscribe(topic)
+
+    def on_subscribe(client, userdata, mid, granted_qos):
+        ready.set()
+
+    def on_message(client, userdata, msg):
+        t = time.perf_counter()
+        with lock:
+            k = len(lat)
+            if k < len(sent_at):
+                lat.append(t - sent_at[k])
+
+    sub = mqtt.Client(client_id=f"pi-replay-sub-{int(time.time())}")
+    sub.on_connect = on_connect
+    sub.on_subscribe = on_subscribe
+    sub.on_message = on_message
+    sub.connect(host, port, keepalive=60)
+    sub.loop_start()
+
+    pub = mqtt.Client(client_id=f"pi-replay-pub-{int(time.time())}")
+    pub.max_queued_messages_set(0)
+    pub.connect(host, port, keepalive=60)
+    pub.loop_start()
+    if not ready.wait(10):
+        raise RuntimeError(f"could not subscribe on {host}:{port}")
+
+    pacer = Pacer(speed)
+    failed = 0
+    t0 = time.perf_counter()
+    for ts, payload in messages:
+        pacer.wait(ts)
+        with lock:
+            sent_at.append(time.perf_counter())
+        if pub.publish(topic, payload, qos=0).rc != mqtt.MQTT_ERR_SUCCESS:
+            failed += 1
+    send_s = max(time.perf_counter() - t0, 1e-9)
+
+    deadline = time.monotonic() + drain_s
+    while time.monotonic() < deadline and len(lat) < len(sent_at) - failed:
+        time.sleep(0.05)
+    pub.loop_stop()
+    sub.loop_stop()
+    pub.disconnect()
+    sub.disconnect()
+
+    lat_ms = np.asarray(lat) * 1000.0
+    return {
+        "sent": len(sent_at),
+        "send_s": round(send_s, 3),
+        "sent_per_s": round(len(sent_at) / send_s, 1),
+        "max_behind_ms": round(pacer.max_behind_s * 1000.0, 3),
+        "publish_failed": failed,
+        "received": len(lat),
+        "dropped": len(sent_at) - len(lat),
+        "p50_ms": _pct(lat_ms, 50),
+        "p95_ms": _pct(lat_ms, 95),
+        "max_ms": _pct(lat_ms, 100),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay recorded telemetry for load/regression tests")
+    ap.add_argument("--db", default=cfg.DB_PATH, help="source telemetry DB (read only)")
+    ap.add_argument("--speed", type=float, default=1.0,
+                    help="1 = real time, N = N times faster, 0 = as fast as possible")
+    ap.add_argument("--target", choices=("inproc", "mqtt"), default="inproc")
+    ap.add_argument("--t0", type=int, help="first ts (epoch)")
+    ap.add_argument("--t1", type=int, help="end ts (epoch, exclusive)")
+    ap.add_argument("--limit", type=int, help="max messages")
+    ap.add_argument("--stages", default="ingest,controller",
+                    help="inproc: daemon stages that receive the messages")
+    ap.add_argument("--out-db", help="inproc: DB the ingest stage writes to (default: temp)")
+    ap.add_argument("--model", default=cfg.MODEL_PATH, help="inproc: model for the controller")
+    ap.add_argument("--gate", action="store_true",
+                    help="inproc: keep the MIN_DAYS gate (off by default: the output DB starts empty)")
+    ap.add_argument("--original-ts", action="store_true",
+                    help="inproc: store the recorded ts instead of the replay time")
+    ap.add_argument("--host", default="127.0.0.1", help="mqtt: broker (use a local one)")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--topic", help="mqtt: topic to publish on (default: per --format)")
+    ap.add_argument("--format", choices=("json", "v2"), default="json",
+                    help="payload format sent (v2 goes to the binary state topic)")
+    ap.add_argument("--out", help="write JSON results here (bench.run compare format)")
+    args = ap.parse_args(argv)
+
+    messages = iter_recorded(args.db, cfg.TOPIC_STATE_SENSORS, args.t0, args.t1, args.limit)
+    topic = cfg.TOPIC_STATE_SENSORS
+    if args.format == "v2":
+        messages = as_v2(messages)
+        topic = site_topic(cfg.SITE, cfg.TOPIC_STATE_BIN_ALL)
+    if args.target == "inproc":
+        # etapele citesc config-ul la construcție: le îndreptăm spre baza de test
+        out_db = args.out_db or os.path.join(tempfile.mkdtemp(prefix="sera-replay-"), "telemetry.sqlite")
+        if os.path.abspath(out_db) == os.path.abspath(args.db):
+            raise SystemExit("--out-db must differ from --db")
+        cfg.DB_PATH = out_db
+        cfg.MODEL_PATH = args.model
+        if not args.gate:
+            cfg.MIN_DAYS_BEFORE_CONTROL = 0
+        stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+        res = replay_inproc(messages, args.speed, stages, args.original_ts, topic)
+        res["out_db"] = out_db
+    else:
+        res = replay_mqtt(messages, args.speed, args.host, args.port, args.topic or topic)
+
+    print(json.dumps(res, indent=2))
+    if args.out:
+        from bench.run import _meta
+        with open(args.out, "w") as f:
+            json.dump({"meta": _meta(args), "results": {f"replay_{args.target}": res}}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
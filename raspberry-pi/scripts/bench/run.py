@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import config_local as cfg
+import db
+from bench.synth import generate, iter_samples
+
+# Benchmark-uri pentru lanțul complet: ingest -> load_xy / feature store -> train -> decizie.
+# Rezultatul e un JSON cu metadate (commit, versiuni, CPU) și metrici per benchmark,
+# ca două rulări să poată fi comparate cu `python -m bench.run compare a.json b.json`.
+# Convenția pentru compare: *_per_s = mai mare e mai bine; *_ms, *_s, *_mb = mai mic e mai bine.
+
+def _pct(a, q) -> float:
+    return round(float(np.percentile(a, q)), 4) if len(a) else 0.0
+
+def _payloads(n: int, seed: int = 1):
+    out = []
+    for ts, payloads in iter_samples(days=max(1.0, n / 86400.0), period_s=1.0, seed=seed):
+        out.extend(zip(ts.tolist(), payloads))
+        if len(out) >= n:
+            break
+    return out[:n]
+
+def bench_insert(scratch_dir: str, n: int) -> dict:
+    # db.insert: un mesaj = o tranzacție (calea veche, fără writer)
+    path = os.path.join(scratch_dir, "insert.sqlite")
+    con = db.connect(path)
+    msgs = _payloads(n)
+    t0 = time.perf_counter()
+    lat = []
+    for ts, p in msgs:
+        t1 = time.perf_counter()
+        db.insert(con, ts, cfg.TOPIC_STATE_SENSORS, p)
+        lat.append((time.perf_counter() - t1) * 1000.0)
+    dt = time.perf_counter() - t0
+    con.close()
+    return {"rows": n, "rows_per_s": round(n / dt, 1),
+            "p50_ms": _pct(lat, 50), "p99_ms": _pct(lat, 99)}
+
+def bench_writer(scratch_dir: str, n: int) -> dict:
+    # calea logger-ului: submit() din callback-ul MQTT + thread-ul de scriere pe loturi
+    from writer import TelemetryWriter
+
+    path = os.path.join(scratch_dir, "writer.sqlite")
+    db.connect(path).close()
+    msgs = _payloads(n, seed=2)
+    w = TelemetryWriter(path, batch_size=cfg.WRITER_BATCH, flush_s=cfg.WRITER_FLUSH_S,
+                        max_queue=cfg.WRITER_QUEUE_MAX, rollups=cfg.ROLLUPS_ENABLED)
+    w.start()
+    t0 = time.perf_counter()
+    for ts, p in msgs:
+        w.submit(ts, cfg.TOPIC_STATE_SENSORS, p)
+    t_submit = time.perf_counter() - t0
+    w.stop()
+    dt = time.perf_counter() - t0
+    s = w.stats()
+    return {"rows": n, "rows_per_s": round(s["written"] / dt, 1),
+            "submit_per_s": round(n / t_submit, 1), "dropped": s["dropped"],
+            "avg_flush_ms": s["avg_flush_ms"], "max_flush_ms": s["max_flush_ms"]}
+
+def _db_mb(path: str) -> float:
+    con = db.connect(path)
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    con.close()
+    return os.path.getsize(path) / (1024 * 1024)
+
+def bench_codec(scratch_dir: str, n: int) -> dict:
+    # JSON (v1) vs binar v2: dimensiune mesaj, decodare per mesaj și pe lot, rând stocat
+    from payload_codec import decode_v2_array, encode_v2, v2_columns
+
+    msgs = _payloads(n, seed=5)
+    v2 = [encode_v2(json.loads(p), seq=i, dev_ts=ts) for i, (ts, p) in enumerate(msgs)]
+    out = {"rows": n,
+           "json_bytes": round(sum(len(p.encode()) for _, p in msgs) / n, 1),
+           "v2_bytes": round(sum(len(b) for b in v2) / n, 1)}
+
+    def rate(fn, items):
+        t0 = time.perf_counter()
+        fn(items)
+        return round(len(items) / (time.perf_counter() - t0), 1)
+
+    out["json_decode_per_s"] = rate(lambda it: [db.decode_payload(p) for _, p in it], msgs)
+    out["v2_decode_per_s"] = rate(lambda it: [db.decode_payload(b) for b in it], v2)
+    out["v2_bulk_decode_per_s"] = rate(lambda it: v2_columns(decode_v2_array(it)), v2)
+
+    for name, payloads in (("json", [p for _, p in msgs]), ("v2", v2)):
+        path = os.path.join(scratch_dir, f"codec_{name}.sqlite")
+        con = db.connect(path)
+        rows = [db.decode_row(ts, cfg.TOPIC_STATE_SENSORS, p) for (ts, _), p in zip(msgs, payloads)]
+        db.insert_many(con, rows)
+        con.close()
+        out[f"{name}_db_mb"] = round(_db_mb(path), 3)
+    return out
+
+def bench_load_xy(db_path: str) -> dict:
+    from build_dataset import load_xy
+    from train_budget import peak_rss_mb, reset_peak_rss
+
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    X, _, _ = load_xy(db_path)
+    dt = time.perf_counter() - t0
+    return {"rows": len(X), "wall_s": round(dt, 3),
+            "rows_per_s": round(len(X) / dt, 1) if dt else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+def bench_feature_store(db_path: str, store_dir: str) -> dict:
+    from build_dataset import update_feature_store, open_feature_store
+
+    t0 = time.perf_counter()
+    data = update_feature_store(db_path, store_dir)
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    update_feature_store(db_path, store_dir)
+    warm = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    open_feature_store(store_dir)
+    opened = time.perf_counter() - t0
+    return {"rows": len(data["X"]), "cold_s": round(cold, 3), "noop_s": round(warm, 3),
+            "open_ms": round(opened * 1000.0, 3)}
+
+def bench_train(db_path: str, work_dir: str) -> dict:
+    import train
+
+    cfg.DB_PATH = db_path
+    cfg.MODEL_PATH = os.path.join(work_dir, "model.joblib")
+    cfg.FEATURE_STORE_DIR = os.path.join(work_dir, "features")
+    t0 = time.perf_counter()
+    report = train.main(["--mode", "full"])
+    out = {"wall_s": round(time.perf_counter() - t0, 3)}
+    for st in report.stages:
+        out[f"{st['stage']}_s"] = st["wall_s"]
+        out[f"{st['stage']}_peak_mb"] = st["peak_rss_mb"]
+    out["model_path"] = cfg.MODEL_PATH
+    return out
+
+def bench_decision(model_path: str, n: int) -> dict:
+    # o decizie controller_ai, de la payload JSON la comenzile fan/lampă
+    from controller_ai import decide
+    from forest_engine import compile_model
+    from model_store import ModelCache
+
+    cache = ModelCache(model_path, prepare=compile_model)
+    model = cache.get()
+    if model is None:
+        raise RuntimeError(f"no model at {model_path}")
+    msgs = _payloads(n, seed=3)
+    lat = []
+    for ts, p in msgs:
+        t1 = time.perf_counter()
+        decide(model, json.loads(p), ts)
+        lat.append((time.perf_counter() - t1) * 1000.0)
+    return {"decisions": n, "model_load_ms": cache.stats()["load_ms"],
+            "p50_ms": _pct(lat, 50), "p95_ms": _pct(lat, 95), "max_ms": _pct(lat, 100)}
+
+def bench_sites(model_path: str, counts=(1, 10, 100), ticks: int = 50) -> dict:
+    # un tick de controller cu N sere: un predict pe lot (decide_batch, ca în daemon)
+    # față de câte o decizie per seră
+    from controller_ai import decide, decide_batch
+    from forest_engine import compile_model
+    from model_store import ModelCache
+
+    model = ModelCache(model_path, prepare=compile_model).get()
+    if model is None:
+        raise RuntimeError(f"no model at {model_path}")
+    msgs = [(ts, json.loads(p)) for ts, p in _payloads(max(counts) * ticks, seed=4)]
+    out = {}
+    for n in counts:
+        batch_lat, loop_lat = [], []
+        for k in range(ticks):
+            rows = msgs[k * n:(k + 1) * n]
+            ds, tss = [d for _, d in rows], [ts for ts, _ in rows]
+            t1 = time.perf_counter()
+            decide_batch(model, ds, tss)
+            batch_lat.append((time.perf_counter() - t1) * 1000.0)
+            t1 = time.perf_counter()
+            for ts, d in rows:
+                decide(model, d, ts)
+            loop_lat.append((time.perf_counter() - t1) * 1000.0)
+        out[f"sites{n}_batch_p50_ms"] = _pct(batch_lat, 50)
+        out[f"sites{n}_batch_p95_ms"] = _pct(batch_lat, 95)
+        out[f"sites{n}_loop_p50_ms"] = _pct(loop_lat, 50)
+        out[f"sites{n}_per_site_ms"] = round(_pct(batch_lat, 50) / n, 4)
+    return out
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    try:
+        import sklearn
+        sk = sklearn.__version__
+    except ImportError:
+        sk = None
+    return {
+        "time": int(time.time()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sk,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k != "func"},
+    }
+
+BENCHES = ("insert", "writer", "codec", "load_xy", "feature_store", "train", "decision", "sites")
+
+def run(args) -> dict:
+    only = set(args.only.split(",")) if args.only else set(BENCHES)
+    work = args.work_dir or tempfile.mkdtemp(prefix="sera-bench-")
+    os.makedirs(work, exist_ok=True)
+    db_path = args.db or os.path.join(work, "telemetry.sqlite")
+    results = {}
+
+    if not args.db and not os.path.exists(db_path):
+        t0 = time.perf_counter()
+        rows = generate(db_path, args.days, args.period_s, seed=args.seed)
+        results["generate"] = {"rows": rows, "wall_s": round(time.perf_counter() - t0, 3),
+                               "rows_per_s": round(rows / (time.perf_counter() - t0), 1)}
+
+    def step(name, fn):
+        if name not in only:
+            return
+        print(f"[bench] {name} ...", flush=True)
+        results[name] = fn()
+        print(f"[bench] {name}: {results[name]}", flush=True)
+
+    step("insert", lambda: bench_insert(work, args.insert_rows))
+    step("writer", lambda: bench_writer(work, args.writer_rows))
+    step("codec", lambda: bench_codec(work, args.codec_rows))
+    step("load_xy", lambda: bench_load_xy(db_path))
+    step("feature_store", lambda: bench_feature_store(db_path, os.path.join(work, "features")))
+    step("train", lambda: bench_train(db_path, work))
+    model_path = args.model or results.get("train", {}).get("model_path") or cfg.MODEL_PATH
+    step("decision", lambda: bench_decision(model_path, args.decisions))
+    step("sites", lambda: bench_sites(model_path, [int(n) for n in args.sites.split(",")]))
+
+    out = {"meta": _meta(args), "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(out, f, indent=2)
+        print(f"[bench] results -> {args.out}")
+    return out
+
+def _direction(metric: str):
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s", "_mb")):
+        return -1
+    return 0
+
+def compare(args) -> int:
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+
+    regressions = 0
+    for name in sorted(set(base) & set(new)):
+        for metric, b in base[name].items():
+            n = new[name].get(metric)
+            d = _direction(metric)
+            if not d or not isinstance(b, (int, float)) or not isinstance(n, (int, float)) or not b:
+                continue
+            change = (n - b) / abs(b)
+            worse = -change * d
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif -worse > args.threshold:
+                flag = "  improved"
+            print(f"{name + '.' + metric:<34} {b:>12.3f} -> {n:>12.3f}  {change * 100:+7.1f}%{flag}")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark ingest, dataset build, training and inference")
+    sub = ap.add_subparsers(dest="cmd")
+
+    r = sub.add_parser("run", help="run the benchmarks (default)")
+    r.add_argument("--db", help="existing telemetry DB (default: generate one)")
+    r.add_argument("--model", help="model for the decision benchmark (default: the one trained here)")
+    r.add_argument("--work-dir", help="scratch directory (default: a new temp dir)")
+    r.add_argument("--days", type=float, default=7.0)
+    r.add_argument("--period-s", type=float, default=1.0)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--insert-rows", type=int, default=2000)
+    r.add_argument("--writer-rows", type=int, default=50000)
+    r.add_argument("--codec-rows", type=int, default=50000)
+    r.add_argument("--decisions", type=int, default=1000)
+    r.add_argument("--sites", default="1,10,100", help="site counts for the batched decision benchmark")
+    r.add_argument("--only", help=f"comma-separated subset of {','.join(BENCHES)}")
+    r.add_argument("--out", help="write JSON results here")
+    r.set_defaults(func=run)
+
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative change flagged (0.10 = 10%%)")
+    c.set_defaults(func=compare)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ("run", "compare", "-h", "--help"):
+        argv = ["run"] + list(argv)
+    args = ap.parse_args(argv)
+    res = args.func(args)
+    if args.cmd == "compare":
+        raise SystemExit(res)
+
+if __name__ == "__main__":
+    main()
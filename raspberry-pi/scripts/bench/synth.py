@@ -0,0 +1,171 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+import config_local as cfg
+from db import connect, decode_row, insert_many
+
+# Generator de telemetrie sintetică pentru `sera/stare/senzori`, cu aceleași chei
+# și aceeași ordine ca payload-ul din esp32/micropython/src/main.py.
+# Modelul e simplu, dar are structura care contează pentru antrenare:
+#  - temperatură diurnă (minim ~05:00, maxim ~15:00 local) + încălzire la setpoint noaptea
+#  - lumină = soare (variază cu norii, pe zile) + lampă când e pornită
+#  - sol care se usucă și e udat în puls-uri sub SOIL_DRY_PCT
+#  - rezervor care scade și se umple între 25% și 85%
+#  - sesiuni MANUAL ocazionale, cu ventilator/lampă setate de utilizator
+IP = "192.168.1.50"
+
+T_DAY, T_NIGHT = 24.0, 20.0
+LIGHT_ON_HOUR, LIGHT_OFF_HOUR = 8, 20
+LAMP_LUX = 6000.0
+LUX_TARGET = 15000.0
+SOIL_DRY_PCT, SOIL_WET_PCT = 35.0, 70.0
+RES_START_PCT, RES_STOP_PCT = 25.0, 85.0
+
+class _Sawtooth:
+    # nivel care scade liniar și sare înapoi sus când atinge pragul de jos
+    def __init__(self, level, lo, hi, rate_per_s, rng):
+        self.level = level
+        self.lo = lo
+        self.hi = hi
+        self.rate = rate_per_s
+        self.rng = rng
+
+    def take(self, t: np.ndarray) -> np.ndarray:
+        # nivelul la momentele t; fiecare atingere a pragului = o udare / umplere
+        out = np.empty(t.shape[0], dtype=np.float64)
+        i, t_prev = 0, t[0]
+        while i < t.shape[0]:
+            # cât mai ține până la pragul de jos
+            left = (self.level - self.lo) / self.rate
+            j = i if left <= 0 else int(np.searchsorted(t, t_prev + left, side="left"))
+            out[i:j] = self.level - self.rate * (t[i:j] - t_prev)
+            if j >= t.shape[0]:
+                self.level -= self.rate * (t[-1] - t_prev)
+                break
+            self.level = self.hi + self.rng.normal(0.0, 2.0)
+            self.rate *= float(np.exp(self.rng.normal(0.0, 0.15)))
+            t_prev = t[j]
+            i = j
+        return out
+
+def _manual_sessions(t0: float, t1: float, rng, per_day: float = 0.5):
+    # (start, end, fan_pct, lamp_power) pentru fiecare sesiune MANUAL
+    out = []
+    t = t0
+    while True:
+        t += rng.exponential(86400.0 / per_day)
+        if t >= t1:
+            return out
+        dur = rng.uniform(10 * 60, 90 * 60)
+        out.append((t, t + dur, int(rng.choice([0, 30, 60, 100])), int(rng.integers(0, 2))))
+
+def iter_samples(days: float, period_s: float = 1.0, start: float | None = None,
+                 seed: int = 0, chunk_s: float = 86400.0):
+    # produce (ts int64[], payload-uri JSON) pe bucăți de chunk_s secunde
+    rng = np.random.default_rng(seed)
+    if start is None:
+        start = (int(time.time()) // 86400 - int(math.ceil(days))) * 86400
+    end = start + days * 86400.0
+    sessions = _manual_sessions(start, end, rng)
+    soil = _Sawtooth(60.0, SOIL_DRY_PCT, SOIL_WET_PCT, 30.0 / 86400.0, rng)
+    res = _Sawtooth(70.0, RES_START_PCT, RES_STOP_PCT, 40.0 / 86400.0, rng)
+    offset = cfg.TZ_OFFSET_HOURS * 3600.0
+
+    c0 = float(start)
+    while c0 < end:
+        c1 = min(c0 + chunk_s, end)
+        t = np.arange(c0, c1, period_s, dtype=np.float64)
+        c0 = c1
+        if t.shape[0] == 0:
+            continue
+        n = t.shape[0]
+        h = np.mod(t + offset, 86400.0) / 3600.0
+        day = np.floor((t + offset) / 86400.0)
+        # câte o valoare pe zi, derivată determinist din zi, ca bucățile să se lege
+        day_rng = np.random.default_rng([seed, int(day[0])])
+        cloud = day_rng.uniform(0.3, 1.0)
+        warm = day_rng.normal(0.0, 1.5)
+
+        mode_manual = np.zeros(n, dtype=bool)
+        man_fan = np.zeros(n, dtype=np.int64)
+        man_lamp = np.zeros(n, dtype=np.int64)
+        for s0, s1, f, l in sessions:
+            if s1 < t[0] or s0 > t[-1]:
+                continue
+            m = (t >= s0) & (t < s1)
+            mode_manual |= m
+            man_fan[m] = f
+            man_lamp[m] = l
+
+        light_window = (h >= LIGHT_ON_HOUR) & (h < LIGHT_OFF_HOUR)
+        sun = np.clip(np.sin(np.pi * (h - 6.0) / 14.0), 0.0, None) * 22000.0 * cloud
+        lamp_auto = light_window & (sun < LUX_TARGET)
+        lamp = np.where(mode_manual, man_lamp, lamp_auto.astype(np.int64))
+        light = sun + lamp * LAMP_LUX + rng.normal(0.0, 80.0, n)
+
+        sp = np.where(light_window, T_DAY, T_NIGHT)
+        temp = 19.0 + warm + 5.0 * np.sin(2 * np.pi * (h - 9.0) / 24.0) + 2.0 * (sun / 22000.0)
+        # încălzirea ține temperatura aproape de setpoint noaptea
+        temp = np.maximum(temp, sp - 0.5) + rng.normal(0.0, 0.15, n)
+        fan_auto = np.where(temp > sp + 1.0, 90, 0)
+        fan = np.where(mode_manual, man_fan, fan_auto)
+
+        soil_v = soil.take(t)
+        water_v = res.take(t)
+        soil_v += rng.normal(0.0, 0.3, n)
+        water_v += rng.normal(0.0, 0.5, n)
+
+        ts = t.astype(np.int64)
+        payloads = [
+            json.dumps({
+                "temp": tc, "light": lx, "soil": so, "water": wa,
+                "mode": "manual" if mm else "auto",
+                "fan_pct": fp, "lamp_power": lp, "ip": IP,
+            })
+            for tc, lx, so, wa, mm, fp, lp in zip(
+                np.round(temp, 2).tolist(), np.round(np.maximum(light, 0.0), 1).tolist(),
+                np.round(np.clip(soil_v, 0, 100), 1).tolist(),
+                np.round(np.clip(water_v, 0, 100), 1).tolist(),
+                mode_manual.tolist(), fan.tolist(), lamp.tolist())
+        ]
+        yield ts, payloads
+
+def generate(db_path: str, days: float, period_s: float = 1.0, start: float | None = None,
+             seed: int = 0, batch: int = 5000, rollups: bool = True, progress=None) -> int:
+    # scrie prin același insert_many ca writer-ul (decodare, partiții, statistici, rollup-uri)
+    con = connect(db_path)
+    topic = cfg.TOPIC_STATE_SENSORS
+    n = 0
+    for ts, payloads in iter_samples(days, period_s, start, seed):
+        rows = [decode_row(int(a), topic, p) for a, p in zip(ts.tolist(), payloads)]
+        for i in range(0, len(rows), batch):
+            insert_many(con, rows[i:i + batch], rollups=rollups)
+        n += len(rows)
+        if progress is not None:
+            progress(n)
+    con.close()
+    return n
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write synthetic greenhouse telemetry into a DB")
+    ap.add_argument("db_path")
+    ap.add_argument("--days", type=float, default=7.0, help="span to generate (1 .. 730)")
+    ap.add_argument("--period-s", type=float, default=1.0,
+                    help="seconds between samples (the ESP32 publishes every 1 s)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-rollups", action="store_true")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    n = generate(args.db_path, args.days, args.period_s, seed=args.seed,
+                 rollups=not args.no_rollups,
+                 progress=lambda k: print(f"\r{k} rows", end="", flush=True))
+    dt = time.perf_counter() - t0
+    print(f"\nwrote {n} rows to {args.db_path} in {dt:.1f} s ({n / max(dt, 1e-9):.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,317 @@
-import json
-import sqlite3
-import math
-from datetime import datetime
+import os
+import shutil
+import time
+
+import numpy as np
 
 import config_local as cfg
+from db import connect_readonly, max_id, query_range
+
+N_FEATURES = 6
+
+# crește la orice schimbare în featurize_batch; invalidează cache-ul de feature-uri
+FEATURE_SCHEMA = 1
+
+# X float32 + y_fan float32 + y_lamp int32
+ROW_BYTES = N_FEATURES * 4 + 4 + 4
+
+_XY_COLUMNS = ("ts", "temp", "light", "soil", "water", "fan_pct", "lamp_power")
+_XY_WHERE = "mode = 'auto' AND fan_pct IS NOT NULL AND lamp_power IS NOT NULL"
+
+def featurize_batch(ts, temp, light, soil, water) -> np.ndarray:
+    # Toată matricea de feature-uri dintr-o trecere NumPy.
+    # Ora vine din ts-ul stocat (UTC epoch) + offset-ul local din config,
+    # nu din ceasul curent. None/NaN -> 0.0, ca în varianta scalară.
+    ts = np.asarray(ts, dtype=np.float64)
+    X = np.empty((ts.shape[0], N_FEATURES), dtype=np.float32)
+    for j, col in enumerate((temp, light, soil, water)):
+        X[:, j] = np.nan_to_num(np.asarray(col, dtype=np.float64), nan=0.0)
+
+    sec = np.mod(ts + cfg.TZ_OFFSET_HOURS * 3600.0, 86400.0)
+    # rezoluție la minut, ca înainte
+    h = np.floor(sec / 60.0) / 60.0
+    ang = (2 * np.pi / 24.0) * h
+    X[:, 4] = np.sin(ang)
+    X[:, 5] = np.cos(ang)
+    return X
+
+def featurize_samples(ds: list, tss: list) -> np.ndarray:
+    # eșantioane ca dict-uri (payload-uri decodate) -> matricea de feature-uri;
+    # calea comună pentru controller_ai și featurize
+    return featurize_batch(
+        tss,
+        [d.get("temp") or 0.0 for d in ds],
+        [d.get("light") or 0.0 for d in ds],
+        [d.get("soil") or 0.0 for d in ds],
+        [d.get("water") or 0.0 for d in ds],
+    )
+
+def featurize(d: dict, ts: float | None = None) -> list[float]:
+    # aceeași formulă ca la antrenare, pentru un singur eșantion
+    if ts is None:
+        ts = time.time()
+    return featurize_samples([d], [ts])[0].tolist()
+
+def iter_xy_rows(con, chunk_rows: int = 5000, descending: bool = False,
+                 after_id: int | None = None, columns=_XY_COLUMNS, order_by: str = "ts"):
+    # filtrarea AUTO + etichete prezente se face în SQL, pe coloanele decodate la ingest
+    cur = query_range(con, cfg.TOPIC_STATE_SENSORS, columns=columns, where=_XY_WHERE,
+                      descending=descending, after_id=after_id, order_by=order_by)
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield rows
+
+def _reverse_rows(a, n: int, chunk: int = 4096):
+    # inversare in-place pe bucăți, fără o a doua copie a întregului array
+    i, j = 0, n
+    while j - i > 1:
+        k = min(chunk, (j - i) // 2)
+        head = a[i:i + k].copy()
+        a[i:i + k] = a[j - k:j][::-1]
+        a[j - k:j] = head[::-1]
+        i += k
+        j -= k
+
+def load_xy(db_path: str, max_bytes: int | None = None, progress=None, chunk_rows: int = 5000):
+    # Umple array-uri NumPy prealocate, care cresc geometric (x2).
+    # max_bytes limitează vârful de memorie (inclusiv copia de la creștere);
+    # când limita e atinsă, se păstrează cele mai noi rânduri.
+    # progress(rows_loaded, truncated) e apelat după fiecare bucată.
+    # doar citire: poate rula alături de daemon, fără să ia lock-uri de scriere
+    con = connect_readonly(db_path)
+
+    cap_rows = None if not max_bytes else max(1, int(max_bytes) // ROW_BYTES)
+    capacity = min(chunk_rows, cap_rows) if cap_rows else chunk_rows
+    X = np.empty((capacity, N_FEATURES), dtype=np.float32)
+    y_fan = np.empty(capacity, dtype=np.float32)
+    y_lamp = np.empty(capacity, dtype=np.int32)
+
+    n = 0
+    truncated = False
+    # cu limită citim de la cele mai noi spre cele vechi, ca să ne putem opri devreme
+    for rows in iter_xy_rows(con, chunk_rows, descending=cap_rows is not None):
+        need = n + len(rows)
+        if need > capacity:
+            new_cap = max(need, capacity * 2)
+            if cap_rows is not None:
+                # la resize coexistă vechiul și noul array
+                new_cap = min(new_cap, cap_rows - capacity)
+            if new_cap > capacity:
+                X = np.resize(X, (new_cap, N_FEATURES))
+                y_fan = np.resize(y_fan, new_cap)
+                y_lamp = np.resize(y_lamp, new_cap)
+                capacity = new_cap
+            if need > capacity:
+                # limita poate fi atinsă exact la granița unei bucăți: nu mai încape nimic
+                rows = rows[:capacity - n]
+                truncated = True
 
-def featurize(d: dict) -> list[float]:
-    temp  = float(d.get("temp") or 0.0)
-    light = float(d.get("light") or 0.0)
-    soil  = float(d.get("soil") or 0.0)
-    water = float(d.get("water") or 0.0)
+        if rows:
+            # NULL -> NaN la conversie, featurize_batch le face 0.0
+            a = np.array(rows, dtype=np.float64)
+            m = len(rows)
+            X[n:n + m] = featurize_batch(a[:, 0], a[:, 1], a[:, 2], a[:, 3], a[:, 4])
+            y_fan[n:n + m] = a[:, 5]    # 0..100
+            y_lamp[n:n + m] = a[:, 6]   # 0/1
+            n += m
 
-    now = datetime.utcnow()
-    h = now.hour + now.minute / 60.0
-    sin_h = math.sin(2 * math.pi * h / 24.0)
-    cos_h = math.cos(2 * math.pi * h / 24.0)
+        if progress is not None:
+            progress(n, truncated)
+        if truncated:
+            break
 
-    return [temp, light, soil, water, sin_h, cos_h]
+    con.close()
 
-def load_xy(db_path: str):
-    con = sqlite3.connect(db_path)
-    rows = con.execute("SELECT payload FROM telemetry WHERE topic = ?", (cfg.TOPIC_STATE_SENSORS,)).fetchall()
+    if cap_rows is not None:
+        for a in (X, y_fan, y_lamp):
+            _reverse_rows(a, n)
 
-    X, y_fan, y_lamp = [], [], []
-    for (p,) in rows:
+    return X[:n], y_fan[:n], y_lamp[:n]
+
+# Depozit de feature-uri pe disc: un director per versiune, `v{schema}-w{watermark}`,
+# cu câte un .npy per array. Cine citește (train.py, notebook-uri) le deschide cu
+# np.load(mmap_mode="r"), fără copie în RAM. O versiune nouă se scrie doar când
+# apar rânduri noi (id > watermark) sau se schimbă FEATURE_SCHEMA; se scrie într-un
+# director temporar și se publică prin rename, deci un cititor vede mereu o versiune completă.
+_STORE_KEYS = ("X", "y_fan", "y_lamp", "ts", "rowid")
+_STORE_DTYPES = {"X": np.float32, "y_fan": np.float32, "y_lamp": np.int32,
+                 "ts": np.int64, "rowid": np.int64}
+STORE_KEEP = 2
+# rânduri scrise pe bucată când versiunea trebuie reordonată
+_WRITE_CHUNK = 65536
+
+def _version_name(schema: int, watermark: int) -> str:
+    return f"v{schema}-w{watermark:012d}"
+
+def _parse_version(name: str):
+    try:
+        v, w = name.split("-")
+        if v[0] != "v" or w[0] != "w":
+            return None
+        return int(v[1:]), int(w[1:])
+    except (ValueError, IndexError):
+        return None
+
+def store_versions(store_dir: str, schema: int = FEATURE_SCHEMA) -> list:
+    # (watermark, cale), crescător după watermark
+    try:
+        names = os.listdir(store_dir)
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        p = _parse_version(name)
+        if p is not None and p[0] == schema:
+            out.append((p[1], os.path.join(store_dir, name)))
+    return sorted(out)
+
+def open_feature_store(store_dir: str, schema: int = FEATURE_SCHEMA):
+    # cea mai nouă versiune compatibilă, memory-mapped read-only; None dacă nu există
+    for watermark, path in reversed(store_versions(store_dir, schema)):
         try:
-            d = json.loads(p)
-        except Exception:
+            data = {k: np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r") for k in _STORE_KEYS}
+        except (OSError, ValueError):
             continue
+        data["watermark"] = watermark
+        data["path"] = path
+        return data
+    return None
+
+def _take(parts: list, idx: np.ndarray) -> np.ndarray:
+    # rândurile idx (indici globali peste bucăți), fără a concatena bucățile
+    offs = np.cumsum([0] + [len(p) for p in parts])
+    which = np.searchsorted(offs, idx, side="right") - 1
+    out = np.empty((len(idx),) + parts[0].shape[1:], dtype=parts[0].dtype)
+    for j, p in enumerate(parts):
+        m = which == j
+        if m.any():
+            out[m] = p[idx[m] - offs[j]]
+    return out
+
+def _keep_newest(parts: dict, max_rows: int) -> dict:
+    # cele mai noi max_rows rânduri (după ts), ca o singură bucată ordonată
+    keep = np.argsort(np.concatenate(parts["ts"]), kind="stable")[-max_rows:]
+    return {k: [_take(parts[k], keep)] for k in _STORE_KEYS}
 
-        if str(d.get("mode", "")).lower() != "auto":
+def _write_version(store_dir: str, watermark: int, parts: dict, order=None) -> str:
+    # parts[k] = listă de bucăți (mmap-uri vechi + array-uri noi); se scriu direct în .npy
+    os.makedirs(store_dir, exist_ok=True)
+    name = _version_name(FEATURE_SCHEMA, watermark)
+    tmp = os.path.join(store_dir, f".{name}.tmp-{os.getpid()}")
+    os.makedirs(tmp, exist_ok=True)
+    for k in _STORE_KEYS:
+        n = sum(len(p) for p in parts[k]) if order is None else len(order)
+        shape = (n, N_FEATURES) if k == "X" else (n,)
+        out = np.lib.format.open_memmap(os.path.join(tmp, f"{k}.npy"), mode="w+",
+                                        dtype=_STORE_DTYPES[k], shape=shape)
+        if order is None:
+            i = 0
+            for p in parts[k]:
+                out[i:i + len(p)] = p
+                i += len(p)
+        else:
+            # pe bucăți: în RAM stă doar indexul de ordine, nu cheia întreagă
+            for i in range(0, n, _WRITE_CHUNK):
+                out[i:i + _WRITE_CHUNK] = _take(parts[k], order[i:i + _WRITE_CHUNK])
+        out.flush()
+        del out
+    final = os.path.join(store_dir, name)
+    os.rename(tmp, final)
+    return final
+
+def _prune_store(store_dir: str, keep: int = STORE_KEEP):
+    # versiunile vechi (și cele cu altă schemă) se șterg; un cititor care le are
+    # deja deschise cu mmap nu e afectat pe Linux
+    current = {p for _, p in store_versions(store_dir)[-keep:]}
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if path in current or not os.path.isdir(path):
             continue
-        if "fan_pct" not in d or "lamp_power" not in d:
+        if name.startswith(".") and f".tmp-{os.getpid()}" not in name:
+            # director temporar al altui proces, poate încă în scriere
             continue
+        shutil.rmtree(path, ignore_errors=True)
+
+def update_feature_store(db_path: str, store_dir: str, max_rows: int | None = None,
+                         progress=None, chunk_rows: int = 5000) -> dict:
+    # max_rows păstrează doar cele mai noi rânduri (după ts); atunci vârful de memorie
+    # e ~3 x max_rows rânduri, oricât s-ar fi adunat de la ultimul watermark
+    old = open_feature_store(store_dir)
+    # watermark-ul e ținut separat: fereastra max_rows poate tăia rânduri cu id mare
+    # dar ts vechi (date întârziate), iar acestea nu trebuie re-citite
+    watermark = old["watermark"] if old is not None else 0
+
+    new = {k: [] for k in _STORE_KEYS}
+    # doar citire, ca load_xy: antrenarea nu ia lock-ul de scriere al writer-ului
+    con = connect_readonly(db_path)
+    n_new = n_buf = 0
+    # o singură tranzacție de citire: toate partițiile (un SELECT per lună) văd același
+    # snapshot. Altfel un rând întârziat, comis într-o lună deja citită, ar primi un id
+    # sub noul watermark și n-ar mai fi citit niciodată.
+    con.execute("BEGIN")
+    top = max_id(con)
+    # după id: se caută direct watermark-ul pe (topic, id); ordinea după ts se reface mai jos
+    for rows in iter_xy_rows(con, chunk_rows, after_id=watermark,
+                             columns=("id",) + _XY_COLUMNS, order_by="id"):
+        a = np.array(rows, dtype=np.float64)
+        new["X"].append(featurize_batch(a[:, 1], a[:, 2], a[:, 3], a[:, 4], a[:, 5]))
+        new["y_fan"].append(a[:, 6].astype(np.float32))
+        new["y_lamp"].append(a[:, 7].astype(np.int32))
+        new["ts"].append(a[:, 1].astype(np.int64))
+        new["rowid"].append(a[:, 0].astype(np.int64))
+        n_new += len(rows)
+        n_buf += len(rows)
+        if max_rows is not None and n_buf > 2 * max_rows:
+            # ce e mai vechi decât cele mai noi max_rows nu mai ajunge în depozit
+            new = _keep_newest(new, max_rows)
+            n_buf = max_rows
+        if progress is not None:
+            progress(n_new, False)
+    con.commit()
+    con.close()
+    # tot ce era în snapshot a fost citit (sau nu trece de filtru): nu se mai re-scanează
+    watermark = max(watermark, top)
 
-        X.append(featurize(d))
-        y_fan.append(float(d["fan_pct"]))        # 0..100
-        y_lamp.append(int(d["lamp_power"]))      # 0/1
+    if n_new or old is None:
+        # versiunea veche e ordonată după ts: cu max_rows contează doar coada ei (slice pe mmap)
+        keep_old = 0
+        if old is not None:
+            keep_old = len(old["ts"]) if max_rows is None else min(max_rows, len(old["ts"]))
+        parts = {k: ([old[k][len(old[k]) - keep_old:]] if old is not None else []) + new[k]
+                 for k in _STORE_KEYS}
+        if not n_new:
+            parts = {k: [np.empty((0, N_FEATURES) if k == "X" else 0, dtype=_STORE_DTYPES[k])]
+                     for k in _STORE_KEYS}
 
-    return X, y_fan, y_lamp
+        # ordine după ts, ca load_xy; de obicei rândurile noi sunt oricum după cele vechi
+        ts_parts = parts["ts"]
+        in_order = all(len(a) == 0 or len(b) == 0 or a[-1] <= b[0]
+                       for a, b in zip(ts_parts, ts_parts[1:])) and \
+            all(bool(np.all(p[1:] >= p[:-1])) for p in new["ts"])
+        order = None
+        n = sum(len(p) for p in ts_parts)
+        if not in_order:
+            order = np.argsort(np.concatenate(ts_parts), kind="stable")
+        if max_rows is not None and n > max_rows:
+            order = (np.arange(n) if order is None else order)[-max_rows:]
+
+        _write_version(store_dir, watermark, parts, order)
+        _prune_store(store_dir)
+        old = open_feature_store(store_dir)
+
+    data = dict(old)
+    data["new_rows"] = n_new
+    return data
 
 if __name__ == "__main__":
-    X, y_fan, y_lamp = load_xy(cfg.DB_PATH)
-    print(f"rows={len(X)} fan_labels={len(y_fan)} lamp_labels={len(y_lamp)}")
+    import sys
+
+    if sys.argv[1:2] == ["--store"]:
+        # materializează/actualizează depozitul de feature-uri pentru train.py și analiză
+        data = update_feature_store(cfg.DB_PATH, cfg.FEATURE_STORE_DIR)
+        print(f"store={data['path']} rows={len(data['X'])} new={data['new_rows']}")
+    else:
+        X, y_fan, y_lamp = load_xy(cfg.DB_PATH, max_bytes=cfg.TRAIN_MAX_MB * 1024 * 1024)
+        print(f"rows={len(X)} fan_labels={len(y_fan)} lamp_labels={len(y_lamp)}")
@@ -0,0 +1,72 @@
+import time
+
+# Strat de ieșire pentru comenzile către ESP32: publică doar ce s-a schimbat.
+# Pentru fiecare topic ținem ultima valoare trimisă; o valoare nouă pleacă dacă
+#  - diferă (numeric: cu cel puțin deadband-ul topicului), sau
+#  - a trecut refresh_s de la ultima trimitere (keep-alive), sau
+#  - starea raportată de ESP32 (observe) contrazice ce am trimis, ex. utilizatorul
+#    a comutat din UI. Observațiile din primele grace_s după o trimitere se ignoră,
+#    cât timp comanda e încă pe drum.
+class CommandOutput:
+    def __init__(self, publish, deadbands: dict | None = None, refresh_s: float = 60.0,
+                 grace_s: float = 3.0, clock=time.monotonic):
+        self.publish = publish
+        self.deadbands = dict(deadbands or {})
+        self.refresh_s = float(refresh_s)
+        self.grace_s = float(grace_s)
+        self.clock = clock
+
+        self._last = {}      # topic -> (valoare, momentul trimiterii)
+
+        self.sent = 0
+        self.suppressed = 0
+        self.refreshed = 0
+        self.invalidated = 0
+        self.per_topic = {}  # topic -> [sent, suppressed]
+
+    def _same(self, topic: str, a, b) -> bool:
+        db = self.deadbands.get(topic)
+        if db is not None and isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            return abs(a - b) < db
+        return a == b
+
+    def send(self, topic: str, value) -> bool:
+        now = self.clock()
+        counts = self.per_topic.setdefault(topic, [0, 0])
+        last = self._last.get(topic)
+        if last is not None and self._same(topic, value, last[0]):
+            if now - last[1] < self.refresh_s:
+                self.suppressed += 1
+                counts[1] += 1
+                return False
+            self.refreshed += 1
+
+        self.publish(topic, str(value))
+        self._last[topic] = (value, now)
+        self.sent += 1
+        counts[0] += 1
+        return True
+
+    def observe(self, topic: str, value) -> None:
+        # starea efectivă raportată de dispozitiv pentru topicul de comandă
+        last = self._last.get(topic)
+        if last is None or value is None:
+            return
+        if self.clock() - last[1] < self.grace_s:
+            return
+        if not self._same(topic, value, last[0]):
+            del self._last[topic]
+            self.invalidated += 1
+
+    def forget(self) -> None:
+        # ex. după reconectare la broker: următoarea decizie retrimite tot
+        self._last.clear()
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "refreshed": self.refreshed,
+            "invalidated": self.invalidated,
+            "per_topic": {t: {"sent": c[0], "suppressed": c[1]} for t, c in self.per_topic.items()},
+        }
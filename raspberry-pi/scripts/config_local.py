@@ -6,13 +6,87 @@ MQTT_USER   = os.getenv("GH_MQTT_USER", "")
 MQTT_PASS   = os.getenv("GH_MQTT_PASS", "")
 
 DB_PATH     = os.getenv("GH_DB_PATH", "/var/lib/sera/telemetry.sqlite")
+ARCHIVE_DIR = os.getenv("GH_ARCHIVE_DIR", "/var/lib/sera/archive")
 MODEL_PATH  = os.getenv("GH_MODEL_PATH", "/var/lib/sera/model.joblib")
 
+# ora locală pentru feature-urile sin/cos (aceeași convenție ca TZ_OFFSET_HOURS pe ESP32)
+TZ_OFFSET_HOURS         = float(os.getenv("GH_TZ_OFFSET_HOURS", "2"))
+
 MIN_DAYS_BEFORE_CONTROL = int(os.getenv("GH_MIN_DAYS", "7"))
 LOOP_SECONDS            = float(os.getenv("GH_LOOP_S", "5"))
 
-TOPIC_STATE_SENSORS     = "sera/stare/senzori"
+# controller_ai: inferență la fiecare eșantion nou, cel mult o decizie la AI_MIN_INTERVAL_S
+AI_MIN_INTERVAL_S       = float(os.getenv("GH_AI_MIN_INTERVAL_S", "0"))
+AI_STATS_S              = float(os.getenv("GH_AI_STATS_S", "300"))
+
+WRITER_BATCH            = int(os.getenv("GH_WRITER_BATCH", "200"))
+WRITER_FLUSH_S          = float(os.getenv("GH_WRITER_FLUSH_S", "2"))
+WRITER_QUEUE_MAX        = int(os.getenv("GH_WRITER_QUEUE_MAX", "10000"))
+WRITER_STATS_S          = float(os.getenv("GH_WRITER_STATS_S", "300"))
+# commit eșuat (ex. DB blocat): reîncercări cu backoff (0.5 s, 1 s, 2 s, ... max 30 s),
+# cel mult WRITER_RETRY_MAX la rând și WRITER_RETRY_ROWS rânduri ținute în memorie
+WRITER_RETRY_MAX        = int(os.getenv("GH_WRITER_RETRY_MAX", "8"))
+WRITER_RETRY_ROWS       = int(os.getenv("GH_WRITER_RETRY_ROWS", "20000"))
+
+# agregate pe minut/oră actualizate la ingest (db.query_aggregates)
+ROLLUPS_ENABLED         = os.getenv("GH_ROLLUPS", "1") == "1"
+
+# comenzi către ESP32: se publică doar schimbările (deadband ventilator, în puncte procentuale),
+# plus un keep-alive la CMD_REFRESH_S; CMD_GRACE_S = cât ignorăm starea raportată după o trimitere
+CMD_FAN_DEADBAND        = float(os.getenv("GH_CMD_FAN_DEADBAND", "2"))
+CMD_REFRESH_S           = float(os.getenv("GH_CMD_REFRESH_S", "60"))
+CMD_GRACE_S             = float(os.getenv("GH_CMD_GRACE_S", "3"))
+
+# /metrics în format Prometheus, servit de daemon (0 = oprit); implicit doar local
+METRICS_HOST            = os.getenv("GH_METRICS_HOST", "127.0.0.1")
+METRICS_PORT            = int(os.getenv("GH_METRICS_PORT", "9108"))
+
+# etapele pornite de daemon.py (ingest, controller, rollups); "rollups" = agregare în fundal
+DAEMON_STAGES           = os.getenv("GH_STAGES", "ingest,controller").split(",")
+ROLLUP_EVERY_S          = float(os.getenv("GH_ROLLUP_EVERY_S", "30"))
+
+# câte luni (inclusiv cea curentă) rămân în SQLite; restul le mută în ARCHIVE_DIR
+# archive.py (sera-archive.timer, zilnic); 0 = niciodată
+HOT_MONTHS              = int(os.getenv("GH_HOT_MONTHS", "3"))
+
+# plafon de memorie pentru X/y la antrenare (0 = fără limită)
+TRAIN_MAX_MB            = int(os.getenv("GH_TRAIN_MAX_MB", "256"))
+
+# feature-uri materializate ca .npy memory-mapped (build_dataset.update_feature_store)
+FEATURE_STORE_DIR       = os.getenv("GH_FEATURE_STORE", "/var/lib/sera/features")
+
+# antrenare incrementală: full / window / warm (vezi train.py --help)
+TRAIN_MODE              = os.getenv("GH_TRAIN_MODE", "full")
+TRAIN_WINDOW_DAYS       = float(os.getenv("GH_TRAIN_WINDOW_DAYS", "60"))
+TRAIN_ADD_TREES         = int(os.getenv("GH_TRAIN_ADD_TREES", "20"))
+TRAIN_MAX_TREES         = int(os.getenv("GH_TRAIN_MAX_TREES", "240"))
+
+# plafon de RAM pentru antrenare; train_budget alege câți arbori/modele rulează în paralel
+TRAIN_RAM_MB            = float(os.getenv("GH_TRAIN_RAM_MB", "600"))
+TRAIN_CORES             = int(os.getenv("GH_TRAIN_CORES", "0"))
+
+# Mai multe sere pe același broker: fiecare ESP32 publică sub propriul prefix (<site>/...).
+# SITE = sera implicită, a topicurilor de mai jos; daemon-ul se abonează la toate serele
+# prin TOPIC_STATE_SENSORS_ALL. SITES (listă cu virgulă) restrânge serele acceptate;
+# gol = oricare - pe un broker public setați-o.
+SITE                    = os.getenv("GH_SITE", "sera")
+SITES                   = [s for s in os.getenv("GH_SITES", "").split(",") if s]
+TOPIC_STATE_SENSORS_ALL = "+/stare/senzori"
+# starea în format binar v2 (payload_codec), opțională pe ESP32; o seră care trimite v2
+# e ingerată doar din v2 cât timp acesta sosește (STATE_BIN_HOLD_S), JSON-ul ei e ignorat
+TOPIC_STATE_BIN_ALL     = "+/stare/bin"
+STATE_BIN_HOLD_S        = float(os.getenv("GH_STATE_BIN_HOLD_S", "10"))
+# loturi de înregistrări v2 strânse de ESP32 cât a fost offline; intră doar în ingest,
+# cu ts-ul dispozitivului. Peste BACKFILL_MAX_SKEW_S în viitor = ceas greșit, se aruncă.
+TOPIC_STATE_BACKFILL_ALL = "+/stare/backfill"
+BACKFILL_MAX_SKEW_S     = float(os.getenv("GH_BACKFILL_MAX_SKEW_S", "300"))
+# ESP32 publică starea doar la schimbări (heartbeat STATE_HEARTBEAT_MS = 60 s): ingest scrie
+# starea ținută și pe secundele dintre mesaje, ca rândurile să rămână pe grila de 1 Hz.
+# Goluri mai lungi de STATE_FILL_MAX_S = întrerupere, nu se umplu (0 = fără umplere)
+STATE_FILL_MAX_S        = int(os.getenv("GH_STATE_FILL_MAX_S", "90"))
+
+TOPIC_STATE_SENSORS     = f"{SITE}/stare/senzori"
 
-TOPIC_CMD_MODE          = "sera/comenzi/mod"
-TOPIC_CMD_FAN           = "sera/comenzi/ventilator"
-TOPIC_CMD_LAMP_POWER    = "sera/comenzi/lampa/power"
+TOPIC_CMD_MODE          = f"{SITE}/comenzi/mod"
+TOPIC_CMD_FAN           = f"{SITE}/comenzi/ventilator"
+TOPIC_CMD_LAMP_POWER    = f"{SITE}/comenzi/lampa/power"
@@ -0,0 +1,711 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import time
+
+import paho.mqtt.client as mqtt
+
+import config_local as cfg
+from db import catch_up_rollups, connect, connect_readonly, days_covered, latest_state, sites
+from metrics import Exposition, Histogram, serve
+from payload_codec import V2_STRUCT, decode_v2, is_v2
+from sites import allowed, model_path, site_of, site_topic
+from writer import TelemetryWriter
+
+# Un singur proces pe Pi: o conexiune MQTT, o buclă asyncio, etape pornite la cerere.
+#  - ingest:     TelemetryWriter (singura conexiune SQLite care scrie)
+#  - controller: decizia AI pe ultimul eșantion din starea comună
+#  - rollups:    agregatele 1m/1h calculate în fundal, nu pe calea de commit a ingest-ului
+# Callback-ul paho (thread-ul rețelei) doar mută mesajul în bucla asyncio;
+# JSON-ul e parsat o singură dată, în Hub, și ținut ca "ultima stare" per topic.
+# Abonările sunt pe toate serele (+/stare/senzori); topicul concret spune sera.
+# Starea binară v2 (+/stare/bin) intră sub topicul JSON al serei, deci etapele,
+# DB-ul și antrenarea nu fac diferența între formate.
+# Loturile de backfill (+/stare/backfill, înregistrări v2 din perioadele offline ale ESP32)
+# merg doar la etapele cu history=True (ingest), cu ts-ul dispozitivului; nu ating
+# "ultima stare", deci controller-ul nu decide pe date vechi.
+# ESP32 publică "report by exception": JSON-ul poate avea doar câmpurile schimbate.
+# Hub-ul completează restul din ultima stare a serei (STATE_KEYS), deci rândurile din DB,
+# controller-ul și load_xy văd mereu starea completă, ca la publicarea fiecărei secunde.
+
+STATE_KEYS = ("temp", "light", "soil", "water", "mode", "fan_pct", "lamp_power")
+
+class Sample:
+    __slots__ = ("topic", "payload", "parsed", "ts", "t_recv", "backfill")
+
+    def __init__(self, topic: str, payload, parsed, ts: float, t_recv: float,
+                 backfill: bool = False):
+        self.topic = topic
+        self.payload = payload      # mesajul brut: text JSON sau bytes v2 (pentru ingest)
+        self.parsed = parsed        # dict parsat; None = invalid sau v2 încă nedecodat
+        self.ts = ts                # epoch, la recepție (backfill: ts-ul dispozitivului)
+        self.t_recv = t_recv        # perf_counter, pentru latență
+        self.backfill = backfill    # înregistrare din inelul offline al ESP32
+
+    @property
+    def valid(self) -> bool:
+        return self.parsed is not None or is_v2(self.payload)
+
+    @property
+    def data(self):
+        # v2 se decodează abia la prima citire: controller-ul citește doar ultimul eșantion
+        if self.parsed is None and is_v2(self.payload):
+            self.parsed = decode_v2(self.payload)
+        return self.parsed
+
+class Stage:
+    name = ""
+    topics = ()                     # filtre MQTT (pot conține + / #)
+    history = False                 # primește și eșantioanele vechi din backfill
+
+    def start(self, hub: "Hub"):
+        self.hub = hub
+
+    def on_connect(self):
+        pass
+
+    def on_message(self, sample: Sample):
+        pass
+
+    async def run(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def metrics(self, m: Exposition):
+        # citit la scrape, în bucla asyncio
+        pass
+
+class Hub:
+    def __init__(self, stages: list, client_id: str = "pi-sera", offline: bool = False):
+        # offline=True: fără broker (replay în proces); publish() doar numără
+        self.stages = stages
+        self.offline = offline
+        self.latest = {}             # topic -> Sample (deci și per seră)
+        self.received = 0
+        self.ignored = 0             # sere în afara cfg.SITES
+        self.duplicates = 0          # JSON de la sere care trimit deja v2
+        self.carried = 0             # JSON parțial, completat din starea anterioară
+        self.backfilled = 0          # înregistrări din loturile de backfill
+        self.backfill_rejected = 0   # înregistrări invalide sau fără ceas
+        self._bin_seen = {}          # topic de stare -> ts ultimului mesaj v2
+        self._seeds = {}             # topic -> ultima stare din DB, citită la pornire
+        self.published = 0
+        self.parsed = 0
+        self.errors = {}             # etapă -> excepții în on_message
+        self.connected = False
+        self._routes = {}            # topic -> etapele abonate la el
+        self.loop = None
+        self._stopping = None
+
+        self.client = mqtt.Client(client_id=f"{client_id}-{int(time.time())}")
+        if cfg.MQTT_USER:
+            self.client.username_pw_set(cfg.MQTT_USER, cfg.MQTT_PASS)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+
+    def stage(self, name: str):
+        for s in self.stages:
+            if s.name == name:
+                return s
+        return None
+
+    def publish(self, topic: str, payload: str, qos: int = 0, retain: bool = False):
+        # paho e thread-safe pentru publish; trimiterea efectivă o face thread-ul lui
+        self.published += 1
+        if self.offline:
+            return None
+        return self.client.publish(topic, payload, qos=qos, retain=retain)
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+
+    def _on_connect(self, client, userdata, flags, rc):
+        self.connected = rc == 0
+        topics = {t for s in self.stages for t in s.topics}
+        if cfg.TOPIC_STATE_SENSORS_ALL in topics:
+            topics.add(cfg.TOPIC_STATE_BIN_ALL)
+            topics.add(cfg.TOPIC_STATE_BACKFILL_ALL)
+        topics = sorted(topics)
+        for t in topics:
+            client.subscribe(t)
+        for s in self.stages:
+            self.loop.call_soon_threadsafe(s.on_connect)
+
+    def _on_message(self, client, userdata, msg):
+        # thread-ul paho: doar timestamp + predare către buclă
+        t_recv = time.perf_counter()
+        self.loop.call_soon_threadsafe(self._dispatch, msg.topic, msg.payload, time.time(), t_recv)
+
+    def _route(self, topic: str):
+        # (etape, topic canonic, tip), calculat o dată per topic; topicurile = nr. de sere
+        r = self._routes.get(topic)
+        if r is None:
+            site = site_of(topic)
+            if mqtt.topic_matches_sub(cfg.TOPIC_STATE_BIN_ALL, topic):
+                kind = "bin"
+            elif mqtt.topic_matches_sub(cfg.TOPIC_STATE_BACKFILL_ALL, topic):
+                kind = "backfill"
+            else:
+                kind = "json"
+            canonical = site_topic(site, cfg.TOPIC_STATE_SENSORS) if kind != "json" else topic
+            stages = None
+            if allowed(site):
+                stages = [s for s in self.stages
+                          if any(mqtt.topic_matches_sub(f, canonical) for f in s.topics)]
+                if kind == "backfill":
+                    stages = [s for s in stages if s.history]
+            r = self._routes[topic] = (stages, canonical, kind)
+        return r
+
+    def _dispatch(self, topic: str, raw: bytes, ts: float, t_recv: float):
+        self.received += 1
+        stages, topic, kind = self._route(topic)
+        if stages is None:
+            self.ignored += 1
+            return
+        if kind == "backfill":
+            self._backfill(stages, topic, bytes(raw), ts, t_recv)
+            return
+        if kind == "bin":
+            # fără decodare aici: writer-ul decodează loturi întregi, controller-ul doar ultimul
+            sample = Sample(topic, bytes(raw), None, ts, t_recv)
+            if sample.valid:
+                self._bin_seen[topic] = ts
+        else:
+            seen = self._bin_seen.get(topic)
+            if seen is not None and ts - seen < cfg.STATE_BIN_HOLD_S:
+                # seră pe "both": JSON-ul rămâne pentru web-ui, noi îl avem deja din v2
+                self.duplicates += 1
+                return
+            payload = raw.decode("utf-8", errors="replace").strip()
+            try:
+                data = json.loads(payload)
+                if not isinstance(data, dict):
+                    data = None
+            except ValueError:
+                data = None
+            if data is not None and any(k not in data for k in STATE_KEYS):
+                self._carry_forward(topic, data)
+            sample = Sample(topic, payload, data, ts, t_recv)
+        if sample.valid:
+            self.parsed += 1
+            self.latest[topic] = sample
+        self._deliver(stages, sample)
+
+    def _deliver(self, stages: list, sample: Sample):
+        for s in stages:
+            try:
+                s.on_message(sample)
+            except Exception as e:
+                self.errors[s.name] = self.errors.get(s.name, 0) + 1
+                print(f"[{s.name}] on_message failed: {e}", flush=True)
+
+    def _backfill(self, stages: list, topic: str, raw: bytes, ts: float, t_recv: float):
+        # lot = înregistrări v2 lipite; fiecare devine un eșantion cu ts-ul dispozitivului
+        size = V2_STRUCT.size
+        if not raw or len(raw) % size:
+            self.backfill_rejected += max(1, len(raw) // size)
+            return
+        for off in range(0, len(raw), size):
+            rec = raw[off:off + size]
+            dev_ts = int.from_bytes(rec[4:8], "little")
+            if not is_v2(rec) or dev_ts == 0 or dev_ts > ts + cfg.BACKFILL_MAX_SKEW_S:
+                self.backfill_rejected += 1
+                continue
+            self.backfilled += 1
+            self._deliver(stages, Sample(topic, rec, None, float(dev_ts), t_recv, backfill=True))
+
+    def _carry_forward(self, topic: str, data: dict):
+        # cheie lipsă = neschimbată; null explicit rămâne null (senzor fără citire)
+        prev = self.latest.get(topic)
+        base = prev.data if prev is not None else self._seeds.pop(topic, None)
+        if not base:
+            return
+        for k in STATE_KEYS:
+            if k not in data and k in base:
+                data[k] = base[k]
+        self.carried += 1
+
+    def _load_seeds(self) -> dict:
+        # după restart: ultima stare per seră, citită o dată, înainte de primul mesaj
+        # (în thread, doar partițiile calde), ca _dispatch să nu atingă DB-ul din buclă
+        try:
+            con = connect_readonly(cfg.DB_PATH)
+        except sqlite3.Error:
+            return {}
+        out = {}
+        try:
+            for site in sites(con):
+                if not allowed(site):
+                    continue
+                topic = site_topic(site, cfg.TOPIC_STATE_SENSORS)
+                state = latest_state(con, topic, hot_only=True)
+                if state:
+                    out[topic] = state
+        except sqlite3.Error:
+            pass
+        finally:
+            con.close()
+        return out
+
+    def render_metrics(self) -> str:
+        m = Exposition()
+        m.counter("messages_received_total", "MQTT messages received", self.received)
+        m.counter("messages_parsed_total", "Messages with a valid JSON or v2 payload", self.parsed)
+        m.counter("messages_ignored_total", "Messages from sites not in GH_SITES", self.ignored)
+        m.counter("messages_duplicate_total", "JSON state dropped because the site sends v2",
+                  self.duplicates)
+        m.counter("messages_partial_total", "Partial JSON state completed from the previous state",
+                  self.carried)
+        m.counter("backfill_records_total", "Offline samples received in backfill batches",
+                  self.backfilled)
+        m.counter("backfill_rejected_total", "Backfill records that were malformed or had no clock",
+                  self.backfill_rejected)
+        m.counter("commands_published_total", "MQTT publishes by the daemon", self.published)
+        m.gauge("mqtt_connected", "1 while connected to the broker", int(self.connected))
+        now = time.time()
+        for topic, sample in self.latest.items():
+            m.gauge("last_message_age_seconds", "Seconds since the last valid message",
+                    round(now - sample.ts, 3), site=site_of(topic), topic=topic)
+        for s in self.stages:
+            m.counter("stage_errors_total", "Exceptions raised by a stage's on_message",
+                      self.errors.get(s.name, 0), stage=s.name)
+            s.metrics(m)
+        return m.render()
+
+    def request_stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        # înainte de self.loop: replay-ul în proces începe să trimită când acesta apare
+        self._seeds = await asyncio.to_thread(self._load_seeds)
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self.loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        for s in self.stages:
+            s.start(self)
+        if not self.offline:
+            self.client.connect_async(cfg.MQTT_BROKER, cfg.MQTT_PORT, keepalive=60)
+            self.client.loop_start()
+
+        server = None
+        if cfg.METRICS_PORT > 0 and not self.offline:
+            try:
+                server = await serve(cfg.METRICS_HOST, cfg.METRICS_PORT, self.render_metrics)
+            except OSError as e:
+                # ex. portul e ocupat de alt serviciu; daemon-ul merge și fără metrici
+                print(f"[metrics] cannot listen on {cfg.METRICS_HOST}:{cfg.METRICS_PORT}: {e}", flush=True)
+
+        tasks = [asyncio.create_task(s.run(), name=s.name) for s in self.stages]
+        try:
+            await self._stopping.wait()
+        finally:
+            if server is not None:
+                server.close()
+            # systemd stop: întâi rețeaua, apoi etapele (ingest golește coada în DB)
+            if not self.offline:
+                self.client.disconnect()
+                self.client.loop_stop()
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for s in reversed(self.stages):
+                s.stop()
+            print(f"[hub] received={self.received} ignored={self.ignored} "
+                  f"duplicates={self.duplicates} carried={self.carried} "
+                  f"backfilled={self.backfilled} published={self.published}", flush=True)
+            for s in self.stages:
+                print(f"[{s.name}] {s.stats()}", flush=True)
+
+class IngestStage(Stage):
+    name = "ingest"
+    history = True
+
+    def __init__(self, rollups: bool = True):
+        self.topics = (cfg.TOPIC_STATE_SENSORS_ALL,)
+        self.writer = TelemetryWriter(
+            cfg.DB_PATH,
+            batch_size=cfg.WRITER_BATCH,
+            flush_s=cfg.WRITER_FLUSH_S,
+            max_queue=cfg.WRITER_QUEUE_MAX,
+            stats_every_s=cfg.WRITER_STATS_S,
+            rollups=rollups,
+            retry_max=cfg.WRITER_RETRY_MAX,
+            retry_rows=cfg.WRITER_RETRY_ROWS,
+        )
+        # (topic, backfill) -> ultimul eșantion valid; backfill-ul are propria cronologie
+        self._last = {}
+        self.filled = 0
+
+    def start(self, hub):
+        super().start(hub)
+        self.writer.start()
+
+    def on_message(self, sample: Sample):
+        # decodarea în coloane se face în thread-ul writer-ului; JSON-ul parsat de Hub
+        # merge odată cu mesajul, ca să nu fie parsat din nou
+        if sample.valid:
+            self._fill(sample)
+        self.writer.submit(int(sample.ts), sample.topic, sample.payload, sample.parsed)
+
+    def _fill(self, sample: Sample):
+        # report-by-exception: starea anterioară a ținut până la acest mesaj. O scriem pe
+        # fiecare secundă dintre ele, ca load_xy, depozitul de feature-uri și fracțiile din
+        # rollup-uri (pe număr de rânduri) să cântărească în continuare timpul, nu mesajele.
+        key = (sample.topic, sample.backfill)
+        prev = self._last.get(key)
+        self._last[key] = sample
+        if prev is None:
+            return
+        t0, t1 = int(prev.ts), int(sample.ts)
+        if not 1 < t1 - t0 <= cfg.STATE_FILL_MAX_S:
+            return
+        for ts in range(t0 + 1, t1):
+            self.writer.submit(ts, prev.topic, prev.payload, prev.parsed)
+        self.filled += t1 - t0 - 1
+
+    def stop(self):
+        self.writer.stop()
+
+    def stats(self) -> dict:
+        return dict(self.writer.stats(), filled=self.filled)
+
+    def metrics(self, m: Exposition):
+        w = self.writer
+        m.counter("writer_received_total", "Rows submitted to the writer", w.received)
+        m.counter("ingest_filled_rows_total", "Rows repeating a held state between messages",
+                  self.filled)
+        m.counter("writer_dropped_total", "Rows lost: writer queue full or commit retries exhausted",
+                  w.dropped)
+        m.counter("writer_rejected_total", "Rows with an undecodable payload", w.rejected)
+        m.counter("writer_written_total", "Rows committed to SQLite", w.written)
+        m.counter("writer_flushes_total", "Committed batches", w.flushes)
+        m.counter("writer_failed_flushes_total", "Commit attempts that failed (rows are retried)",
+                  w.failed_flushes)
+        m.gauge("writer_pending_rows", "Rows waiting for a commit retry", w.pending)
+        for name, n in w.task_failures.items():
+            m.counter("writer_task_failures_total", "Failed idle tasks (rollups)", n, task=name)
+        m.gauge("writer_queue_depth", "Rows waiting in the writer queue", w.q.qsize())
+        m.histogram("writer_flush_seconds", "Batch insert + commit time", w.flush_hist)
+        m.histogram("writer_commit_lag_seconds", "Per-row time from submit to commit", w.lag_hist)
+        for suffix in ("", "-wal"):
+            try:
+                size = os.path.getsize(cfg.DB_PATH + suffix)
+            except OSError:
+                continue
+            m.gauge("db_bytes", "SQLite file sizes", size, file=os.path.basename(cfg.DB_PATH + suffix))
+
+class RollupStage(Stage):
+    # cu ingest în același proces: sarcină "idle" pe conexiunea writer-ului;
+    # altfel (ex. proces separat), conexiune proprie într-un thread
+    name = "rollups"
+
+    def __init__(self, every_s: float = 30.0, max_rows: int = 20000):
+        self.every_s = every_s
+        self.max_rows = max_rows
+        self.rows = 0
+        self.failures = 0
+        self._standalone = False
+
+    def _catch_up(self, con):
+        while True:
+            n = catch_up_rollups(con, self.max_rows)
+            self.rows += n
+            if n < self.max_rows:
+                return
+
+    def start(self, hub):
+        super().start(hub)
+        ingest = hub.stage("ingest")
+        if ingest is not None:
+            ingest.writer.add_idle_task("rollups", self._catch_up, self.every_s, run_at_start=True)
+        else:
+            self._standalone = True
+
+    def _catch_up_once(self):
+        # conexiunea se deschide și se închide în același thread de lucru
+        con = connect(cfg.DB_PATH)
+        try:
+            self._catch_up(con)
+        finally:
+            con.close()
+
+    async def run(self):
+        if not self._standalone:
+            return
+        while True:
+            try:
+                await asyncio.to_thread(self._catch_up_once)
+            except sqlite3.Error as e:
+                self.failures += 1
+                print(f"[rollups] catch-up failed: {e}", flush=True)
+            await asyncio.sleep(self.every_s)
+
+    def stats(self) -> dict:
+        return {"rows": self.rows}
+
+    def metrics(self, m: Exposition):
+        m.counter("rollup_rows_total", "Rows aggregated by the background rollup stage", self.rows)
+        m.counter("rollup_failures_total", "Failed standalone catch-up runs", self.failures)
+
+class SiteControl:
+    # starea controller-ului pentru o seră: comenzile ei, modelul ei, pragul de zile
+    def __init__(self, site: str, publish, shared_models, prepare):
+        from commands import CommandOutput
+        from model_store import ModelCache
+
+        self.site = site
+        self.topic_state = site_topic(site, cfg.TOPIC_STATE_SENSORS)
+        self.topic_mode = site_topic(site, cfg.TOPIC_CMD_MODE)
+        self.topic_fan = site_topic(site, cfg.TOPIC_CMD_FAN)
+        self.topic_lamp = site_topic(site, cfg.TOPIC_CMD_LAMP_POWER)
+        # doar schimbările pleacă spre ESP32 (+ keep-alive), nu toate trei la fiecare decizie
+        self.out = CommandOutput(
+            publish,
+            deadbands={self.topic_fan: cfg.CMD_FAN_DEADBAND},
+            refresh_s=cfg.CMD_REFRESH_S,
+            grace_s=cfg.CMD_GRACE_S,
+        )
+        self.shared = shared_models
+        path = model_path(site)
+        self.models = shared_models if path == shared_models.path else ModelCache(path, prepare=prepare)
+        self.gate_open = False
+        self.decisions = 0
+
+    def model(self):
+        # modelul serei dacă există, altfel cel comun (blocant: rulează în to_thread)
+        return self.models.get() or self.shared.get()
+
+    def observe(self, d: dict):
+        # starea raportată de ESP32 corectează ce credem că i-am trimis
+        self.out.observe(self.topic_mode, str(d.get("mode", "")).lower() or None)
+        fan = d.get("fan_pct")
+        if isinstance(fan, (int, float)) and not isinstance(fan, bool):
+            self.out.observe(self.topic_fan, fan)
+        lamp = d.get("lamp_power")
+        if lamp is not None:
+            self.out.observe(self.topic_lamp, "on" if lamp else "off")
+
+    def send(self, fan_pct_i: int, lamp_str: str):
+        # Preluare control: comuți în manual + setezi ventilator/lampă
+        self.out.send(self.topic_mode, "manual")
+        self.out.send(self.topic_fan, fan_pct_i)
+        self.out.send(self.topic_lamp, lamp_str)
+        self.decisions += 1
+
+class ControllerStage(Stage):
+    name = "controller"
+
+    def __init__(self):
+        # importat aici: ingest-ul singur nu are nevoie de sklearn/joblib
+        from controller_ai import DecisionStats
+        from forest_engine import compile_model
+        from model_store import ModelCache
+
+        self.topics = (cfg.TOPIC_STATE_SENSORS_ALL,)
+        # pădurile se compilează o dată la reload; predict pe un lot ocolește overhead-ul sklearn
+        self.prepare = compile_model
+        self.models = ModelCache(cfg.MODEL_PATH, prepare=compile_model)
+        self.latency = DecisionStats()
+        self.sites = {}             # site -> SiteControl
+        self.received = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.gate_errors = 0
+        # /metrics: durata predict-ului pe lot și latența recepție -> comenzi, per eșantion
+        self.inference_hist = Histogram()
+        self.decision_hist = Histogram()
+        self._new = asyncio.Event()
+        self._pending = {}          # topicurile de stare cu eșantion nou, în ordinea sosirii
+
+    def _site(self, site: str) -> SiteControl:
+        sc = self.sites.get(site)
+        if sc is None:
+            sc = self.sites[site] = SiteControl(site, self.hub.publish, self.models, self.prepare)
+        return sc
+
+    def on_connect(self):
+        # sesiune nouă la broker: nu ne bazăm pe ce am trimis înainte
+        for sc in self.sites.values():
+            sc.out.forget()
+
+    def on_message(self, sample: Sample):
+        if not sample.valid:
+            return
+        self.received += 1
+        if sample.topic in self._pending:
+            self.coalesced += 1
+        self._pending[sample.topic] = None
+        self._new.set()
+
+    def _open_gates(self, closed: list):
+        # citire read-only: nu concurează cu writer-ul pentru lock; o conexiune pentru toate
+        try:
+            con = connect_readonly(cfg.DB_PATH)
+        except sqlite3.Error:
+            return
+        try:
+            for sc in closed:
+                sc.gate_open = days_covered(con, sc.topic_state) >= cfg.MIN_DAYS_BEFORE_CONTROL
+        except sqlite3.Error as e:
+            # reîncercăm la următorul eșantion; eroarea apare în log și în /metrics
+            self.gate_errors += 1
+            print(f"[ai] gate check failed: {e}", flush=True)
+        finally:
+            con.close()
+
+    async def _tick(self, topics: list):
+        from controller_ai import decide_batch
+
+        batch = []
+        for topic in topics:
+            sample = self.hub.latest.get(topic)
+            if sample is None:
+                continue
+            sc = self._site(site_of(topic))
+            sc.observe(sample.data)
+            batch.append((sc, sample))
+
+        # odată atins pragul de zile, nu mai întrebăm DB-ul pentru sera respectivă
+        closed = [sc for sc, _ in batch if not sc.gate_open]
+        if closed:
+            await asyncio.to_thread(self._open_gates, closed)
+
+        # Nu te bagi peste utilizator: dacă e MANUAL, nu publici nimic
+        batch = [(sc, sample) for sc, sample in batch
+                 if sc.gate_open and str(sample.data.get("mode", "")).lower() == "auto"]
+        if not batch:
+            return
+
+        # Modelele stau în RAM; se reîncarcă doar când train.py publică unul nou.
+        # Reîncărcarea (joblib + compilare) nu blochează bucla, deci nici ingest-ul.
+        models = await asyncio.to_thread(lambda: [sc.model() for sc, _ in batch])
+
+        # un predict per model pentru toate serele care îl folosesc (de obicei unul comun)
+        groups = {}
+        for item, model in zip(batch, models):
+            if model is not None:
+                groups.setdefault(id(model), (model, []))[1].append(item)
+        for model, items in groups.values():
+            t0 = time.perf_counter()
+            decisions = decide_batch(model, [s.data for _, s in items], [s.ts for _, s in items])
+            self.inference_hist.observe(time.perf_counter() - t0)
+            for (sc, sample), (fan_pct_i, lamp_str) in zip(items, decisions):
+                sc.send(fan_pct_i, lamp_str)
+                self.latency.record(sample.t_recv)
+                self.decision_hist.observe(self.latency.last_ms / 1000.0)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(items))
+
+    async def run(self):
+        last_decision = 0.0
+        next_stats = time.monotonic() + cfg.AI_STATS_S if cfg.AI_STATS_S > 0 else None
+
+        while True:
+            # inferența pornește la sosirea unui eșantion nou, nu pe un sleep fix.
+            # Timeout-ul setează același Event (nu wait_for): în 3.11 wait_for poate
+            # înghiți anularea de la oprire dacă Event-ul vine în același moment.
+            timer = asyncio.get_running_loop().call_later(cfg.LOOP_SECONDS, self._new.set)
+            try:
+                await self._new.wait()
+            finally:
+                timer.cancel()
+            if not self._pending:
+                self._new.clear()
+
+            if next_stats is not None and time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + cfg.AI_STATS_S
+                print(f"[ai] {self.stats()}", flush=True)
+
+            if not self._pending:
+                continue
+
+            # interval minim opțional între decizii; după pauză luăm eșantioanele cele mai noi
+            wait = cfg.AI_MIN_INTERVAL_S - (time.monotonic() - last_decision)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._new.clear()
+            topics = list(self._pending)
+            self._pending.clear()
+
+            await self._tick(topics)
+            last_decision = time.monotonic()
+
+    def stats(self) -> dict:
+        commands = {}
+        for sc in self.sites.values():
+            for k, v in sc.out.stats().items():
+                if k != "per_topic":
+                    commands[k] = commands.get(k, 0) + v
+        return {**self.latency.stats(), "received": self.received,
+                "coalesced": self.coalesced, "sites": len(self.sites),
+                "batches": self.batches, "max_batch": self.max_batch,
+                "model": self.models.stats(), "commands": commands,
+                "per_site": {sc.site: sc.decisions for sc in self.sites.values()}}
+
+    def metrics(self, m: Exposition):
+        ms = self.models.stats()
+        m.gauge("model_loaded", "1 once a model is in memory", int(ms["loaded"]))
+        m.gauge("model_load_seconds", "Duration of the last model load + compile", ms["load_ms"] / 1000.0)
+        m.counter("model_reloads_total", "Model loads", ms["reloads"])
+        m.counter("model_load_failures_total", "Model loads that failed", ms["failures"])
+        m.counter("controller_received_total", "State samples seen by the controller", self.received)
+        m.counter("controller_coalesced_total", "Samples superseded before a decision", self.coalesced)
+        m.counter("controller_gate_errors_total", "Failed MIN_DAYS gate checks", self.gate_errors)
+        m.histogram("inference_seconds", "Batched predict time (both forests)", self.inference_hist)
+        m.histogram("decision_latency_seconds", "Time from message receipt to commands",
+                    self.decision_hist)
+        for sc in self.sites.values():
+            m.counter("decisions_total", "Controller decisions", sc.decisions, site=sc.site)
+            m.gauge("gate_open", "1 once the site has MIN_DAYS of telemetry", int(sc.gate_open),
+                    site=sc.site)
+            cs = sc.out.stats()
+            for result in ("sent", "suppressed", "refreshed", "invalidated"):
+                m.counter("commands_total", "Controller commands by outcome", cs[result],
+                          site=sc.site, result=result)
+
+STAGES = ("ingest", "controller", "rollups")
+
+def build_stages(names) -> list:
+    names = [n for n in STAGES if n in set(names)]
+    stages = []
+    if "ingest" in names:
+        # cu etapa "rollups" activă, agregarea iese de pe calea de commit
+        rollups = cfg.ROLLUPS_ENABLED and "rollups" not in names
+        stages.append(IngestStage(rollups=rollups))
+    if "controller" in names:
+        stages.append(ControllerStage())
+    if "rollups" in names:
+        stages.append(RollupStage(every_s=cfg.ROLLUP_EVERY_S))
+    return stages
+
+def main(argv=None, default_stages=None, client_id: str = "pi-sera"):
+    ap = argparse.ArgumentParser(description="Greenhouse Pi daemon: ingest, AI controller, rollups")
+    ap.add_argument("--stages", default=",".join(default_stages or cfg.DAEMON_STAGES),
+                    help=f"comma-separated subset of {','.join(STAGES)}")
+    args = ap.parse_args(argv)
+
+    names = [n.strip() for n in args.stages.split(",") if n.strip()]
+    unknown = set(names) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"unknown stages: {', '.join(sorted(unknown))}")
+    hub = Hub(build_stages(names), client_id=client_id)
+    asyncio.run(hub.run())
+
+if __name__ == "__main__":
+    main()
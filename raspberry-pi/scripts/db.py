@@ -1,32 +1,658 @@
 import sqlite3
+import calendar
+import time
 from pathlib import Path
 
+from payload_codec import decode
+
+# Telemetria e partiționată pe luni (UTC): un tabel telemetry_YYYYMM per lună,
+# înregistrat în telemetry_partitions. Lunile vechi pot fi mutate în arhivă
+# (bucăți .npz, vezi archive.py); query_range citește transparent din ambele.
+# `id` e global și crescător (telemetry_meta.next_id), deci rămâne un watermark
+# valid peste toate partițiile, inclusiv pentru date întârziate.
+# `payload` = mesajul brut: text JSON sau, pentru formatul v2, cei 25 B binari (BLOB).
 SCHEMA = """
-CREATE TABLE IF NOT EXISTS telemetry (
-  ts INTEGER NOT NULL,
-  topic TEXT NOT NULL,
-  payload TEXT NOT NULL
+CREATE TABLE IF NOT EXISTS telemetry_stats (
+  topic TEXT PRIMARY KEY,
+  min_ts INTEGER NOT NULL,
+  max_ts INTEGER NOT NULL,
+  rows INTEGER NOT NULL
 );
-CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry(ts);
+
+CREATE TABLE IF NOT EXISTS telemetry_partitions (
+  month INTEGER PRIMARY KEY,
+  hot INTEGER NOT NULL DEFAULT 1,
+  archive TEXT,
+  max_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS telemetry_meta (
+  key TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS telemetry_archive_parts (
+  path TEXT PRIMARY KEY,
+  month INTEGER NOT NULL,
+  min_id INTEGER NOT NULL,
+  max_id INTEGER NOT NULL,
+  min_ts INTEGER NOT NULL,
+  max_ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_parts_month ON telemetry_archive_parts(month, min_ts);
+"""
+
+# coloanele decodate din payload-ul JSON, în ordinea din tabel
+TELEMETRY_COLUMNS = ("temp", "light", "soil", "water", "mode", "fan_pct", "lamp_power", "ip")
+
+# Agregate pe minut / oră, ținute la zi de writer. Toate câmpurile sunt combinabile
+# (count, sumă, min, max), deci datele întârziate se adaugă corect în bucket-ul lor.
+ROLLUPS = {"1m": 60, "1h": 3600}
+ROLLUP_SENSORS = ("temp", "light", "soil", "water")
+
+_ROLLUP_FIELDS = (
+    ["n", "auto_n"]
+    + [f"{c}_{k}" for c in ROLLUP_SENSORS for k in ("n", "sum", "min", "max")]
+    + ["fan_n", "fan_sum", "lamp_n", "lamp_on"]
+)
+
+def _rollup_table(name: str) -> str:
+    return f"telemetry_rollup_{name}"
+
+ROLLUP_SCHEMA = "".join(
+    f"""
+CREATE TABLE IF NOT EXISTS {_rollup_table(name)} (
+  topic TEXT NOT NULL,
+  bucket INTEGER NOT NULL,
+  {", ".join(f"{f} {'REAL' if f.endswith(('_sum', '_min', '_max')) else 'INTEGER'}" for f in _ROLLUP_FIELDS)},
+  PRIMARY KEY (topic, bucket)
+) WITHOUT ROWID;
 """
+    for name in ROLLUPS
+)
+
+_COLUMN_TYPES = {
+    "temp": "REAL", "light": "REAL", "soil": "REAL", "water": "REAL",
+    "mode": "TEXT", "fan_pct": "REAL", "lamp_power": "INTEGER", "ip": "TEXT",
+}
+
+def month_of(ts: int) -> int:
+    t = time.gmtime(ts)
+    return t.tm_year * 100 + t.tm_mon
+
+def month_bounds(month: int):
+    y, m = divmod(month, 100)
+    lo = calendar.timegm((y, m, 1, 0, 0, 0))
+    hi = calendar.timegm((y + m // 12, m % 12 + 1, 1, 0, 0, 0))
+    return lo, hi
+
+# sera = primul nivel al topicului (ca sites.site_of); coloană generată, virtuală:
+# nu ocupă loc în rând și nu schimbă ce scrie insert_many, dar se poate indexa
+_SITE_EXPR = "CASE WHEN instr(topic, '/') > 0 THEN substr(topic, 1, instr(topic, '/') - 1) ELSE topic END"
+_SITE_DDL = f"site TEXT GENERATED ALWAYS AS ({_SITE_EXPR}) VIRTUAL"
+
+def partition_table(month: int) -> str:
+    return f"telemetry_{month}"
+
+def partition_ddl(table: str, schema: str = "main", payload_required: bool = True) -> str:
+    cols = ", ".join(f"{c} {_COLUMN_TYPES[c]}" for c in TELEMETRY_COLUMNS)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {schema}.{table} ("
+        f"id INTEGER PRIMARY KEY, ts INTEGER NOT NULL, topic TEXT NOT NULL, "
+        f"payload TEXT{' NOT NULL' if payload_required else ''}, {cols}, {_SITE_DDL});"
+        f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_topic_ts ON {table}(topic, ts);"
+        f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_site_ts ON {table}(site, ts);"
+        f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_topic_id ON {table}(topic, id);"
+    )
+
+def _ensure_partition(con: sqlite3.Connection, month: int) -> str:
+    table = partition_table(month)
+    for stmt in partition_ddl(table).split(";"):
+        if stmt:
+            con.execute(stmt)
+    con.execute(
+        "INSERT INTO telemetry_partitions(month, hot) VALUES(?, 1) "
+        "ON CONFLICT(month) DO UPDATE SET hot = 1",
+        (month,),
+    )
+    return table
+
+def _partition_insert_sql(table: str) -> str:
+    return (
+        f"INSERT INTO {table}(id, ts, topic, payload, {', '.join(TELEMETRY_COLUMNS)}) "
+        f"VALUES({','.join('?' * (4 + len(TELEMETRY_COLUMNS)))})"
+    )
+
+def _num(x, cast=float):
+    if x is None:
+        return None
+    try:
+        return cast(x)
+    except (TypeError, ValueError):
+        return None
+
+def payload_columns(d: dict):
+    # dict deja parsat (JSON sau v2) -> coloanele din TELEMETRY_COLUMNS
+    mode = d.get("mode")
+    ip = d.get("ip")
+    return (
+        _num(d.get("temp")),
+        _num(d.get("light")),
+        _num(d.get("soil")),
+        _num(d.get("water")),
+        str(mode).lower() if mode is not None else None,
+        _num(d.get("fan_pct")),
+        _num(d.get("lamp_power"), int),
+        str(ip) if ip is not None else None,
+    )
+
+def decode_payload(payload):
+    # None dacă payload-ul nu e nici v2 binar, nici un obiect JSON valid
+    d = decode(payload)
+    if d is None:
+        return None
+    return payload_columns(d)
+
+def decode_row(ts: int, topic: str, payload, data: dict | None = None):
+    # data = payload-ul deja parsat de apelant (Hub), ca JSON-ul să nu fie decodat de două ori
+    cols = payload_columns(data) if data is not None else decode_payload(payload)
+    if cols is None:
+        return None
+    return (ts, topic, payload) + cols
+
+def _migrate_typed_columns(con: sqlite3.Connection) -> None:
+    have = {r[1] for r in con.execute("PRAGMA table_info(telemetry)")}
+    for c in TELEMETRY_COLUMNS:
+        if c not in have:
+            con.execute(f"ALTER TABLE telemetry ADD COLUMN {c} {_COLUMN_TYPES[c]}")
+
+    # backfill pentru bazele existente, pe bucăți după rowid
+    sets = ", ".join(f"{c} = ?" for c in TELEMETRY_COLUMNS)
+    last = 0
+    while True:
+        rows = con.execute(
+            "SELECT rowid, payload FROM telemetry WHERE rowid > ? ORDER BY rowid LIMIT 5000", (last,)
+        ).fetchall()
+        if not rows:
+            break
+        last = rows[-1][0]
+        upd = []
+        for rowid, p in rows:
+            cols = decode_payload(p)
+            if cols is not None:
+                upd.append(cols + (rowid,))
+        con.executemany(f"UPDATE telemetry SET {sets} WHERE rowid = ?", upd)
+
+    con.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_topic_ts ON telemetry(topic, ts)")
+
+def _migrate_stats(con: sqlite3.Connection) -> None:
+    # o singură scanare completă, apoi writer-ul ține statisticile la zi
+    con.execute("DELETE FROM telemetry_stats")
+    con.execute(
+        "INSERT INTO telemetry_stats(topic, min_ts, max_ts, rows) "
+        "SELECT topic, MIN(ts), MAX(ts), COUNT(*) FROM telemetry GROUP BY topic"
+    )
+
+def _raw_aggregate_sql(res: int, source: str = "telemetry") -> str:
+    # aceleași câmpuri ca tabelele de rollup, calculate direct din telemetry
+    cols = ["COUNT(*) AS n", "TOTAL(mode = 'auto') AS auto_n"]
+    for c in ROLLUP_SENSORS:
+        cols += [f"COUNT({c}) AS {c}_n", f"TOTAL({c}) AS {c}_sum",
+                 f"MIN({c}) AS {c}_min", f"MAX({c}) AS {c}_max"]
+    cols += ["COUNT(fan_pct) AS fan_n", "TOTAL(fan_pct) AS fan_sum",
+             "COUNT(lamp_power) AS lamp_n", "TOTAL(lamp_power != 0) AS lamp_on"]
+    return f"SELECT topic, ts - ts % {res} AS bucket, {', '.join(cols)} FROM {source}"
+
+def _migrate_rollups(con: sqlite3.Connection) -> None:
+    # tabelele există deja (connect rulează ROLLUP_SCHEMA); aici doar backfill
+    for name, res in ROLLUPS.items():
+        con.execute(f"DELETE FROM {_rollup_table(name)}")
+        con.execute(
+            f"INSERT INTO {_rollup_table(name)}(topic, bucket, {', '.join(_ROLLUP_FIELDS)}) "
+            f"{_raw_aggregate_sql(res)} GROUP BY topic, bucket"
+        )
+
+def _migrate_partitions(con: sqlite3.Connection) -> None:
+    # tabelul unic telemetry -> telemetry_YYYYMM; rowid-ul vechi devine id
+    months = [r[0] for r in con.execute(
+        "SELECT DISTINCT CAST(strftime('%Y%m', ts, 'unixepoch') AS INTEGER) FROM telemetry"
+    )]
+    cols = ", ".join(TELEMETRY_COLUMNS)
+    for month in months:
+        table = _ensure_partition(con, month)
+        lo, hi = month_bounds(month)
+        con.execute(
+            f"INSERT INTO {table}(id, ts, topic, payload, {cols}) "
+            f"SELECT rowid, ts, topic, payload, {cols} FROM telemetry WHERE ts >= ? AND ts < ?",
+            (lo, hi),
+        )
+    last = con.execute("SELECT MAX(rowid) FROM telemetry").fetchone()[0] or 0
+    _set_meta(con, "next_id", last + 1)
+    con.execute("DROP TABLE telemetry")
+
+def _migrate_rollup_watermark(con: sqlite3.Connection) -> None:
+    # până acum rollup-urile se făceau doar la ingest, deci tot ce există e inclus
+    _set_meta(con, "rollup_id", _get_meta(con, "next_id", 1) - 1)
+
+def _migrate_site_column(con: sqlite3.Connection) -> None:
+    # mai multe sere: coloana `site` + index pe partițiile calde existente;
+    # partițiile arhivate o primesc la încărcare (partition_ddl)
+    for (month,) in con.execute("SELECT month FROM telemetry_partitions WHERE hot = 1").fetchall():
+        table = partition_table(month)
+        have = {r[1] for r in con.execute(f"PRAGMA table_xinfo({table})")}
+        if "site" not in have:
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {_SITE_DDL}")
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_site_ts ON {table}(site, ts)")
+
+def _migrate_topic_id_index(con: sqlite3.Connection) -> None:
+    # citirile incrementale (id > watermark) caută direct pe (topic, id),
+    # în loc să parcurgă tot indexul (topic, ts) al partiției
+    for (month,) in con.execute("SELECT month FROM telemetry_partitions WHERE hot = 1").fetchall():
+        table = partition_table(month)
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_topic_id ON {table}(topic, id)")
+
+def _migrate_archive_parts(con: sqlite3.Connection) -> None:
+    # arhivele vechi (un .npz per lună) devin o singură bucată, cu intervalul lunii
+    for month, path, max_id in con.execute(
+        "SELECT month, archive, max_id FROM telemetry_partitions WHERE archive IS NOT NULL"
+    ).fetchall():
+        lo, hi = month_bounds(month)
+        con.execute(
+            "INSERT OR IGNORE INTO telemetry_archive_parts(path, month, min_id, max_id, min_ts, max_ts) "
+            "VALUES(?, ?, 0, ?, ?, ?)",
+            (path, month, max_id or 0, lo, hi - 1),
+        )
+
+# user_version -> migrare; fiecare rulează o singură dată, într-o tranzacție.
+# 1..4 lucrează pe vechiul tabel unic `telemetry`; o bază nouă pornește direct la zi.
+MIGRATIONS = {
+    1: _migrate_typed_columns,
+    2: _migrate_stats,
+    3: _migrate_rollups,
+    4: _migrate_partitions,
+    5: _migrate_rollup_watermark,
+    6: _migrate_site_column,
+    7: _migrate_topic_id_index,
+    8: _migrate_archive_parts,
+}
+
+def _has_table(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def _get_meta(con: sqlite3.Connection, key: str, default: int = 0) -> int:
+    row = con.execute("SELECT value FROM telemetry_meta WHERE key = ?", (key,)).fetchone()
+    return int(row[0]) if row else default
+
+def _set_meta(con: sqlite3.Connection, key: str, value: int) -> None:
+    con.execute(
+        "INSERT INTO telemetry_meta(key, value) VALUES(?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, int(value)),
+    )
+
+def migrate(con: sqlite3.Connection) -> None:
+    target = max(MIGRATIONS)
+    if con.execute("PRAGMA user_version").fetchone()[0] >= target:
+        return
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        # recitim după lock: alt proces (logger/controller) poate fi migrat deja
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0 and not _has_table(con, "telemetry"):
+            version = target
+            con.execute(f"PRAGMA user_version = {target}")
+        for v in sorted(MIGRATIONS):
+            if v > version:
+                MIGRATIONS[v](con)
+                con.execute(f"PRAGMA user_version = {v}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    # doar pentru citiri (ex. controller): nu rulează DDL/migrări, deci nu ia lock de scriere
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
 
 def connect(db_path: str) -> sqlite3.Connection:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(db_path)
+    con = sqlite3.connect(db_path, timeout=30)
     con.execute("PRAGMA journal_mode=WAL;")
     con.execute("PRAGMA synchronous=NORMAL;")
-    con.executescript(SCHEMA)
+    con.executescript(SCHEMA + ROLLUP_SCHEMA)
+    migrate(con)
     return con
 
-def insert(con: sqlite3.Connection, ts: int, topic: str, payload: str) -> None:
-    con.execute("INSERT INTO telemetry(ts, topic, payload) VALUES(?,?,?)", (ts, topic, payload))
-    con.commit()
+def _update_stats(con: sqlite3.Connection, rows) -> None:
+    acc = {}
+    for r in rows:
+        ts, topic = r[0], r[1]
+        s = acc.get(topic)
+        if s is None:
+            acc[topic] = [ts, ts, 1]
+        else:
+            if ts < s[0]: s[0] = ts
+            if ts > s[1]: s[1] = ts
+            s[2] += 1
+    con.executemany(
+        "INSERT INTO telemetry_stats(topic, min_ts, max_ts, rows) VALUES(?,?,?,?) "
+        "ON CONFLICT(topic) DO UPDATE SET "
+        "min_ts = MIN(min_ts, excluded.min_ts), "
+        "max_ts = MAX(max_ts, excluded.max_ts), "
+        "rows = rows + excluded.rows",
+        [(t, s[0], s[1], s[2]) for t, s in acc.items()],
+    )
+
+def _update_rollups(con: sqlite3.Connection, rows) -> None:
+    # indecși în tuplul din decode_row()
+    i_sens = [3 + TELEMETRY_COLUMNS.index(c) for c in ROLLUP_SENSORS]
+    i_mode = 3 + TELEMETRY_COLUMNS.index("mode")
+    i_fan = 3 + TELEMETRY_COLUMNS.index("fan_pct")
+    i_lamp = 3 + TELEMETRY_COLUMNS.index("lamp_power")
+
+    for name, res in ROLLUPS.items():
+        acc = {}
+        for r in rows:
+            key = (r[1], r[0] - r[0] % res)
+            a = acc.get(key)
+            if a is None:
+                a = acc[key] = [0, 0] + [0, 0.0, None, None] * len(ROLLUP_SENSORS) + [0, 0.0, 0, 0]
+            a[0] += 1
+            if r[i_mode] == "auto":
+                a[1] += 1
+            for j, i in enumerate(i_sens):
+                v = r[i]
+                if v is None:
+                    continue
+                k = 2 + 4 * j
+                a[k] += 1
+                a[k + 1] += v
+                if a[k + 2] is None or v < a[k + 2]: a[k + 2] = v
+                if a[k + 3] is None or v > a[k + 3]: a[k + 3] = v
+            k = 2 + 4 * len(ROLLUP_SENSORS)
+            if r[i_fan] is not None:
+                a[k] += 1
+                a[k + 1] += r[i_fan]
+            if r[i_lamp] is not None:
+                a[k + 2] += 1
+                a[k + 3] += 1 if r[i_lamp] else 0
+
+        sets = []
+        for f in _ROLLUP_FIELDS:
+            if f.endswith("_min") or f.endswith("_max"):
+                fn = "MIN" if f.endswith("_min") else "MAX"
+                # MIN/MAX scalar din SQLite întoarce NULL dacă un argument e NULL
+                sets.append(f"{f} = {fn}(COALESCE({f}, excluded.{f}), COALESCE(excluded.{f}, {f}))")
+            else:
+                sets.append(f"{f} = {f} + excluded.{f}")
+        con.executemany(
+            f"INSERT INTO {_rollup_table(name)}(topic, bucket, {', '.join(_ROLLUP_FIELDS)}) "
+            f"VALUES({','.join('?' * (2 + len(_ROLLUP_FIELDS)))}) "
+            f"ON CONFLICT(topic, bucket) DO UPDATE SET {', '.join(sets)}",
+            [k + tuple(a) for k, a in acc.items()],
+        )
+
+def insert(con: sqlite3.Connection, ts: int, topic: str, payload) -> None:
+    row = decode_row(ts, topic, payload)
+    if row is None:
+        raise ValueError("payload is neither v2 nor a JSON object")
+    insert_many(con, [row])
+
+def _insert_partitioned(con: sqlite3.Connection, rows) -> None:
+    next_id = _get_meta(con, "next_id", 1)
+    by_month = {}
+    lo = hi = month = None
+    for r in rows:
+        ts = r[0]
+        if lo is None or not (lo <= ts < hi):
+            month = month_of(ts)
+            lo, hi = month_bounds(month)
+        by_month.setdefault(month, []).append((next_id,) + tuple(r))
+        next_id += 1
+    for month, mrows in by_month.items():
+        table = _ensure_partition(con, month)
+        con.executemany(_partition_insert_sql(table), mrows)
+    _set_meta(con, "next_id", next_id)
+
+def insert_many(con: sqlite3.Connection, rows, rollups: bool = True) -> None:
+    # rows = tupluri complete din decode_row(); un singur commit pentru tot lotul,
+    # statisticile de acoperire și rollup-urile se actualizează în aceeași tranzacție.
+    # rollups=False lasă agregarea pentru catch_up_rollups() (ex. etapa "rollups" din daemon)
+    if not rows:
+        return
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        first = _get_meta(con, "next_id", 1)
+        if rollups and _get_meta(con, "rollup_id") < first - 1:
+            # rânduri rămase neagregate dintr-o rulare cu rollup-uri amânate
+            while _catch_up_rollups(con, 20000):
+                pass
+        _insert_partitioned(con, rows)
+        _update_stats(con, rows)
+        if rollups:
+            _update_rollups(con, rows)
+            _set_meta(con, "rollup_id", _get_meta(con, "next_id", 1) - 1)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+def _catch_up_rollups(con: sqlite3.Connection, max_rows: int) -> int:
+    # cele mai mici max_rows id-uri peste watermark, din toate partițiile
+    wm = _get_meta(con, "rollup_id")
+    cols = ", ".join(TELEMETRY_COLUMNS)
+    rows = []
+    for src in partition_sources(con, after_id=wm):
+        table = _resolve_source(con, src, after_id=wm)
+        rows.extend(con.execute(
+            f"SELECT id, ts, topic, NULL, {cols} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+            (wm, max_rows),
+        ))
+    if not rows:
+        return 0
+    rows.sort()
+    rows = rows[:max_rows]
+    _update_rollups(con, [r[1:] for r in rows])
+    _set_meta(con, "rollup_id", rows[-1][0])
+    return len(rows)
+
+def catch_up_rollups(con: sqlite3.Connection, max_rows: int = 20000) -> int:
+    # agregă rândurile scrise cu rollups=False; o tranzacție scurtă per apel
+    if _get_meta(con, "rollup_id") >= _get_meta(con, "next_id", 1) - 1:
+        return 0
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        n = _catch_up_rollups(con, max_rows)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return n
+
+# Cursor peste mai multe partiții, citite în ordine; partițiile arhivate se încarcă
+# (archive.load_partition) abia când iterația ajunge la ele, doar bucățile din `bounds`.
+class _ChainCursor:
+    def __init__(self, con: sqlite3.Connection, sources, make_query, bounds=(None, None, None)):
+        self._con = con
+        self._sources = list(sources)
+        self._make_query = make_query
+        self._bounds = bounds
+        self._cur = None
+
+    def fetchmany(self, size: int = 1000):
+        out = []
+        while len(out) < size:
+            if self._cur is None:
+                if not self._sources:
+                    break
+                src = _resolve_source(self._con, self._sources.pop(0), *self._bounds)
+                sql, args = self._make_query(src)
+                self._cur = self._con.execute(sql, args)
+            rows = self._cur.fetchmany(size - len(out))
+            if not rows:
+                self._cur = None
+                continue
+            out.extend(rows)
+        return out
+
+    def fetchall(self):
+        out = []
+        while True:
+            rows = self.fetchmany(5000)
+            if not rows:
+                return out
+            out.extend(rows)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+
+def _resolve_source(con: sqlite3.Connection, src, t0: int | None = None, t1: int | None = None,
+                    after_id: int | None = None):
+    month, archive = src
+    if archive is None:
+        return f"main.{partition_table(month)}"
+    from archive import load_partition
+    return load_partition(con, month, t0, t1, after_id)
+
+def partition_sources(con: sqlite3.Connection, t0: int | None = None, t1: int | None = None,
+                      after_id: int | None = None, descending: bool = False,
+                      hot_only: bool = False):
+    # (lună, fișier_arhivă sau None) pentru partițiile care intersectează [t0, t1);
+    # hot_only=True sare peste arhive (fără load_partition)
+    out = []
+    for month, hot, archive, max_id in con.execute(
+        "SELECT month, hot, archive, max_id FROM telemetry_partitions ORDER BY month"
+    ):
+        lo, hi = month_bounds(month)
+        if (t0 is not None and hi <= t0) or (t1 is not None and lo >= t1):
+            continue
+        if archive and not hot_only and not (after_id is not None and max_id is not None and max_id <= after_id):
+            out.append((month, archive))
+        if hot:
+            out.append((month, None))
+    if descending:
+        out.reverse()
+    return out
+
+def query_range(con: sqlite3.Connection, topic: str, t0: int | None = None, t1: int | None = None,
+                columns=("ts",) + TELEMETRY_COLUMNS, where: str = "", params=(),
+                descending: bool = False, after_id: int | None = None, order_by: str = "ts",
+                hot_only: bool = False):
+    # interval [t0, t1) pe indexul (topic, ts), peste partițiile calde și arhivate;
+    # `where` = predicat SQL suplimentar, `after_id` = doar rânduri cu id > after_id.
+    # order_by="id" ordonează în fiecare partiție după id (indexul (topic, id)):
+    # pentru citiri incrementale, care altfel ar parcurge tot indexul (topic, ts)
+    if order_by not in ("ts", "id"):
+        raise ValueError(f"unknown order: {order_by}")
+    for c in columns:
+        if c not in ("id", "rowid", "ts", "topic", "site") and c not in TELEMETRY_COLUMNS:
+            raise ValueError(f"unknown telemetry column: {c}")
+    cond = "topic = ?"
+    args = [topic]
+    if t0 is not None:
+        cond += " AND ts >= ?"
+        args.append(int(t0))
+    if t1 is not None:
+        cond += " AND ts < ?"
+        args.append(int(t1))
+    if after_id is not None:
+        cond += " AND id > ?"
+        args.append(int(after_id))
+    if where:
+        cond += f" AND ({where})"
+        args.extend(params)
+    order = f" ORDER BY {order_by}" + (" DESC" if descending else "")
+
+    def make_query(table):
+        return f"SELECT {', '.join(columns)} FROM {table} WHERE {cond}{order}", args
+
+    return _ChainCursor(con, partition_sources(con, t0, t1, after_id, descending, hot_only),
+                        make_query, (t0, t1, after_id))
+
+_ROLLUP_OUT = (
+    ["bucket", "n"]
+    + [f"{c}_{k}" for c in ROLLUP_SENSORS for k in ("mean", "min", "max")]
+    + ["auto_frac", "fan_duty", "lamp_duty"]
+)
+
+def _rollup_select() -> str:
+    cols = ["bucket", "n"]
+    for c in ROLLUP_SENSORS:
+        cols += [f"{c}_sum / NULLIF({c}_n, 0)", f"{c}_min", f"{c}_max"]
+    cols += [
+        "CAST(auto_n AS REAL) / n",
+        "fan_sum / NULLIF(fan_n, 0) / 100.0",   # fan_pct 0..100 -> 0..1
+        "CAST(lamp_on AS REAL) / NULLIF(lamp_n, 0)",
+    ]
+    return ", ".join(cols)
+
+def pick_resolution(t0: int, t1: int, max_points: int) -> int:
+    # cea mai fină rezoluție (1 s, 1 min, 1 h) care nu depășește bugetul de puncte;
+    # dacă nici ora nu încape, rămâne ora
+    span = max(1, int(t1) - int(t0))
+    for res in (1,) + tuple(sorted(ROLLUPS.values())):
+        if span / res <= max_points:
+            return res
+    return max(ROLLUPS.values())
+
+def query_aggregates(con: sqlite3.Connection, topic: str, t0: int, t1: int,
+                     max_points: int = 1000, resolution: int | None = None):
+    # întoarce (rezoluție_s, coloane, rânduri) pentru [t0, t1), câte un rând pe bucket:
+    # medie/min/max pe senzor + fracțiile AUTO, ventilator și lampă
+    res = resolution or pick_resolution(t0, t1, max_points)
+    if res == 1:
+        # interval scurt: agregăm direct din partiții, un bucket pe secundă
+        def make_query(table):
+            return (
+                f"SELECT {_rollup_select()} FROM ({_raw_aggregate_sql(1, table)} "
+                "WHERE topic = ? AND ts >= ? AND ts < ? GROUP BY topic, bucket) ORDER BY bucket",
+                (topic, int(t0), int(t1)),
+            )
+        rows = _ChainCursor(con, partition_sources(con, t0, t1), make_query, (t0, t1, None)).fetchall()
+        return res, list(_ROLLUP_OUT), rows
+
+    name = next((k for k, v in ROLLUPS.items() if v == res), None)
+    if name is None:
+        raise ValueError(f"unsupported resolution: {res}")
+    rows = con.execute(
+        f"SELECT {_rollup_select()} FROM {_rollup_table(name)} "
+        "WHERE topic = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+        (topic, int(t0) - int(t0) % res, int(t1)),
+    ).fetchall()
+    return res, list(_ROLLUP_OUT), rows
+
+def min_max_ts(con: sqlite3.Connection, topic: str | None = None):
+    # O(nr. topicuri), nu scanare pe telemetry; topic=None = toate serele
+    if topic is None:
+        return con.execute("SELECT MIN(min_ts), MAX(max_ts) FROM telemetry_stats").fetchone()
+    return con.execute("SELECT min_ts, max_ts FROM telemetry_stats WHERE topic = ?", (topic,)).fetchone()
+
+def max_id(con: sqlite3.Connection) -> int:
+    # cel mai mare id alocat (0 pentru o bază goală); ca watermark, citit în aceeași
+    # tranzacție cu datele: un rând comis după aceea primește sigur un id mai mare
+    return _get_meta(con, "next_id", 1) - 1
+
+def latest_state(con: sqlite3.Connection, topic: str, hot_only: bool = False):
+    # ultimul rând al topicului, ca dict cu cheile payload-ului (None dacă nu există);
+    # hot_only=True nu încarcă luni arhivate: o stare de acum luni nu mai e "ultima"
+    row = query_range(con, topic, columns=TELEMETRY_COLUMNS, descending=True,
+                      hot_only=hot_only).fetchmany(1)
+    return dict(zip(TELEMETRY_COLUMNS, row[0])) if row else None
 
-def min_max_ts(con: sqlite3.Connection):
-    return con.execute("SELECT MIN(ts), MAX(ts) FROM telemetry").fetchone()
+def sites(con: sqlite3.Connection) -> list:
+    # serele care au trimis ceva, din telemetry_stats (fără scanare)
+    return [r[0] for r in con.execute(
+        f"SELECT DISTINCT {_SITE_EXPR} FROM telemetry_stats ORDER BY 1"
+    )]
 
-def days_covered(con: sqlite3.Connection) -> int:
-    row = min_max_ts(con)
+def days_covered(con: sqlite3.Connection, topic: str | None = None) -> int:
+    row = min_max_ts(con, topic)
     if not row or row[0] is None or row[1] is None:
         return 0
     min_ts, max_ts = int(row[0]), int(row[1])
@@ -0,0 +1,168 @@
+import sys
+import time
+
+import numpy as np
+
+# Pădurile sklearn exportate ca array-uri plate de noduri (toți arborii concatenați).
+# Frunzele au copiii = ele însele, deci parcurgerea e un număr fix (= adâncimea maximă)
+# de pași vectorizați, pentru toate rândurile și toți arborii deodată.
+# Rezultatul e identic bit cu bit cu predict() din sklearn: X e comparat în float32
+# cu pragurile float64, iar contribuțiile arborilor se adună în aceeași ordine.
+class CompiledForest:
+    def __init__(self, kind, feature, threshold, left, right, value, roots, depth, classes=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes = classes
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.value, self.roots))
+
+    def apply(self, X) -> np.ndarray:
+        # indexul global al frunzei, formă (n_rows, n_trees)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        Xf = np.ascontiguousarray(X).ravel()
+        base = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        idx = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0])).astype(np.intp)
+        for _ in range(self.depth):
+            go_left = Xf.take(base + self.feature.take(idx)) <= self.threshold.take(idx)
+            idx = np.where(go_left, self.left.take(idx), self.right.take(idx))
+        return idx
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.kind != "classifier":
+            raise TypeError("predict_proba is only available for classifiers")
+        leaf_p = self.value[self.apply(X)]              # (n, T, C)
+        # cumsum = adunare secvențială pe arbori, ca în sklearn
+        return np.cumsum(leaf_p, axis=1)[:, -1, :] / self.n_trees
+
+    def predict(self, X) -> np.ndarray:
+        if self.kind == "classifier":
+            return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+        leaf_v = self.value[self.apply(X)]              # (n, T)
+        return np.cumsum(leaf_v, axis=1)[:, -1] / self.n_trees
+
+def _values_are_fractions() -> bool:
+    # sklearn >= 1.4 ține în tree_.value fracțiile pe clase și predict_proba nu mai
+    # normalizează; o a doua normalizare ar schimba ultimii biți când suma nu e exact 1
+    import sklearn
+
+    major, minor = (int(p) for p in sklearn.__version__.split(".")[:2])
+    return (major, minor) >= (1, 4)
+
+def export_forest(est) -> CompiledForest:
+    if getattr(est, "n_outputs_", 1) != 1:
+        raise ValueError("only single-output forests are supported")
+    kind = "classifier" if hasattr(est, "classes_") else "regressor"
+    fractions = kind == "classifier" and _values_are_fractions()
+
+    feats, thrs, lefts, rights, vals, roots = [], [], [], [], [], []
+    depth = 0
+    off = 0
+    for tree in est.estimators_:
+        t = tree.tree_
+        n = t.node_count
+        is_leaf = t.children_left < 0
+        local = np.arange(n)
+
+        feats.append(np.where(is_leaf, 0, t.feature).astype(np.int32))
+        thrs.append(np.where(is_leaf, 0.0, t.threshold).astype(np.float64))
+        lefts.append((np.where(is_leaf, local, t.children_left) + off).astype(np.int32))
+        rights.append((np.where(is_leaf, local, t.children_right) + off).astype(np.int32))
+
+        v = t.value[:, 0, :]
+        if kind == "classifier":
+            v = v[:, :tree.n_classes_]
+            if not fractions:
+                # aceeași normalizare ca DecisionTreeClassifier.predict_proba (sklearn < 1.4)
+                norm = v.sum(axis=1)[:, np.newaxis]
+                norm[norm == 0.0] = 1.0
+                v = v / norm
+        else:
+            v = v[:, 0]
+        vals.append(np.ascontiguousarray(v, dtype=np.float64))
+
+        roots.append(off)
+        depth = max(depth, int(t.max_depth))
+        off += n
+
+    return CompiledForest(
+        kind,
+        np.concatenate(feats),
+        np.concatenate(thrs),
+        np.concatenate(lefts),
+        np.concatenate(rights),
+        np.concatenate(vals),
+        np.asarray(roots, dtype=np.int32),
+        depth,
+        classes=np.asarray(est.classes_) if kind == "classifier" else None,
+    )
+
+def compile_model(model: dict) -> dict:
+    # folosit ca `prepare` în ModelCache: înlocuiește pădurile sklearn cu variantele compilate
+    out = dict(model)
+    out["fan"] = export_forest(model["fan"])
+    out["lamp"] = export_forest(model["lamp"])
+    return out
+
+def _bench(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+def _sklearn_single_thread(est):
+    # comparația bit cu bit cere ordinea secvențială de acumulare din sklearn
+    if getattr(est, "n_jobs", None) not in (None, 1):
+        est = est.set_params(n_jobs=1)
+    return est
+
+def benchmark(model: dict, n_rows: int = 2000, repeat: int = 50, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    n_feat = model["fan"].n_features_in_
+    X = rng.normal(size=(n_rows, n_feat)).astype(np.float32)
+    X[:, :4] = np.abs(X[:, :4]) * np.array([25.0, 8000.0, 50.0, 50.0], dtype=np.float32)[:n_feat]
+    x1 = X[:1]
+
+    res = {}
+    for name in ("fan", "lamp"):
+        sk = _sklearn_single_thread(model[name])
+        cf = export_forest(sk)
+        exact = bool(np.array_equal(sk.predict(X), cf.predict(X)))
+        res[name] = {
+            "exact": exact,
+            "nodes": int(cf.feature.shape[0]),
+            "bytes": cf.nbytes,
+            "single_sklearn_ms": _bench(lambda: sk.predict(x1), repeat),
+            "single_compiled_ms": _bench(lambda: cf.predict(x1), repeat),
+            "batch_rows": n_rows,
+            "batch_sklearn_ms": _bench(lambda: sk.predict(X), max(1, repeat // 10)),
+            "batch_compiled_ms": _bench(lambda: cf.predict(X), max(1, repeat // 10)),
+        }
+    return res
+
+if __name__ == "__main__":
+    from joblib import load
+    import config_local as cfg
+
+    path = sys.argv[1] if len(sys.argv) > 1 else cfg.MODEL_PATH
+    for name, r in benchmark(load(path)).items():
+        print(f"{name}: exact={r['exact']} nodes={r['nodes']} bytes={r['bytes']}")
+        print(f"  single row: sklearn {r['single_sklearn_ms']:.3f} ms, "
+              f"compiled {r['single_compiled_ms']:.3f} ms")
+        print(f"  batch {r['batch_rows']}: sklearn {r['batch_sklearn_ms']:.3f} ms, "
+              f"compiled {r['batch_compiled_ms']:.3f} ms")
@@ -0,0 +1,99 @@
+import asyncio
+import bisect
+
+# Metrici în format text Prometheus, fără dependențe externe.
+# Contoarele există deja ca atribute în etape (received, written, ...); ele se citesc
+# doar la scrape. Pe calea mesajelor se adaugă numai Histogram.observe (bisect + două
+# adunări), deci costul pe mesaj e neglijabil față de decodare și SQLite.
+
+# secunde: de la 1 ms la 10 s, cât acoperă un commit SQLite pe card SD
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)    # ultimul = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        # scris dintr-un singur thread (writer sau bucla asyncio); scrape-ul doar citește
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+           for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, esc)) + "}"
+
+def _num(v) -> str:
+    if v is None:
+        return "NaN"
+    return repr(float(v)) if isinstance(v, float) else str(int(v))
+
+class Exposition:
+    # colectează familii de metrici; HELP/TYPE apar o singură dată per nume
+    def __init__(self, prefix: str = "sera_"):
+        self.prefix = prefix
+        self._families = {}     # nume -> (tip, help, [linii])
+
+    def _family(self, name: str, kind: str, help: str) -> list:
+        name = self.prefix + name
+        f = self._families.get(name)
+        if f is None:
+            f = self._families[name] = (kind, help, [])
+        return f[2]
+
+    def counter(self, name: str, help: str, value, **labels):
+        self._family(name, "counter", help).append(
+            f"{self.prefix}{name}{_labels(labels)} {_num(value)}")
+
+    def gauge(self, name: str, help: str, value, **labels):
+        self._family(name, "gauge", help).append(
+            f"{self.prefix}{name}{_labels(labels)} {_num(value)}")
+
+    def histogram(self, name: str, help: str, h: Histogram, **labels):
+        lines = self._family(name, "histogram", help)
+        full = self.prefix + name
+        acc = 0
+        for le, c in zip(h.buckets + (float("inf"),), h.counts):
+            acc += c
+            le_s = "+Inf" if le == float("inf") else repr(le)
+            lines.append(f"{full}_bucket{_labels({**labels, 'le': le_s})} {acc}")
+        lines.append(f"{full}_sum{_labels(labels)} {_num(h.sum)}")
+        lines.append(f"{full}_count{_labels(labels)} {acc}")
+
+    def render(self) -> str:
+        out = []
+        for name, (kind, help, lines) in self._families.items():
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+async def serve(host: str, port: int, render):
+    # HTTP minimal pentru /metrics; render() rulează în bucla asyncio, deci vede
+    # contoarele etapelor fără lock-uri
+    async def handle(reader, writer):
+        try:
+            line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] in (b"/metrics", b"/"):
+                body = render().encode()
+                head = b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            else:
+                body = b"not found\n"
+                head = b"HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(head + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
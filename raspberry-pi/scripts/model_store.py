@@ -0,0 +1,95 @@
+import os
+import time
+from joblib import dump, load
+
+def save_model_atomic(model: dict, path: str) -> None:
+    # scriem în fișier temporar în același director, apoi os.replace():
+    # cine citește vede fie modelul vechi, fie pe cel nou complet, niciodată unul pe jumătate
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    tmp = os.path.join(d, f".{os.path.basename(path)}.tmp-{os.getpid()}")
+    try:
+        with open(tmp, "wb") as f:
+            dump(model, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _valid(model) -> bool:
+    return isinstance(model, dict) and "fan" in model and "lamp" in model
+
+# Modelul stă în RAM; se reîncarcă doar când fișierul de pe disc se schimbă
+# (inode/mtime/size). Dacă încărcarea eșuează, rămâne în uz ultimul model bun.
+# `prepare` (opțional) transformă modelul după încărcare, ex. compile_model.
+class ModelCache:
+    def __init__(self, path: str, loader=load, prepare=None):
+        self.path = path
+        self.loader = loader
+        self.prepare = prepare
+        self.model = None
+
+        self._sig = None
+        self._failed_sig = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.load_ms = 0.0
+        self.loaded_at = None
+
+    def _signature(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        try:
+            sig = self._signature()
+        except OSError:
+            return self.model
+        if sig == self._sig or sig == self._failed_sig:
+            return self.model
+
+        t0 = time.perf_counter()
+        try:
+            model = self.loader(self.path)
+            if not _valid(model):
+                raise ValueError("model artifact must be a dict with 'fan' and 'lamp'")
+            if self.prepare is not None:
+                model = self.prepare(model)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = repr(e)
+            # nu reîncercăm același fișier stricat la fiecare ciclu
+            self._failed_sig = sig
+            print(f"[model] load failed, keeping previous model: {e}", flush=True)
+            return self.model
+
+        try:
+            changed = self._signature() != sig
+        except OSError:
+            changed = True
+        if changed:
+            # fișierul s-a schimbat în timpul citirii; îl luăm la următorul apel
+            return self.model
+
+        self.model = model
+        self._sig = sig
+        self._failed_sig = None
+        self.reloads += 1
+        self.load_ms = (time.perf_counter() - t0) * 1000.0
+        self.loaded_at = time.time()
+        print(f"[model] loaded {self.path} in {self.load_ms:.1f} ms", flush=True)
+        return self.model
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.model is not None,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "load_ms": round(self.load_ms, 3),
+            "loaded_at": self.loaded_at,
+        }
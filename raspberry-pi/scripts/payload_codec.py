@@ -0,0 +1,95 @@
+import json
+import struct
+
+import numpy as np
+
+# Payload-ul de stare al ESP32, în două formate acceptate în paralel:
+#  - JSON (v1): obiectul text publicat pe <site>/stare/senzori, citit și de web-ui
+#  - v2: binar, lungime fixă, little-endian, pe <site>/stare/bin (opțional pe ESP32)
+# Structura v2 e scrisă de esp32/micropython/src/mqtt_bridge.py (_V2_FMT); orice
+# schimbare de câmpuri cere un număr de versiune nou, nu modificarea lui 2.
+#   u8  versiune (2)
+#   u8  flags: bit0 = mod AUTO, bit1 = lampă pornită
+#   u16 seq, crește la fiecare mesaj (modulo 65536); găurile = mesaje pierdute
+#   u32 ts al dispozitivului (epoch Unix; 0 = ceas nesetat)
+#   f32 temp, light, soil, water (NaN = lipsă)
+#   u8  fan_pct 0..100 (255 = lipsă)
+# 25 B față de ~130 B JSON; ip nu mai circulă la fiecare mesaj.
+V2 = 2
+V2_STRUCT = struct.Struct("<BBHIffffB")
+V2_DTYPE = np.dtype([
+    ("version", "u1"), ("flags", "u1"), ("seq", "<u2"), ("dev_ts", "<u4"),
+    ("temp", "<f4"), ("light", "<f4"), ("soil", "<f4"), ("water", "<f4"),
+    ("fan_pct", "u1"),
+])
+assert V2_DTYPE.itemsize == V2_STRUCT.size
+
+F_AUTO = 1
+F_LAMP = 2
+FAN_NONE = 255
+
+_SENSORS = ("temp", "light", "soil", "water")
+
+def is_v2(raw) -> bool:
+    # JSON începe cu "{" (0x7b), deci primul octet separă formatele
+    return isinstance(raw, (bytes, bytearray, memoryview)) and len(raw) == V2_STRUCT.size \
+        and raw[0] == V2
+
+def _f32(x) -> float:
+    try:
+        return float("nan") if x is None else float(x)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def encode_v2(d: dict, seq: int = 0, dev_ts: int = 0) -> bytes:
+    # aceleași chei ca JSON-ul; folosit de bench/replay și la teste pe Pi
+    flags = (F_AUTO if str(d.get("mode", "")).lower() == "auto" else 0) | \
+        (F_LAMP if d.get("lamp_power") else 0)
+    fan = d.get("fan_pct")
+    fan = FAN_NONE if fan is None else max(0, min(100, int(round(float(fan)))))
+    return V2_STRUCT.pack(V2, flags, seq & 0xFFFF, int(dev_ts) & 0xFFFFFFFF,
+                          *(_f32(d.get(c)) for c in _SENSORS), fan)
+
+def decode_v2(raw) -> dict:
+    # un mesaj -> dict cu cheile JSON-ului (fără ip) + seq/dev_ts
+    _, flags, seq, dev_ts, temp, light, soil, water, fan = V2_STRUCT.unpack(raw)
+    d = {c: (None if v != v else v) for c, v in zip(_SENSORS, (temp, light, soil, water))}
+    d["mode"] = "auto" if flags & F_AUTO else "manual"
+    d["fan_pct"] = None if fan == FAN_NONE else fan
+    d["lamp_power"] = 1 if flags & F_LAMP else 0
+    d["seq"] = seq
+    d["dev_ts"] = dev_ts
+    return d
+
+def decode(raw):
+    # oricare format -> dict, sau None dacă nu e nici v2, nici un obiect JSON
+    if is_v2(raw):
+        return decode_v2(raw)
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        raw = bytes(raw).decode("utf-8", errors="replace")
+    try:
+        d = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return d if isinstance(d, dict) else None
+
+def decode_v2_array(raws) -> np.ndarray:
+    # multe mesaje v2 -> un singur array structurat, fără buclă Python pe câmpuri
+    return np.frombuffer(b"".join(raws), dtype=V2_DTYPE)
+
+def v2_columns(a: np.ndarray) -> list:
+    # array structurat -> tupluri în ordinea db.TELEMETRY_COLUMNS (ip = NULL)
+    n = a.shape[0]
+    cols = []
+    for c in _SENSORS:
+        x = a[c].astype(np.float64)
+        o = x.astype(object)
+        o[np.isnan(x)] = None
+        cols.append(o.tolist())
+    cols.append(np.where(a["flags"] & F_AUTO, "auto", "manual").tolist())
+    fan = a["fan_pct"].astype(np.float64).astype(object)
+    fan[a["fan_pct"] == FAN_NONE] = None
+    cols.append(fan.tolist())
+    cols.append(((a["flags"] & F_LAMP) > 0).astype(np.int64).tolist())
+    cols.append([None] * n)
+    return list(zip(*cols))
@@ -0,0 +1,31 @@
+import os
+
+import config_local as cfg
+
+# O seră = primul nivel al topicului: <site>/stare/senzori, <site>/comenzi/...
+# Topicurile din config_local sunt ale serei implicite (cfg.SITE); pentru celelalte
+# se înlocuiește doar prefixul. Aceeași regulă o aplică SQLite pe coloana `site`.
+
+def site_of(topic: str) -> str:
+    return topic.split("/", 1)[0]
+
+def site_topic(site: str, topic: str) -> str:
+    # topicul serei implicite -> același topic pentru `site`
+    return f"{site}/{topic.split('/', 1)[1]}"
+
+def allowed(site: str) -> bool:
+    return not cfg.SITES or site in cfg.SITES
+
+def model_path(site: str) -> str:
+    # sera implicită folosește MODEL_PATH; celelalte au fișier propriu (model-<site>.joblib),
+    # iar cât timp acesta lipsește controller-ul cade pe modelul comun
+    if site == cfg.SITE:
+        return cfg.MODEL_PATH
+    root, ext = os.path.splitext(cfg.MODEL_PATH)
+    return f"{root}-{site}{ext}"
+
+def feature_store_dir(site: str) -> str:
+    # director alăturat, nu în interior: _prune_store șterge tot ce nu e versiune
+    if site == cfg.SITE:
+        return cfg.FEATURE_STORE_DIR
+    return f"{cfg.FEATURE_STORE_DIR.rstrip(os.sep)}-{site}"
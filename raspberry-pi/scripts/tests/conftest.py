@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+import pytest
+
+# scripturile sunt module plate, importate din directorul lor (ca la rularea pe Pi)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config_local as cfg  # noqa: E402
+from db import connect, decode_row, insert_many  # noqa: E402
+
+def state_rows(n: int, start: int = 1700000000, step: int = 1, topic: str = cfg.TOPIC_STATE_SENSORS):
+    # eșantioane AUTO cu etichete, ca cele trimise de ESP32 pe <site>/stare/senzori
+    return [
+        decode_row(start + i * step, topic, json.dumps({
+            "temp": 20.0 + i % 7, "light": 300.0, "soil": 40.0, "water": 1.0,
+            "mode": "auto", "fan_pct": float(i % 101), "lamp_power": i % 2,
+        }))
+        for i in range(n)
+    ]
+
+@pytest.fixture
+def make_db(tmp_path):
+    def make(n: int, **kw) -> str:
+        path = str(tmp_path / "telemetry.sqlite")
+        con = connect(path)
+        insert_many(con, state_rows(n, **kw))
+        con.close()
+        return path
+    return make
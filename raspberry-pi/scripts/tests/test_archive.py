@@ -0,0 +1,86 @@
+import os
+
+import archive
+import config_local as cfg
+from conftest import state_rows
+from db import connect, connect_readonly, insert_many, query_range
+
+JAN, FEB, MAY = 1704067200, 1706745600, 1714521600   # 2024-01-01, 2024-02-01, 2024-05-01
+
+def _all(con, t0=None, t1=None):
+    return query_range(con, cfg.TOPIC_STATE_SENSORS, t0, t1, columns=("id", "ts", "temp")).fetchall()
+
+def _retain(con, tmp_path, **kw):
+    return archive.apply_retention(con, str(tmp_path / "archive"), 1, now=MAY, **kw)
+
+def test_retention_exports_parts_and_reads_back(make_db, tmp_path):
+    path = make_db(250, start=JAN, step=3600)     # ~10 zile în ianuarie
+    con = connect(path)
+    insert_many(con, state_rows(10, start=MAY))
+    before = _all(con)
+
+    assert _retain(con, tmp_path, chunk_rows=100) == [202401]
+    parts = con.execute("SELECT min_id, max_id FROM telemetry_archive_parts ORDER BY min_id").fetchall()
+    assert parts == [(1, 100), (101, 200), (201, 250)]
+    assert not con.execute("SELECT 1 FROM sqlite_master WHERE name = 'telemetry_202401'").fetchone()
+    con.close()
+
+    ro = connect_readonly(path)
+    # un interval scurt încarcă doar bucata care îl acoperă
+    day = _all(ro, JAN + 150 * 3600, JAN + 160 * 3600)
+    assert [r[1] for r in day] == [JAN + i * 3600 for i in range(150, 160)]
+    assert ro.execute("SELECT COUNT(*) FROM temp.archive_loaded").fetchone()[0] == 1
+    assert _all(ro) == before
+    ro.close()
+
+def test_late_rows_add_a_part(make_db, tmp_path):
+    path = make_db(50, start=JAN, step=3600)
+    con = connect(path)
+    _retain(con, tmp_path)
+    # rând întârziat într-o lună deja arhivată: partiția caldă reapare, apoi se arhivează iar
+    insert_many(con, state_rows(1, start=JAN + 7))
+    assert _retain(con, tmp_path) == [202401]
+    assert con.execute("SELECT COUNT(*) FROM telemetry_archive_parts").fetchone()[0] == 2
+    rows = _all(con)
+    assert len(rows) == 51 and len({r[0] for r in rows}) == 51
+    con.close()
+
+def test_rows_committed_during_export_are_kept(make_db, tmp_path, monkeypatch):
+    path = make_db(30, start=JAN, step=3600)
+    con = connect(path)
+    other = connect(path)
+    export = archive.export_partition
+    calls = []
+
+    def export_then_insert(*a, **kw):
+        parts = export(*a, **kw)
+        if not calls:
+            # exportul fără lock s-a terminat; writer-ul mai comite un rând în ianuarie
+            insert_many(other, state_rows(1, start=JAN + 5))
+        calls.append(parts)
+        return parts
+
+    monkeypatch.setattr(archive, "export_partition", export_then_insert)
+    _retain(con, tmp_path)
+    assert len(_all(con)) == 31
+    con.close()
+    other.close()
+
+def test_single_file_archives_are_migrated(make_db, tmp_path):
+    # formatul vechi: un singur .npz pentru toată luna, fără catalog de bucăți
+    path = make_db(40, start=JAN, step=3600)
+    con = connect(path)
+    _retain(con, tmp_path)
+    (part,) = [r[0] for r in con.execute("SELECT path FROM telemetry_archive_parts")]
+    legacy = str(tmp_path / "telemetry_202401.npz")
+    os.rename(part, legacy)
+    con.execute("DELETE FROM telemetry_archive_parts")
+    con.execute("UPDATE telemetry_partitions SET archive = ? WHERE month = 202401", (legacy,))
+    con.execute("PRAGMA user_version = 7")
+    con.commit()
+    con.close()
+
+    con = connect(path)
+    assert con.execute("SELECT path FROM telemetry_archive_parts").fetchall() == [(legacy,)]
+    assert len(_all(con, JAN, FEB)) == 40
+    con.close()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from build_dataset import ROW_BYTES, load_xy, update_feature_store
+from conftest import state_rows
+from db import connect, insert_many
+
+def test_load_xy_unbounded(make_db):
+    X, y_fan, y_lamp = load_xy(make_db(1000), chunk_rows=100)
+    assert X.shape == (1000, 6)
+    assert np.array_equal(y_fan, np.arange(1000) % 101)
+
+def test_load_xy_cap_at_chunk_boundary(make_db):
+    # 300 rânduri permise: array-urile cresc 100 -> 200, iar o nouă creștere nu mai
+    # încape (vechiul + noul array), deci bucata următoare e tăiată la zero rânduri
+    truncated = []
+    X, y_fan, y_lamp = load_xy(make_db(1000), max_bytes=300 * ROW_BYTES, chunk_rows=100,
+                               progress=lambda n, t: truncated.append(t))
+    assert truncated[-1]
+    assert len(X) == len(y_fan) == len(y_lamp) == 200
+    # se păstrează cele mai noi rânduri, în ordine cronologică
+    assert np.array_equal(y_fan, np.arange(800, 1000) % 101)
+
+def test_feature_store_keeps_rows_committed_during_the_read(make_db, tmp_path):
+    # două luni; după prima bucată (luna veche) se comit un rând întârziat în luna
+    # veche și unul nou în luna curentă. Citirea e pe un singur snapshot, deci
+    # niciunul nu e văzut acum și amândouă sosesc la actualizarea următoare.
+    jan, feb = 1704067200, 1706745600
+    path = make_db(50, start=jan)
+    con = connect(path)
+    insert_many(con, state_rows(50, start=feb))
+    late = state_rows(1, start=jan + 10_000) + state_rows(1, start=feb + 10_000)
+
+    def during(n, truncated):
+        if n == 50:
+            insert_many(con, late)
+
+    store = str(tmp_path / "store")
+    first = update_feature_store(path, store, progress=during, chunk_rows=50)
+    assert first["new_rows"] == 100
+    second = update_feature_store(path, store)
+    con.close()
+    assert second["new_rows"] == 2
+    assert len(second["X"]) == 102
+    assert np.all(np.diff(second["ts"]) >= 0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from forest_engine import compile_model, export_forest
+
+N_FEAT = 6
+
+def _data(n: int = 400, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEAT)) * np.array([5.0, 2000.0, 10.0, 10.0, 1.0, 1.0])
+    y = 40.0 + 2.0 * X[:, 0] + 0.01 * X[:, 1] - X[:, 2] + rng.normal(size=n)
+    return X, y
+
+def _inputs(forest, seed: int = 1):
+    # float64 aleator (conversia la float32 e a motorului) + rânduri exact pe praguri
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, N_FEAT)) * np.array([5.0, 2000.0, 10.0, 10.0, 1.0, 1.0])
+    inner = forest.left != np.arange(len(forest.left))
+    on = np.tile(X[:1], (int(inner.sum()), 1))
+    on[np.arange(len(on)), forest.feature[inner]] = forest.threshold[inner]
+    return np.vstack((X, on))
+
+@pytest.mark.parametrize("depth", [3, None])
+def test_regressor_matches_sklearn(depth):
+    X, y = _data()
+    sk = RandomForestRegressor(n_estimators=7, max_depth=depth, random_state=0).fit(X, y)
+    cf = export_forest(sk)
+    Xt = _inputs(cf)
+    assert np.array_equal(cf.predict(Xt), sk.predict(Xt))
+    # un singur eșantion, ca în controller
+    assert np.array_equal(cf.predict(Xt[0]), sk.predict(Xt[:1]))
+
+@pytest.mark.parametrize("labels", [(0, 1), (0, 1, 2), ("off", "on")])
+def test_classifier_matches_sklearn(labels):
+    X, y = _data()
+    bins = np.quantile(y, np.linspace(0, 1, len(labels) + 1)[1:-1])
+    y_cls = np.asarray(labels)[np.digitize(y, bins)]
+    sk = RandomForestClassifier(n_estimators=7, max_depth=5, random_state=0).fit(X, y_cls)
+    cf = export_forest(sk)
+    Xt = _inputs(cf)
+    assert np.array_equal(cf.predict_proba(Xt), sk.predict_proba(Xt))
+    assert np.array_equal(cf.predict(Xt), sk.predict(Xt))
+
+def test_compile_model_replaces_both_forests():
+    X, y = _data()
+    model = {
+        "fan": RandomForestRegressor(n_estimators=3, max_depth=4, random_state=0).fit(X, y),
+        "lamp": RandomForestClassifier(n_estimators=3, max_depth=4, random_state=0).fit(X, y > 40),
+        "meta": {"rows": len(X)},
+    }
+    compiled = compile_model(model)
+    assert compiled["meta"] is model["meta"]
+    Xt = _inputs(compiled["fan"])
+    assert np.array_equal(compiled["fan"].predict(Xt), model["fan"].predict(Xt))
+    assert np.array_equal(compiled["lamp"].predict(Xt), model["lamp"].predict(Xt))
+    with pytest.raises(TypeError):
+        compiled["fan"].predict_proba(Xt)
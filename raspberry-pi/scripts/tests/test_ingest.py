@@ -0,0 +1,44 @@
+import json
+
+import config_local as cfg
+from daemon import IngestStage, Sample
+from payload_codec import encode_v2
+
+class _Writer:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, ts, topic, payload, data=None):
+        self.rows.append((ts, payload))
+        return True
+
+def _stage():
+    stage = IngestStage()
+    stage.writer = _Writer()
+    return stage
+
+def _json(ts, temp):
+    d = {"temp": temp, "mode": "auto", "fan_pct": 10, "lamp_power": 0}
+    return Sample(cfg.TOPIC_STATE_SENSORS, json.dumps(d), d, ts, 0.0)
+
+def test_held_state_is_written_on_the_1hz_grid():
+    stage = _stage()
+    for ts, temp in ((100.2, 20.0), (101.9, 20.5), (160.0, 21.0)):
+        stage.on_message(_json(ts, temp))
+    ts = [r[0] for r in stage.writer.rows]
+    assert ts == list(range(100, 161))
+    # secundele 102..159 repetă starea primită la 101
+    assert {r[1] for r in stage.writer.rows[2:-1]} == {stage.writer.rows[1][1]}
+    assert stage.filled == 58
+
+def test_outages_and_backfill_are_not_bridged():
+    stage = _stage()
+    stage.on_message(_json(1000.0, 20.0))
+    stage.on_message(_json(1000.0 + cfg.STATE_FILL_MAX_S + 1, 20.0))
+    assert stage.filled == 0
+    # backfill: cronologie proprie, umplută între înregistrările lui
+    rec = bytes(encode_v2({"temp": 19.0, "mode": "auto", "fan_pct": 0, "lamp_power": 0}, seq=1, dev_ts=500))
+    for t in (500.0, 505.0):
+        stage.on_message(Sample(cfg.TOPIC_STATE_SENSORS, rec, None, t, 0.0, backfill=True))
+    assert stage.filled == 4
+    assert [r[0] for r in stage.writer.rows[-5:]] == [501, 502, 503, 504, 505]
@@ -1,21 +1,19 @@
-from joblib import dump
+import argparse
+
 import numpy as np
+from joblib import load
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 
 import config_local as cfg
-from build_dataset import load_xy
-
-def main():
-    X, y_fan, y_lamp = load_xy(cfg.DB_PATH)
+from build_dataset import FEATURE_SCHEMA, ROW_BYTES, update_feature_store
+from model_store import save_model_atomic
+from sites import feature_store_dir, model_path, site_topic
+from train_budget import StageReport, plan_parallelism, run_parallel
 
-    if len(X) < 500:
-        raise SystemExit("Not enough data yet (need >= 500 samples in AUTO)")
+MIN_SAMPLES = 500
 
-    X = np.asarray(X, dtype=np.float32)
-    y_fan = np.asarray(y_fan, dtype=np.float32)
-    y_lamp = np.asarray(y_lamp, dtype=np.int32)
-
-    # Modele mici: 1GB RAM safe
+def _new_models():
+    # Modele mici: 1GB RAM safe; n_jobs se stabilește după bugetul de RAM (train_budget)
     fan_model = RandomForestRegressor(
         n_estimators=120,
         max_depth=10,
@@ -28,12 +26,124 @@ def main():
         random_state=42,
         n_jobs=1
     )
+    return fan_model, lamp_model
+
+def _grow(est, X, y, add_trees: int, max_trees: int) -> bool:
+    # warm_start: arborii noi învață doar din rândurile noi, cei vechi rămân;
+    # peste max_trees se renunță la cei mai vechi
+    if hasattr(est, "classes_") and not np.array_equal(np.unique(y), est.classes_):
+        return False
+    est.set_params(warm_start=True, n_estimators=len(est.estimators_) + add_trees)
+    est.fit(X, y)
+    if len(est.estimators_) > max_trees:
+        est.estimators_ = est.estimators_[-max_trees:]
+        est.n_estimators = len(est.estimators_)
+    est.set_params(warm_start=False)
+    return True
+
+def _fit_job(est, X, y, warm: bool, add_trees: int, max_trees: int):
+    # rulează în proces separat când se antrenează în paralel; întoarce estimatorul
+    if warm:
+        return est, _grow(est, X, y, add_trees, max_trees)
+    est.fit(X, y)
+    return est, True
+
+def _previous_model():
+    try:
+        prev = load(cfg.MODEL_PATH)
+    except Exception:
+        return None
+    if not isinstance(prev, dict) or prev.get("feature_schema") != FEATURE_SCHEMA:
+        return None
+    if prev.get("watermark") is None:
+        return None
+    return prev
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Train the fan/lamp models from telemetry")
+    ap.add_argument("--mode", choices=("full", "window", "warm"), default=cfg.TRAIN_MODE,
+                    help="full: refit on all cached rows; window: refit on the last "
+                         "--window-days; warm: add trees fitted on rows since the last model")
+    ap.add_argument("--window-days", type=float, default=cfg.TRAIN_WINDOW_DAYS)
+    ap.add_argument("--add-trees", type=int, default=cfg.TRAIN_ADD_TREES)
+    ap.add_argument("--max-trees", type=int, default=cfg.TRAIN_MAX_TREES)
+    ap.add_argument("--ram-mb", type=float, default=cfg.TRAIN_RAM_MB,
+                    help="RAM ceiling used to pick how many trees/models are fitted in parallel")
+    ap.add_argument("--cores", type=int, default=cfg.TRAIN_CORES,
+                    help="max CPU cores to use (0 = all)")
+    ap.add_argument("--site", default=cfg.SITE,
+                    help="greenhouse to train on; other than the default site, the model "
+                         "and feature store go to per-site paths")
+    args = ap.parse_args(argv)
+    if args.site != cfg.SITE:
+        # telemetria, depozitul și modelul serei; controller-ul găsește modelul după nume
+        cfg.MODEL_PATH, cfg.FEATURE_STORE_DIR = model_path(args.site), feature_store_dir(args.site)
+        cfg.TOPIC_STATE_SENSORS = site_topic(args.site, cfg.TOPIC_STATE_SENSORS)
+    report = StageReport()
+
+    # depozitul ține X/y deja featurizate (mmap); aici se featurizează doar rândurile noi
+    max_rows = cfg.TRAIN_MAX_MB * 1024 * 1024 // (ROW_BYTES + 16) if cfg.TRAIN_MAX_MB else None
+    with report.stage("features") as st:
+        data = update_feature_store(cfg.DB_PATH, cfg.FEATURE_STORE_DIR, max_rows=max_rows)
+        st["rows"] = len(data["X"])
+        st["new_rows"] = data["new_rows"]
+    X, y_fan, y_lamp = data["X"], data["y_fan"], data["y_lamp"]
+    print(f"Feature store: {len(X)} rows ({data['new_rows']} new, watermark={data['watermark']})")
+
+    mode = args.mode
+    prev = _previous_model() if mode == "warm" else None
+    if mode == "warm" and prev is None:
+        print("No compatible previous model, falling back to a full refit")
+        mode = "full"
+
+    warm = mode == "warm"
+    if warm:
+        sel = data["rowid"] > prev["watermark"]
+        if sel.sum() < MIN_SAMPLES:
+            raise SystemExit(f"Not enough new data for warm retraining ({int(sel.sum())} < {MIN_SAMPLES})")
+        fan_model, lamp_model = prev["fan"], prev["lamp"]
+        X, y_fan, y_lamp = X[sel], y_fan[sel], y_lamp[sel]
+    else:
+        if mode == "window" and len(X):
+            sel = data["ts"] >= data["ts"].max() - args.window_days * 24 * 3600
+            X, y_fan, y_lamp = X[sel], y_fan[sel], y_lamp[sel]
+
+        if len(X) < MIN_SAMPLES:
+            raise SystemExit(f"Not enough data yet (need >= {MIN_SAMPLES} samples in AUTO)")
+
+        fan_model, lamp_model = _new_models()
+
+    # câți arbori/modele în paralel încap sub plafonul de RAM
+    new_trees = args.add_trees if warm else None
+    plan = plan_parallelism([(fan_model, new_trees), (lamp_model, new_trees)], len(X),
+                            X.nbytes / (1024 * 1024), args.ram_mb, args.cores or None)
+    print(f"[train] plan: {plan}", flush=True)
+    for est in (fan_model, lamp_model):
+        est.set_params(n_jobs=plan["jobs"])
+
+    fitted = run_parallel({
+        "fan": lambda: _fit_job(fan_model, X, y_fan, warm, args.add_trees, args.max_trees),
+        "lamp": lambda: _fit_job(lamp_model, X, y_lamp, warm, args.add_trees, args.max_trees),
+    }, report, plan["procs"], plan["jobs"])
+    fan_model, _ = fitted["fan"]
+    lamp_model, lamp_ok = fitted["lamp"]
+    if not lamp_ok:
+        print("New rows do not cover all lamp classes; keeping the previous lamp model")
 
-    fan_model.fit(X, y_fan)
-    lamp_model.fit(X, y_lamp)
+    # inferența rulează pe un singur rând, fără pool de thread-uri
+    for est in (fan_model, lamp_model):
+        est.set_params(n_jobs=1)
 
-    dump({"fan": fan_model, "lamp": lamp_model}, cfg.MODEL_PATH)
-    print(f"Saved model to {cfg.MODEL_PATH}")
+    with report.stage("save"):
+        save_model_atomic({
+            "fan": fan_model,
+            "lamp": lamp_model,
+            "feature_schema": FEATURE_SCHEMA,
+            "watermark": data["watermark"],
+        }, cfg.MODEL_PATH)
+    print(f"Saved model to {cfg.MODEL_PATH} (mode={mode}, trees={len(fan_model.estimators_)})")
+    report.print()
+    return report
 
 if __name__ == "__main__":
     main()
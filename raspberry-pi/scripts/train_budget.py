@@ -0,0 +1,158 @@
+import os
+import time
+import resource
+import multiprocessing as mp
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+# RSS-ul unui proces fork-uit, peste paginile partajate cu părintele
+CHILD_OVERHEAD_MB = 40.0
+
+def _proc_status_mb(field: str):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+def rss_mb() -> float:
+    v = _proc_status_mb("VmRSS")
+    return v if v is not None else peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    v = _proc_status_mb("VmHWM")
+    if v is not None:
+        return v
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def reset_peak_rss() -> None:
+    # Linux >= 4.0: "5" resetează VmHWM la RSS-ul curent; altfel vârful rămâne cumulativ
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+# Timp + vârf de RSS pe etape (features, fit, save...)
+class StageReport:
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str, **extra):
+        reset_peak_rss()
+        t0 = time.perf_counter()
+        rec = {"stage": name, **extra}
+        try:
+            yield rec
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - t0, 3)
+            rec["peak_rss_mb"] = round(max(peak_rss_mb(), rec.get("peak_rss_mb", 0.0)), 1)
+            self.stages.append(rec)
+
+    def print(self):
+        for r in self.stages:
+            extra = " ".join(f"{k}={v}" for k, v in r.items()
+                             if k not in ("stage", "wall_s", "peak_rss_mb"))
+            print(f"[train] {r['stage']:<10} {r['wall_s']:8.2f} s  "
+                  f"peak RSS {r['peak_rss_mb']:7.1f} MB  {extra}".rstrip(), flush=True)
+
+def estimate_fit_mb(est, n_rows: int, new_trees: int | None = None) -> tuple[float, float]:
+    # (memoria modelului după fit, memoria de lucru a unui worker care construiește un arbore)
+    depth = est.max_depth or 32
+    nodes = min(2 ** (depth + 1) - 1, 2 * max(n_rows, 1))
+    if hasattr(est, "predict_proba"):
+        n_values = len(getattr(est, "classes_", ())) or 2
+    else:
+        n_values = 1
+    # structura Node din sklearn (~64 B) + value float64 per nod
+    tree_mb = nodes * (64 + 8 * n_values) / MB
+    n_trees = est.n_estimators if new_trees is None else new_trees
+    model_mb = n_trees * tree_mb
+    # indici + sample_weight bootstrap + valorile feature-ului sortat + y float64
+    worker_mb = n_rows * (8 + 8 + 4 + 8) / MB + tree_mb
+    return model_mb, worker_mb
+
+def plan_parallelism(fits: list, n_rows: int, x_mb: float, ram_mb: float,
+                     max_cores: int | None = None) -> dict:
+    # fits: [(est, new_trees)] - câte un model; alege (procese, n_jobs per model)
+    # cu cel mai mare număr total de workeri care încape sub ram_mb.
+    # X e memory-mapped / moștenit prin fork, deci se numără o singură dată.
+    cores = max_cores or os.cpu_count() or 1
+    est_mb = [estimate_fit_mb(est, n_rows, nt) for est, nt in fits]
+    models_mb = sum(m for m, _ in est_mb)
+    worker_mb = max(w for _, w in est_mb)
+    base_mb = rss_mb() + x_mb
+
+    best = None
+    for procs in sorted({min(2, len(fits), cores), 1}, reverse=True):
+        for jobs in range(max(1, cores // procs), 0, -1):
+            peak = base_mb + models_mb + procs * jobs * worker_mb
+            if procs > 1:
+                peak += procs * CHILD_OVERHEAD_MB
+            if peak > ram_mb and not (procs == 1 and jobs == 1):
+                continue
+            if best is None or procs * jobs > best["procs"] * best["jobs"]:
+                best = {"procs": procs, "jobs": jobs, "est_peak_mb": round(peak, 1)}
+            break
+    best["cores"] = cores
+    best["ram_mb"] = ram_mb
+    best["over_budget"] = best["est_peak_mb"] > ram_mb
+    return best
+
+def _child(conn, fn):
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    try:
+        res = fn()
+        conn.send((True, res, time.perf_counter() - t0, peak_rss_mb()))
+    except BaseException as e:
+        conn.send((False, repr(e), time.perf_counter() - t0, peak_rss_mb()))
+    finally:
+        conn.close()
+
+def run_parallel(jobs: dict, report: StageReport, procs: int, n_jobs: int) -> dict:
+    # jobs: {nume: fn() -> rezultat}. Cu procs > 1 fiecare job rulează într-un proces
+    # fork-uit (datele sunt moștenite, nu copiate); rezultatul se întoarce prin pipe.
+    if procs <= 1 or len(jobs) <= 1 or "fork" not in mp.get_all_start_methods():
+        out = {}
+        for name, fn in jobs.items():
+            with report.stage(f"fit_{name}", n_jobs=n_jobs):
+                out[name] = fn()
+        return out
+
+    ctx = mp.get_context("fork")
+    running = []
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    for name, fn in jobs.items():
+        parent, child = ctx.Pipe(duplex=False)
+        p = ctx.Process(target=_child, args=(child, fn), name=f"train-{name}")
+        p.start()
+        child.close()
+        running.append((name, p, parent))
+
+    out, errors = {}, []
+    for name, p, conn in running:
+        # recv înainte de join: un model mare nu încape în bufferul pipe-ului
+        try:
+            ok, res, wall, peak = conn.recv()
+        except EOFError:
+            ok, res, wall, peak = False, "worker exited without a result", 0.0, 0.0
+        p.join()
+        report.stages.append({"stage": f"fit_{name}", "n_jobs": n_jobs, "process": True,
+                              "wall_s": round(wall, 3), "peak_rss_mb": round(peak, 1)})
+        if ok:
+            out[name] = res
+        else:
+            errors.append(f"{name}: {res}")
+    report.stages.append({"stage": "fit_total", "procs": len(running),
+                          "wall_s": round(time.perf_counter() - t0, 3),
+                          "peak_rss_mb": round(peak_rss_mb(), 1)})
+    if errors:
+        raise RuntimeError("training failed: " + "; ".join(errors))
+    return out
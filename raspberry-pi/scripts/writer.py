@@ -0,0 +1,246 @@
+import queue
+import threading
+import time
+
+from db import connect, decode_row, insert_many
+from metrics import Histogram
+from payload_codec import decode_v2_array, is_v2, v2_columns
+
+# Scrie telemetria în loturi, pe un thread separat de bucla de rețea MQTT.
+# submit() nu blochează: dacă coada e plină, mesajul e numărat ca pierdut.
+# Decodarea în coloane se face tot aici, nu în callback-ul paho: JSON-ul deja parsat
+# de apelant (data) se refolosește, iar mesajele v2 dintr-un lot se decodează deodată.
+# Un lot = un singur executemany + commit, la batch_size rânduri sau flush_s secunde.
+# Un commit eșuat (ex. "database is locked" cât retenția sau antrenarea țin DB-ul) nu
+# pierde lotul: rândurile rămân în așteptare și se reîncearcă cu backoff exponențial,
+# împreună cu loturile noi. Abia după retry_max încercări (sau peste retry_rows rânduri
+# în așteptare) se renunță la ele, numărate în `dropped`.
+class TelemetryWriter:
+    def __init__(self, db_path: str, batch_size: int = 200, flush_s: float = 2.0,
+                 max_queue: int = 10000, stats_every_s: float = 0.0, rollups: bool = True,
+                 retry_max: int = 8, retry_rows: int = 20000, retry_backoff_s: float = 0.5):
+        self.db_path = db_path
+        self.rollups = rollups
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(0.0, float(flush_s))
+        self.stats_every_s = float(stats_every_s)
+        self.retry_max = max(0, int(retry_max))
+        self.retry_rows = max(1, int(retry_rows))
+        self.retry_backoff_s = max(0.0, float(retry_backoff_s))
+
+        self.q = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop = threading.Event()
+        self._thread = None
+        # sarcini periodice pe conexiunea writer-ului, rulate doar când nu e lot în curs
+        self._idle_tasks = []
+
+        self.received = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        # de la submit() până la commit, per rând
+        self.max_lag_ms = 0.0
+        self._total_lag_ms = 0.0
+        self._lag_n = 0
+        # distribuțiile pentru /metrics: durata unui lot (insert + commit) și lag-ul per rând
+        self.flush_hist = Histogram()
+        self.lag_hist = Histogram()
+        self.task_failures = {}
+        # rânduri decodate, încă necomise: (rând, t_submit); încercări eșuate la rând
+        self._pending = []
+        self._attempts = 0
+        self._retry_at = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def add_idle_task(self, name: str, fn, every_s: float, run_at_start: bool = False):
+        # fn(con) rulează în thread-ul writer-ului, deci nu concurează pentru lock-ul de scriere;
+        # trebuie apelat înainte de start()
+        first = time.monotonic() + (0.0 if run_at_start else every_s)
+        self._idle_tasks.append([name, fn, float(every_s), first])
+
+    def submit(self, ts: int, topic: str, payload, data: dict | None = None) -> bool:
+        self.received += 1
+        try:
+            self.q.put_nowait((ts, topic, payload, time.perf_counter(), data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout: float | None = None):
+        # golește tot ce e în coadă înainte de ieșire (SIGTERM de la systemd)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def pending(self) -> int:
+        # rânduri care așteaptă reîncercarea commit-ului
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.q.qsize(),
+            "queue_max": self.q.maxsize,
+            "received": self.received,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "pending": self.pending,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "avg_lag_ms": round(self._total_lag_ms / self._lag_n, 3) if self._lag_n else 0.0,
+        }
+
+    def _decode(self, batch: list) -> list:
+        # -> [(rând, t_submit)]
+        rows = []
+        v2 = []
+        for item in batch:
+            if is_v2(item[2]):
+                v2.append(item)
+                continue
+            row = decode_row(item[0], item[1], item[2], item[4])
+            if row is None:
+                self.rejected += 1
+            else:
+                rows.append((row, item[3]))
+        if v2:
+            # tot lotul binar printr-un singur np.frombuffer
+            cols = v2_columns(decode_v2_array([item[2] for item in v2]))
+            rows.extend(((item[0], item[1], bytes(item[2])) + c, item[3]) for item, c in zip(v2, cols))
+        return rows
+
+    def _flush(self, con, batch: list, force: bool = False):
+        # batch poate fi gol: doar reîncercarea rândurilor în așteptare
+        self._pending.extend(self._decode(batch))
+        if len(self._pending) > self.retry_rows:
+            # DB indisponibil de mult: se pierd cele mai vechi, nu memoria procesului
+            over = len(self._pending) - self.retry_rows
+            del self._pending[:over]
+            self.dropped += over
+            print(f"[writer] retry buffer full, dropped {over} oldest rows", flush=True)
+        if not self._pending or (not force and time.monotonic() < self._retry_at):
+            return
+
+        rows = [r for r, _ in self._pending]
+        t0 = time.perf_counter()
+        try:
+            insert_many(con, rows, rollups=self.rollups)
+        except Exception as e:
+            self.failed_flushes += 1
+            self._attempts += 1
+            if self._attempts > self.retry_max:
+                self.dropped += len(rows)
+                print(f"[writer] flush failed {self._attempts} times, dropped {len(rows)} rows: {e}",
+                      flush=True)
+                self._pending = []
+                self._attempts = 0
+                self._retry_at = 0.0
+            else:
+                backoff = min(30.0, self.retry_backoff_s * 2 ** (self._attempts - 1))
+                self._retry_at = time.monotonic() + backoff
+                print(f"[writer] flush failed ({len(rows)} rows, attempt {self._attempts}), "
+                      f"retry in {backoff:.1f}s: {e}", flush=True)
+            return
+        t1 = time.perf_counter()
+        dt_ms = (t1 - t0) * 1000.0
+        lags = [t1 - t for _, t in self._pending]
+        self._pending = []
+        self._attempts = 0
+        self._retry_at = 0.0
+        self.flush_hist.observe(t1 - t0)
+        for lag in lags:
+            self.lag_hist.observe(lag)
+        self.max_lag_ms = max(self.max_lag_ms, max(lags) * 1000.0)
+        self._total_lag_ms += sum(lags) * 1000.0
+        self._lag_n += len(lags)
+        self.written += len(rows)
+        self.flushes += 1
+        self.last_flush_ms = dt_ms
+        self.max_flush_ms = max(self.max_flush_ms, dt_ms)
+        self._total_flush_ms += dt_ms
+
+    def _run_idle_tasks(self, con, now: float):
+        for task in self._idle_tasks:
+            name, fn, every_s, due = task
+            if now < due:
+                continue
+            task[3] = now + every_s
+            try:
+                fn(con)
+            except Exception as e:
+                self.task_failures[name] = self.task_failures.get(name, 0) + 1
+                print(f"[writer] {name} failed: {e}", flush=True)
+
+    def _run(self):
+        # conexiunea SQLite aparține thread-ului de scriere
+        con = connect(self.db_path)
+        batch = []
+        deadline = None
+        next_stats = time.monotonic() + self.stats_every_s if self.stats_every_s > 0 else None
+
+        try:
+            while True:
+                stopping = self._stop.is_set()
+                now = time.monotonic()
+
+                wait = 0.5
+                if deadline is not None:
+                    wait = min(wait, max(0.0, deadline - now))
+                try:
+                    item = self.q.get(timeout=wait) if not stopping else self.q.get_nowait()
+                except queue.Empty:
+                    item = None
+
+                if item is not None:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_s
+                    batch.append(item)
+                    while len(batch) < self.batch_size:
+                        try:
+                            batch.append(self.q.get_nowait())
+                        except queue.Empty:
+                            break
+
+                now = time.monotonic()
+                if batch and (len(batch) >= self.batch_size or now >= deadline or stopping):
+                    self._flush(con, batch)
+                    batch = []
+                    deadline = None
+                elif self._pending and not batch and now >= self._retry_at:
+                    self._flush(con, [])
+
+                if not batch and not self._pending and not stopping:
+                    self._run_idle_tasks(con, now)
+
+                if next_stats is not None and now >= next_stats:
+                    next_stats = now + self.stats_every_s
+                    print(f"[writer] {self.stats()}", flush=True)
+
+                if stopping and not batch and self.q.empty():
+                    break
+            # oprire: încă o încercare fără backoff, apoi rândurile rămase sunt pierdute
+            if self._pending:
+                self._flush(con, [], force=True)
+            if self._pending:
+                self.dropped += len(self._pending)
+                print(f"[writer] stopping, dropped {len(self._pending)} uncommitted rows", flush=True)
+                self._pending = []
+        finally:
+            con.close()